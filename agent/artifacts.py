@@ -0,0 +1,92 @@
+# File manifest, contents and ZIP archive of a finished run, built once and reused
+
+import collections
+import os
+import tempfile
+import threading
+import weakref
+import zipfile
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+
+class ProjectFile(NamedTuple):
+    path: str
+    """Relative to the project root, with forward slashes."""
+    size: int
+
+
+def scan_project(root: Path) -> list[ProjectFile]:
+    """Every file under `root`, sorted by path."""
+    files = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in filenames:
+            full = os.path.join(directory, name)
+            try:
+                size = os.path.getsize(full)
+            except OSError:
+                continue
+            files.append(ProjectFile(Path(full).relative_to(root).as_posix(), size))
+    return sorted(files)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class ProjectArtifacts:
+    """What the app shows for a finished run: file list, file contents and a ZIP.
+
+    The file list is scanned once. Contents are read on demand and kept in a
+    small LRU of at most `cache_bytes`; files larger than a quarter of that are
+    read every time instead of evicting everything else. The ZIP is written to a
+    temporary file the first time it is asked for, one file at a time, and is
+    deleted with this object.
+    """
+
+    def __init__(self, root: Path, cache_bytes: int = 8 * 1024 * 1024):
+        self.root = Path(root)
+        self.files = scan_project(self.root) if self.root.exists() else []
+        self.cache_bytes = cache_bytes
+        self._contents: collections.OrderedDict[str, str] = collections.OrderedDict()
+        self._cached = 0
+        self._zip: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def total_size(self) -> int:
+        return sum(f.size for f in self.files)
+
+    def read(self, path: str) -> str:
+        with self._lock:
+            if path in self._contents:
+                self._contents.move_to_end(path)
+                return self._contents[path]
+        content = (self.root / path).read_text(encoding="utf-8")
+        if len(content) > self.cache_bytes // 4:
+            return content
+        with self._lock:
+            if path not in self._contents:
+                self._contents[path] = content
+                self._cached += len(content)
+                while self._cached > self.cache_bytes:
+                    _, evicted = self._contents.popitem(last=False)
+                    self._cached -= len(evicted)
+        return content
+
+    def zip_path(self) -> str:
+        """Path of the project's ZIP archive, written on first use."""
+        with self._lock:
+            if self._zip is None:
+                fd, path = tempfile.mkstemp(prefix="project-", suffix=".zip")
+                os.close(fd)
+                weakref.finalize(self, _remove, path)
+                with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+                    for file in self.files:
+                        archive.write(self.root / file.path, file.path)
+                self._zip = path
+            return self._zip
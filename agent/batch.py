@@ -0,0 +1,124 @@
+# Batch runner: streams prompts from a JSONL file through a bounded worker pool
+
+import json
+import pathlib
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime, timezone
+from typing import Iterator, TextIO
+
+from agent.tools import init_project_root, project_root
+
+
+def read_requests(path: str | pathlib.Path) -> Iterator[dict]:
+    """Yields one request per non-empty line without loading the whole file.
+
+    A request needs a prompt under `prompt`, `user_prompt` or `body`; its id comes
+    from `id` or `request_id` and falls back to the line number. A line that is
+    not such a request yields a request carrying an `error` instead of a prompt.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"id": f"line-{line_no}", "line": line_no, "error": f"{path}:{line_no}: invalid JSON: {e}"}
+                continue
+            if not isinstance(record, dict):
+                yield {"id": f"line-{line_no}", "line": line_no, "error": f"{path}:{line_no}: request is not an object"}
+                continue
+            request_id = str(record.get("id") or record.get("request_id") or f"line-{line_no}")
+            prompt = record.get("prompt") or record.get("user_prompt") or record.get("body")
+            if not prompt:
+                yield {"id": request_id, "line": line_no, "error": f"{path}:{line_no}: request has no prompt"}
+                continue
+            yield {"id": request_id, "line": line_no, "prompt": prompt}
+
+
+def _workspace_name(request_id: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", request_id).strip("._") or "run"
+
+
+def _unique_name(request: dict, used: set[str]) -> str:
+    """The request's workspace name, suffixed with its line number when an earlier request of the batch has it."""
+    name = _workspace_name(request["id"])
+    while name in used:
+        name = f"{name}-{request.get('line', len(used))}"
+    used.add(name)
+    return name
+
+
+def run_request(agent, request: dict, out_dir: pathlib.Path, config: dict, name: str | None = None) -> dict:
+    """Runs one prompt in its own project root `out_dir / name` and returns its result record."""
+    name = name or _workspace_name(request["id"])
+    root = out_dir / name
+    configurable = dict(config.get("configurable", {}))
+    # runs of one batch share the batch's run id as a prefix
+    configurable["thread_id"] = "/".join(filter(None, [configurable.get("thread_id"), name]))
+    run_config = {**config, "configurable": configurable}
+    record = {
+        "id": request["id"],
+        "line": request.get("line"),
+        "status": "ok",
+        "output_dir": str(root),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+    }
+    start = time.perf_counter()
+    try:
+        with project_root(root):
+            init_project_root()
+            agent.invoke({"user_prompt": request["prompt"]}, run_config)
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["duration_s"] = round(time.perf_counter() - start, 3)
+    record["files"] = sum(1 for p in root.rglob("*") if p.is_file()) if root.exists() else 0
+    return record
+
+
+def run_batch(agent, requests: Iterator[dict], results: TextIO, out_dir: str | pathlib.Path,
+              workers: int = 4, config: dict | None = None) -> dict:
+    """Runs `requests` concurrently on `workers` threads, writing one JSONL record per run.
+
+    At most twice `workers` requests are in flight, so arbitrarily large input
+    files are streamed rather than loaded. Every run gets a project root of its
+    own, even when request ids repeat or sanitize to the same name; a request
+    that could not be read is recorded as an error without stopping the batch.
+    Returns counts per status.
+    """
+    out_dir = pathlib.Path(out_dir).absolute()
+    config = config or {}
+    in_flight = threading.BoundedSemaphore(2 * workers)
+    write_lock = threading.Lock()
+    counts = {"ok": 0, "error": 0}
+    used_names: set[str] = set()
+
+    def write(record: dict) -> None:
+        with write_lock:
+            counts[record["status"]] += 1
+            results.write(json.dumps(record) + "\n")
+            results.flush()
+            if "output_dir" in record:
+                print(f"{'✅' if record['status'] == 'ok' else '❌'} {record['id']} "
+                      f"({record['duration_s']}s) -> {record['output_dir']}")
+            else:
+                print(f"❌ {record['id']}: {record['error']}")
+
+    def on_done(future: Future) -> None:
+        in_flight.release()
+        write(future.result())
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for request in requests:
+            if "error" in request:
+                write({"id": request["id"], "line": request.get("line"), "status": "error", "error": request["error"]})
+                continue
+            in_flight.acquire()
+            name = _unique_name(request, used_names)
+            pool.submit(run_request, agent, request, out_dir, config, name).add_done_callback(on_done)
+    return counts
@@ -0,0 +1,167 @@
+# Persistent checkpoints and incremental regeneration
+
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import uuid
+from typing import TYPE_CHECKING, Optional
+
+from agent.scheduler import normalize_path
+
+if TYPE_CHECKING:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    from agent.states import ImplementationTask
+
+DEFAULT_CHECKPOINT_PATH = pathlib.Path.cwd() / ".checkpoints" / "runs.sqlite"
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def _serializer():
+    """Checkpoint serializer allowed to restore the state's own models.
+
+    Newer langgraph-checkpoint releases warn about msgpack types missing from
+    the allow-list (and will refuse them); older ones take no allow-list.
+    """
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    from agent.states import CoderState, File, ImplementationTask, Plan, TaskPlan
+
+    try:
+        return JsonPlusSerializer(allowed_msgpack_modules=[File, Plan, ImplementationTask, TaskPlan, CoderState])
+    except TypeError:
+        return JsonPlusSerializer()
+
+
+def open_checkpointer(path: str | os.PathLike = DEFAULT_CHECKPOINT_PATH) -> "SqliteSaver":
+    """SQLite-backed LangGraph checkpointer; runs are keyed by their thread_id (the run id)."""
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return SqliteSaver(sqlite3.connect(path, check_same_thread=False), serde=_serializer())
+
+
+def run_config(run_id: str, **configurable) -> dict:
+    return {"configurable": {"thread_id": run_id, **configurable}}
+
+
+def step_fingerprints(steps: list["ImplementationTask"], deps: list[set[int]]) -> list[str]:
+    """Content hash of every step's inputs, chained through its dependencies.
+
+    A step's fingerprint changes when its own task changes or when any step it
+    depends on changes, so edits propagate to everything built on top of them.
+    """
+    fingerprints = []
+    for idx, step in enumerate(steps):
+        fingerprints.append(step_fingerprint(step, [fingerprints[d] for d in deps[idx]]))
+    return fingerprints
+
+
+def step_fingerprint(step: "ImplementationTask", after: list[str]) -> str:
+    """Fingerprint of one step, given the fingerprints of the steps it waits for."""
+    payload = json.dumps({
+        "filepath": normalize_path(step.filepath),
+        "task": step.task_description,
+        "depends_on": sorted(normalize_path(p) for p in step.depends_on),
+        "after": sorted(after),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RunManifest:
+    """What was last generated into a project root: prompt, plans and finished steps.
+
+    Stored next to the project root (not inside it) so it never shows up in the
+    generated project or in the coder's file listings. A manifest without a path
+    lives only in memory.
+
+    Finished steps are appended to a `.steps.jsonl` log beside the manifest, so
+    recording one costs the same however many came before; the manifest itself
+    is only rewritten when the plans change or steps are pruned, which folds
+    the log back into it.
+    """
+
+    def __init__(self, path: Optional[pathlib.Path]):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {"user_prompt": None, "plan": None, "task_plan": None, "steps": {}}
+        if path is None:
+            return
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                self.data.update(json.load(f))
+        if self.steps_path.exists():
+            with open(self.steps_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn by a crash mid-append
+                    self.data["steps"][record["fingerprint"]] = record["filepath"]
+
+    @property
+    def steps_path(self) -> Optional[pathlib.Path]:
+        return None if self.path is None else self.path.with_suffix(".steps.jsonl")
+
+    @classmethod
+    def for_project(cls, project_root: pathlib.Path, persist: bool = True) -> "RunManifest":
+        project_root = pathlib.Path(project_root)
+        return cls(project_root.with_name(project_root.name + ".manifest.json") if persist else None)
+
+    def save(self) -> None:
+        """Rewrites the manifest with every step recorded so far and empties the step log."""
+        if self.path is None:
+            return
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp, self.path)
+            # replaying the log again after a crash right here only re-adds steps the manifest has
+            self.steps_path.unlink(missing_ok=True)
+
+    def reusable_plan(self, user_prompt: str) -> Optional[dict]:
+        if self.data["user_prompt"] == user_prompt:
+            return self.data["plan"]
+        return None
+
+    def reusable_task_plan(self, plan: dict) -> Optional[dict]:
+        if self.data["plan"] == plan:
+            return self.data["task_plan"]
+        return None
+
+    def record_plan(self, user_prompt: str, plan: dict) -> None:
+        if self.data["plan"] != plan:
+            self.data["task_plan"] = None
+        self.data["user_prompt"] = user_prompt
+        self.data["plan"] = plan
+        self.save()
+
+    def record_task_plan(self, task_plan: dict) -> None:
+        self.data["task_plan"] = task_plan
+        self.save()
+
+    def is_step_done(self, fingerprint: str) -> bool:
+        return fingerprint in self.data["steps"]
+
+    def mark_step_done(self, fingerprint: str, filepath: str) -> None:
+        with self._lock:
+            self.data["steps"][fingerprint] = filepath
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.steps_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"fingerprint": fingerprint, "filepath": filepath}) + "\n")
+
+    def prune_steps(self, keep: set[str]) -> None:
+        """Forgets steps that are no longer part of the current task plan."""
+        with self._lock:
+            self.data["steps"] = {fp: path for fp, path in self.data["steps"].items() if fp in keep}
+        self.save()
@@ -0,0 +1,556 @@
+# Shell commands run by pooled, long-lived worker processes, with output caps and resource limits
+
+import atexit
+import collections
+import json
+import os
+import pathlib
+import queue
+import selectors
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+# Worker processes run this file as a script, so it sticks to the standard
+# library; the metrics module is only imported in the parent.
+
+
+class Limits(NamedTuple):
+    """Resource limits of one command; None leaves that limit alone. Applied through ulimit on POSIX systems."""
+    memory_mb: Optional[int] = 2048
+    """Address space."""
+    cpu_seconds: Optional[int] = 300
+    file_size_mb: Optional[int] = 256
+    """Largest file the command may write."""
+    open_files: Optional[int] = 1024
+
+
+class CommandResult(NamedTuple):
+    returncode: int
+    stdout: str
+    stderr: str
+    seconds: float
+    peak_memory_kb: Optional[int] = None
+    """Peak resident set size of the command and the processes it waited for, where the OS reports it."""
+    timed_out: bool = False
+    """The command ran past its timeout and was killed; the output is what it printed until then."""
+    truncated: bool = False
+
+
+class _Capture:
+    """Keeps the first and last `limit // 2` bytes of a stream, counting the bytes dropped in between."""
+
+    def __init__(self, limit: int):
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.dropped = 0
+
+    def add(self, data: bytes) -> bytes:
+        """Stores `data`, returning the part that went into the head (the part streamed live)."""
+        live = data[:self.head_limit - len(self.head)]
+        self.head += live
+        rest = data[len(live):]
+        if rest:
+            self.tail += rest
+            excess = len(self.tail) - self.tail_limit
+            if excess > 0:
+                del self.tail[:excess]
+                self.dropped += excess
+        return live
+
+    def text(self) -> str:
+        marker = f"\n[... {self.dropped} bytes truncated ...]\n".encode() if self.dropped else b""
+        return bytes(self.head + marker + self.tail).decode("utf-8", errors="replace")
+
+
+def _ulimit_prefix(limits: Limits) -> str:
+    """Shell lines setting `limits` for the command that follows (ulimit -v and -f count KiB and 512-byte blocks).
+
+    Applied by the command's own shell rather than a preexec_fn, so the worker
+    can still start it with vfork.
+    """
+    flags = (("-v", limits.memory_mb and limits.memory_mb * 1024), ("-t", limits.cpu_seconds),
+             ("-f", limits.file_size_mb and limits.file_size_mb * 2048), ("-n", limits.open_files))
+    return "".join(f"ulimit {flag} {value} 2>/dev/null\n" for flag, value in flags if value is not None)
+
+
+def _kill_group(proc: subprocess.Popen) -> None:
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _wait_selecting(proc: subprocess.Popen, captures: dict, emit, timeout: float) -> bool:
+    """Reads both pipes and waits for the exit in one thread; returns whether the command timed out.
+
+    The exit is seen through a pidfd without reaping the process, so its
+    process group id cannot be reused before the group is killed.
+    """
+    pidfd = os.pidfd_open(proc.pid)
+    deadline = time.monotonic() + timeout
+    timed_out = exited = False
+    with selectors.DefaultSelector() as selector:
+        selector.register(pidfd, selectors.EVENT_READ)
+        for name in captures:
+            selector.register(getattr(proc, name), selectors.EVENT_READ, name)
+        while len(selector.get_map()) > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if exited:
+                    break  # something outside the process group still holds the pipes
+                timed_out = exited = True
+                selector.unregister(pidfd)
+                _kill_group(proc)
+                deadline = time.monotonic() + 5
+                continue
+            for key, _ in selector.select(remaining):
+                if key.data is None:
+                    # the command exited; whatever it left running goes with it, closing the pipes
+                    exited = True
+                    selector.unregister(pidfd)
+                    _kill_group(proc)
+                    deadline = time.monotonic() + 5
+                    continue
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    continue
+                live = captures[key.data].add(chunk)
+                if live and emit is not None:
+                    emit(key.data, live.decode("utf-8", errors="replace"))
+    os.close(pidfd)
+    return timed_out
+
+
+def _wait_threaded(proc: subprocess.Popen, captures: dict, emit, timeout: float) -> bool:
+    """Fallback without pidfds: a reader thread per pipe; the process is reaped before its group is killed."""
+    def pump(name: str) -> None:
+        pipe = getattr(proc, name)
+        while chunk := pipe.read1(65536):
+            live = captures[name].add(chunk)
+            if live and emit is not None:
+                emit(name, live.decode("utf-8", errors="replace"))
+
+    readers = [threading.Thread(target=pump, args=(name,), daemon=True) for name in captures]
+    for reader in readers:
+        reader.start()
+    try:
+        proc.wait(timeout)
+        timed_out = False
+    except subprocess.TimeoutExpired:
+        timed_out = True
+    _kill_group(proc)
+    proc.wait()
+    for reader in readers:
+        reader.join(5)
+    return timed_out
+
+
+def execute(cmd: str, cwd: str, timeout: float, max_output: int, limits: Limits,
+            emit: Optional[Callable[[str, str], None]] = None) -> CommandResult:
+    """Runs `cmd` through the shell, reading its output as it arrives.
+
+    Each stream keeps at most `max_output` bytes (its start and end, with a
+    truncation marker in between); `emit(stream, text)` receives the start as
+    it is printed. The command runs in a session of its own, and whatever it
+    leaves running when it exits or times out is killed with it.
+    """
+    start = time.perf_counter()
+    posix = os.name == "posix"
+    proc = subprocess.Popen(_ulimit_prefix(limits) + cmd if posix else cmd, shell=True, cwd=cwd,
+                            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            start_new_session=posix)
+    captures = {"stdout": _Capture(max_output), "stderr": _Capture(max_output)}
+
+    peak_memory_kb = None
+    if hasattr(os, "pidfd_open"):
+        timed_out = _wait_selecting(proc, captures, emit, timeout)
+        # wait4 also reports the peak memory of the command and everything it waited for
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        peak_memory_kb = usage.ru_maxrss
+    else:
+        timed_out = _wait_threaded(proc, captures, emit, timeout)
+    for name in captures:
+        getattr(proc, name).close()
+
+    return CommandResult(
+        returncode=proc.returncode,
+        stdout=captures["stdout"].text(),
+        stderr=captures["stderr"].text(),
+        seconds=time.perf_counter() - start,
+        peak_memory_kb=peak_memory_kb,
+        timed_out=timed_out,
+        truncated=any(capture.dropped for capture in captures.values()),
+    )
+
+
+_PR_SET_CHILD_SUBREAPER = 36
+
+
+def _become_subreaper() -> bool:
+    """Makes orphaned descendants of this process its children rather than init's (Linux only)."""
+    try:
+        import ctypes
+
+        return ctypes.CDLL(None, use_errno=True).prctl(_PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def _move_fd(fd: int, lowest: int) -> int:
+    import fcntl
+
+    moved = fcntl.fcntl(fd, fcntl.F_DUPFD_CLOEXEC, lowest)
+    os.close(fd)
+    return moved
+
+
+def _children_path() -> str:
+    return f"/proc/self/task/{os.getpid()}/children"
+
+
+class _Shell:
+    """A long-lived /bin/sh owned by a worker; each command runs in a subshell forked from it.
+
+    No shell is started per command, and `$$` is the same for every command
+    of a worker; a command's `cd` or `export` still stays in its subshell.
+    The subshell is orphaned as soon as it starts and, the worker being a
+    child subreaper, becomes the worker's child: the worker waits for it
+    through a pidfd, gets its exit status and peak memory from wait4, and
+    finds whatever it leaves running among its own children. Output goes
+    through two pipes kept for the shell's lifetime; the subshell's pid comes
+    back on a third, and it waits for a line on a fourth before starting the
+    command, so it cannot exit (and be reaped) before it has been reparented.
+    """
+
+    def __init__(self):
+        script_r, self._script = os.pipe()
+        self._control, control_w = os.pipe()
+        go_r, self._go = os.pipe()
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        # fd 1 of the shell answers the worker; commands write to fd 3 (stdout) and 2 (stderr)
+        # and start once fd 4 has a line. Moved above 9 first, so neither is overwritten before it is dup'ed.
+        out_w, go_r = (_move_fd(fd, 10) for fd in (out_w, go_r))
+        self.pid = os.posix_spawn("/bin/sh", ["sh"], os.environ, setsid=True, file_actions=[
+            (os.POSIX_SPAWN_DUP2, script_r, 0), (os.POSIX_SPAWN_DUP2, control_w, 1),
+            (os.POSIX_SPAWN_DUP2, err_w, 2), (os.POSIX_SPAWN_DUP2, out_w, 3), (os.POSIX_SPAWN_DUP2, go_r, 4),
+        ])
+        for fd in (script_r, control_w, go_r, out_w, err_w):
+            os.close(fd)
+        self.pipes = {"stdout": out_r, "stderr": err_r}
+        for fd in self.pipes.values():
+            os.set_blocking(fd, False)
+        self._exited = False
+
+    def alive(self) -> bool:
+        if not self._exited:
+            self._exited = os.waitpid(self.pid, os.WNOHANG)[0] != 0
+        return not self._exited
+
+    def _read_pid(self) -> int:
+        line = b""
+        while not line.endswith(b"\n"):
+            chunk = os.read(self._control, 64)
+            if not chunk:
+                raise RuntimeError("the worker's shell exited")
+            line += chunk
+        return int(line)
+
+    def _read(self, name: str, captures: dict, emit) -> bool:
+        """Reads what is waiting on one output pipe; returns whether there was anything."""
+        try:
+            chunk = os.read(self.pipes[name], 65536)
+        except BlockingIOError:
+            return False
+        live = captures[name].add(chunk)
+        if live and emit is not None:
+            emit(name, live.decode("utf-8", errors="replace"))
+        return bool(chunk)
+
+    def _kill_leftovers(self) -> None:
+        """Kills what commands left running, which the worker has inherited as children."""
+        while True:
+            with open(_children_path(), encoding="ascii") as f:
+                pids = [pid for pid in map(int, f.read().split()) if pid != self.pid]
+            if not pids:
+                return
+            # their own children are reparented to the worker as they die, and caught by the next round
+            for pid in pids:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            for pid in pids:
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+
+    def run(self, cmd: str, cwd: str, timeout: float, max_output: int, limits: Limits,
+            emit: Optional[Callable[[str, str], None]] = None) -> CommandResult:
+        """Same contract as execute()."""
+        start = time.perf_counter()
+        os.write(self._script, (
+            f"pid=$( ( read -r _ <&4; exec 4<&-\n{_ulimit_prefix(limits)}cd -- {shlex.quote(cwd)} && eval {shlex.quote(cmd)}\n"
+            ") </dev/null >&3 3>&- & echo $! )\n"
+            'echo "$pid"\n'
+        ).encode("utf-8"))
+        # printed once the subshell that started the command has exited, so the command is our child now
+        pid = self._read_pid()
+        os.write(self._go, b"\n")
+        captures = {"stdout": _Capture(max_output), "stderr": _Capture(max_output)}
+
+        pidfd = os.pidfd_open(pid)
+        deadline = time.monotonic() + timeout
+        timed_out = False
+        with selectors.DefaultSelector() as selector:
+            selector.register(pidfd, selectors.EVENT_READ)
+            for name, fd in self.pipes.items():
+                selector.register(fd, selectors.EVENT_READ, name)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    os.kill(pid, signal.SIGKILL)
+                    break
+                events = selector.select(remaining)
+                if any(key.data is None for key, _ in events):
+                    break
+                for key, _ in events:
+                    self._read(key.data, captures, emit)
+        os.close(pidfd)
+
+        _, status, usage = os.wait4(pid, 0)
+        self._kill_leftovers()
+        # the pipes outlive the command, so its output ends where they run dry rather than at EOF
+        for name in self.pipes:
+            while self._read(name, captures, emit):
+                pass
+        return CommandResult(
+            returncode=os.waitstatus_to_exitcode(status),
+            stdout=captures["stdout"].text(),
+            stderr=captures["stderr"].text(),
+            seconds=time.perf_counter() - start,
+            peak_memory_kb=usage.ru_maxrss,
+            timed_out=timed_out,
+            truncated=any(capture.dropped for capture in captures.values()),
+        )
+
+    def close(self) -> None:
+        if self.alive():
+            os.kill(self.pid, signal.SIGKILL)
+            os.waitpid(self.pid, 0)
+        for fd in (self._script, self._control, self._go, *self.pipes.values()):
+            os.close(fd)
+
+
+def _persistent_shell_supported() -> bool:
+    return (hasattr(os, "pidfd_open") and hasattr(os, "posix_spawn") and os.path.exists(_children_path())
+            and _become_subreaper())
+
+
+def _serve() -> None:
+    """Worker loop: a JSON request per line on stdin; output chunks, then the result, as JSON lines on stdout.
+
+    Commands run in the worker's persistent shell where the platform allows
+    (Linux), and through a shell started per command otherwise.
+    """
+    lock = threading.Lock()
+
+    def send(message: dict) -> None:
+        with lock:
+            sys.stdout.write(json.dumps(message) + "\n")
+            sys.stdout.flush()
+
+    persistent = _persistent_shell_supported()
+    shell: Optional[_Shell] = None
+    for line in sys.stdin:
+        request = json.loads(line)
+        try:
+            run = execute
+            if persistent:
+                if shell is None or not shell.alive():
+                    if shell is not None:
+                        shell.close()
+                    shell = _Shell()
+                run = shell.run
+            result = run(request["cmd"], request["cwd"], request["timeout"], request["max_output"],
+                         Limits(*request["limits"]),
+                         emit=lambda stream, data: send({"stream": stream, "data": data}))
+            send({"result": result._asdict()})
+        except Exception as e:
+            send({"error": f"{type(e).__name__}: {e}"})
+    if shell is not None:
+        shell.close()
+
+
+class _Worker:
+    def __init__(self):
+        self.process = subprocess.Popen([sys.executable, "-I", os.path.abspath(__file__)],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        text=True, encoding="utf-8", bufsize=1)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, request: dict, on_output: Optional[Callable[[str, str], None]]) -> CommandResult:
+        self.process.stdin.write(json.dumps(request) + "\n")
+        self.process.stdin.flush()
+        for line in self.process.stdout:
+            message = json.loads(line)
+            if "stream" in message:
+                if on_output is not None:
+                    on_output(message["stream"], message["data"])
+            elif "error" in message:
+                raise RuntimeError(f"Command could not be run: {message['error']}")
+            else:
+                return CommandResult(**message["result"])
+        raise RuntimeError(f"Command worker exited with {self.process.wait()}")
+
+    def close(self) -> None:
+        try:
+            self.process.stdin.close()
+            self.process.wait(2)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+
+
+class CommandPool:
+    """Long-lived worker processes that run the shell commands of one workspace.
+
+    A worker is a small Python process keeping a shell of its own (see _Shell),
+    so a command never forks the (much larger, multi-threaded) agent process
+    and, on Linux, never starts a new shell either.
+    Workers start on demand, up to `size`; a command waits for a free one.
+    """
+
+    def __init__(self, root: str, size: int = 2, max_output: int = 32000, limits: Limits = Limits()):
+        self.root = root
+        self.size = size
+        self.max_output = max_output
+        self.limits = limits
+        self._idle: queue.LifoQueue[_Worker] = queue.LifoQueue()
+        self._started = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _start_worker(self) -> _Worker:
+        from agent import metrics
+
+        try:
+            worker = _Worker()
+        except Exception:
+            with self._lock:
+                self._started -= 1
+            raise
+        metrics.incr("command_workers_started")
+        return worker
+
+    def _acquire(self) -> _Worker:
+        while True:
+            with self._lock:
+                start = self._idle.empty() and self._started < self.size
+                if start:
+                    self._started += 1
+            worker = self._start_worker() if start else self._idle.get()
+            if worker.alive():
+                return worker
+            self._release(worker)  # died while idle; frees its slot
+
+    def _release(self, worker: _Worker) -> None:
+        with self._lock:
+            keep = worker.alive() and not self._closed
+            if not keep:
+                self._started -= 1
+        if keep:
+            self._idle.put(worker)
+        else:
+            worker.close()
+
+    def run(self, cmd: str, cwd: Optional[str] = None, timeout: float = 30,
+            on_output: Optional[Callable[[str, str], None]] = None) -> CommandResult:
+        """Runs `cmd` in `cwd` (default: the workspace root) on a free worker."""
+        from agent import metrics
+
+        start = time.perf_counter()
+        worker = self._acquire()
+        try:
+            result = worker.run({"cmd": cmd, "cwd": cwd or self.root, "timeout": timeout,
+                                 "max_output": self.max_output, "limits": list(self.limits)}, on_output)
+        finally:
+            self._release(worker)
+
+        status = "timeout" if result.timed_out else "ok" if result.returncode == 0 else "error"
+        metrics.observe("command_seconds", time.perf_counter() - start, status=status)
+        if result.peak_memory_kb is not None:
+            metrics.observe("command_peak_memory_mb", result.peak_memory_kb / 1024)
+        if result.truncated:
+            metrics.incr("command_output_truncated")
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+# Pools of the most recently used workspaces; older ones are closed so batch runs do not pile up workers
+_pools: collections.OrderedDict[str, CommandPool] = collections.OrderedDict()
+_pools_lock = threading.Lock()
+
+
+def get_command_pool(root: str | os.PathLike) -> CommandPool:
+    """The command pool of the workspace at `root`, configured from the environment.
+
+    CMD_WORKERS (2) workers per workspace, for at most CMD_MAX_POOLS (8)
+    workspaces; CMD_MAX_OUTPUT_BYTES (32000) per stream; CMD_MEMORY_MB (2048),
+    CMD_CPU_SECONDS (300) and CMD_FILE_SIZE_MB (256) limit each command.
+    """
+    key = str(pathlib.Path(root).resolve())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None:
+            _pools.move_to_end(key)
+            return pool
+        pool = _pools[key] = CommandPool(
+            key,
+            size=int(os.getenv("CMD_WORKERS", "2")),
+            max_output=int(os.getenv("CMD_MAX_OUTPUT_BYTES", "32000")),
+            limits=Limits(memory_mb=int(os.getenv("CMD_MEMORY_MB", "2048")) or None,
+                          cpu_seconds=int(os.getenv("CMD_CPU_SECONDS", "300")) or None,
+                          file_size_mb=int(os.getenv("CMD_FILE_SIZE_MB", "256")) or None),
+        )
+        evicted = []
+        while len(_pools) > int(os.getenv("CMD_MAX_POOLS", "8")):
+            evicted.append(_pools.popitem(last=False)[1])
+    for old in evicted:
+        old.close()
+    return pool
+
+
+@atexit.register
+def close_command_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+if __name__ == "__main__":
+    _serve()
@@ -0,0 +1,137 @@
+# Token-budgeted prompt context for a single coder step
+
+import os
+from typing import Iterable, Optional
+
+from pydantic import BaseModel, Field
+
+from agent.states import ImplementationTask, Plan
+from agent.symbols import Symbol, format_outline
+from agent.workspace import Workspace
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("CODER_CONTEXT_TOKENS", "6000"))
+
+# Share of the budget left after the task and plan that the target file may use
+_TARGET_SHARE = 0.7
+
+class StepContext(BaseModel):
+    text: str = Field(description="The packed prompt context")
+    tokens: int = Field(description="Estimated tokens used by `text`")
+    budget: int = Field(description="Token budget it was packed to")
+    sections: dict[str, int] = Field(default_factory=dict, description="Estimated tokens per section")
+    elided: list[str] = Field(default_factory=list, description="Files that were cut down or left out")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token), good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+
+def summarize_file(content: str, symbols: Optional[list[Symbol]], max_lines: int = 20) -> str:
+    """Compact outline of a file: its symbols, or its first lines if it defines none."""
+    if symbols:
+        lines = format_outline(symbols).splitlines()
+    else:
+        lines = [line.strip()[:120] for line in content.splitlines() if line.strip()][:3]
+    if len(lines) > max_lines:
+        lines = lines[:max_lines] + [f"... {len(lines) - max_lines} more"]
+    return "\n".join(lines)
+
+
+def elide(path: str, content: str, max_tokens: int) -> str:
+    """Keeps the head and tail of `content` within `max_tokens` and marks the gap."""
+    if estimate_tokens(content) <= max_tokens:
+        return content
+    lines = content.splitlines(keepends=True)
+    head_chars = tail_chars = max_tokens * 4 // 2
+    head, size = [], 0
+    for line in lines:
+        if size + len(line) > head_chars:
+            break
+        head.append(line)
+        size += len(line)
+    tail, size = [], 0
+    for line in reversed(lines[len(head):]):
+        if size + len(line) > tail_chars:
+            break
+        tail.append(line)
+        size += len(line)
+    tail.reverse()
+    gap_start, gap_end = len(head) + 1, len(lines) - len(tail)
+    marker = (f"\n[... lines {gap_start}-{gap_end} elided; "
+              f"open_file(path=\"{path}\", line_start={gap_start}, line_end={gap_end}) to read them ...]\n")
+    return "".join(head) + marker + "".join(tail)
+
+
+def _plan_section(plan: Optional[Plan], filepath: str) -> str:
+    if plan is None:
+        return ""
+    parts = [f"Project: {plan.name} - {plan.description}", f"Tech stack: {plan.techstack}"]
+    purpose = next((f.purpose for f in plan.files if f.path == filepath), None)
+    if purpose:
+        parts.append(f"Purpose of {filepath}: {purpose}")
+    return "\n".join(parts)
+
+
+def build_step_context(task: ImplementationTask, workspace: Workspace, plan: Optional[Plan] = None,
+                       related: Iterable[str] = (), budget: int = DEFAULT_TOKEN_BUDGET) -> StepContext:
+    """Packs what the coder needs for `task` into roughly `budget` tokens.
+
+    In order of priority: the task itself, the relevant part of the plan, the
+    current content of the target file (head and tail kept if it is too large),
+    outlines of the related files and finally the names of the other files in
+    the project. Lower-priority sections are shortened or dropped to fit.
+    """
+    sections: dict[str, str] = {}
+    elided: list[str] = []
+    related = list(dict.fromkeys(related))
+
+    sections["task"] = f"Task: {task.task_description}\nFile: {task.filepath}"
+    plan_text = _plan_section(plan, task.filepath)
+    if plan_text:
+        sections["plan"] = plan_text
+    remaining = budget - sum(estimate_tokens(text) for text in sections.values())
+
+    content = workspace.read(task.filepath)
+    if content is None:
+        sections["target"] = "Existing content: (new file)"
+    else:
+        allowed = max(int(remaining * _TARGET_SHARE), 200)
+        shown = elide(task.filepath, content, allowed)
+        if shown is not content:
+            elided.append(task.filepath)
+        sections["target"] = f"Existing content of {task.filepath}:\n{shown}"
+    remaining -= estimate_tokens(sections["target"])
+
+    summaries = []
+    for path in related:
+        if path == task.filepath:
+            continue
+        related_content = workspace.read(path)
+        if related_content is None:
+            continue
+        summary = f"--- {path}\n{summarize_file(related_content, workspace.outline(path))}"
+        if estimate_tokens(summary) > remaining:
+            elided.append(path)
+            continue
+        summaries.append(summary)
+        remaining -= estimate_tokens(summary)
+    if summaries:
+        sections["related"] = "Related files (outline):\n" + "\n".join(summaries)
+
+    others = [p for p in workspace.list_files() if p != task.filepath and p not in related]
+    if others:
+        listing = "Other project files: " + ", ".join(others)
+        if estimate_tokens(listing) > remaining:
+            listing = listing[:max(remaining, 0) * 4].rsplit(", ", 1)[0] + ", ..."
+        if remaining > 0:
+            sections["files"] = listing
+
+    text = "\n\n".join(sections.values())
+    return StepContext(
+        text=text,
+        tokens=estimate_tokens(text),
+        budget=budget,
+        sections={name: estimate_tokens(value) for name, value in sections.items()},
+        elided=elided,
+    )
@@ -0,0 +1,184 @@
+# Incrementally maintained index of the files in a project tree
+
+import fnmatch
+import os
+import pathlib
+import posixpath
+import threading
+import time
+from typing import Iterable, Optional
+
+# Directories and files that are never walked or listed
+DEFAULT_IGNORE = (
+    ".git", ".hg", ".svn", "node_modules", ".venv", "venv", "__pycache__",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox", ".nox", ".next", ".nuxt",
+    ".cache", ".parcel-cache", ".idea", ".vscode", "*.egg-info", "*.pyc", ".DS_Store",
+)
+
+
+def _parent(rel: str) -> str:
+    return posixpath.dirname(rel) or "."
+
+
+def _join(directory: str, name: str) -> str:
+    return name if directory == "." else f"{directory}/{name}"
+
+
+class FileIndex:
+    """Directory tree of a project, answered from memory.
+
+    The tree is walked once, then kept current by `add()` from the write path.
+    Changes made behind its back (a shell command, an editor) are picked up by
+    comparing directory mtimes at most every `refresh_interval` seconds and
+    re-scanning only the directories that changed. Ignored names are never walked.
+    """
+
+    def __init__(self, root: Optional[str | os.PathLike], ignore: Iterable[str] = DEFAULT_IGNORE,
+                 refresh_interval: float = 1.0):
+        self.root = pathlib.Path(root) if root is not None else None
+        self.ignore = tuple(ignore)
+        self.refresh_interval = refresh_interval
+        self._subdirs: dict[str, set[str]] = {}
+        self._files: dict[str, set[str]] = {}
+        self._mtimes: dict[str, int] = {}
+        self._unflushed: set[str] = set()
+        self._built = False
+        self._last_refresh = 0.0
+        self._lock = threading.RLock()
+
+    def is_ignored(self, name: str) -> bool:
+        return any(name == pattern or fnmatch.fnmatchcase(name, pattern) for pattern in self.ignore)
+
+    def covers(self, rel: str) -> bool:
+        """Whether the index can tell if `rel` exists: false below an ignored name, which is never walked."""
+        return not any(self.is_ignored(name) for name in rel.split("/"))
+
+    # -- queries ---------------------------------------------------------------
+
+    def is_dir(self, rel: str) -> bool:
+        with self._lock:
+            self._ensure_current()
+            return rel in self._subdirs
+
+    def has_file(self, rel: str) -> bool:
+        with self._lock:
+            self._ensure_current()
+            return posixpath.basename(rel) in self._files.get(_parent(rel), ())
+
+    def listdir(self, rel: str = ".") -> tuple[list[str], list[str]]:
+        with self._lock:
+            self._ensure_current()
+            return sorted(self._subdirs.get(rel, ())), sorted(self._files.get(rel, ()))
+
+    def files_under(self, rel: str = ".") -> list[str]:
+        with self._lock:
+            self._ensure_current()
+            found, stack = [], [rel] if rel in self._subdirs else []
+            while stack:
+                directory = stack.pop()
+                found.extend(_join(directory, name) for name in self._files[directory])
+                stack.extend(_join(directory, name) for name in self._subdirs[directory])
+            return sorted(found)
+
+    # -- updates from the write path ------------------------------------------
+
+    def add(self, rel: str, flushed: bool = False) -> None:
+        """Records a file written through the workspace (possibly not on disk yet)."""
+        with self._lock:
+            self._ensure_current()
+            directory = self._add_dirs(_parent(rel))
+            self._files[directory].add(posixpath.basename(rel))
+            if not flushed:
+                self._unflushed.add(rel)
+
+    def mark_flushed(self, rels: Iterable[str]) -> None:
+        with self._lock:
+            self._unflushed.difference_update(rels)
+
+    def refresh(self, force: bool = False) -> None:
+        """Re-scans directories whose mtime changed since they were last read."""
+        with self._lock:
+            if force:
+                self._last_refresh = 0.0
+            self._ensure_current()
+
+    # -- internals ------------------------------------------------------------
+
+    def _ensure_current(self) -> None:
+        if not self._built:
+            self._subdirs["."] = set()
+            self._files["."] = set()
+            if self.root is not None:
+                self._scan(".", recursive=True)
+            self._built = True
+            self._last_refresh = time.monotonic()
+        elif self.root is not None and time.monotonic() - self._last_refresh >= self.refresh_interval:
+            for rel, mtime in list(self._mtimes.items()):
+                if rel not in self._mtimes:
+                    continue  # dropped together with a removed parent
+                try:
+                    current = os.stat(self._disk_path(rel)).st_mtime_ns
+                except OSError:
+                    current = None
+                if current != mtime:
+                    self._scan(rel, recursive=False)
+            self._last_refresh = time.monotonic()
+
+    def _disk_path(self, rel: str) -> pathlib.Path:
+        return self.root if rel == "." else self.root / rel
+
+    def _add_dirs(self, rel: str) -> str:
+        if rel not in self._subdirs:
+            parent = self._add_dirs(_parent(rel)) if rel != "." else None
+            self._subdirs[rel] = set()
+            self._files[rel] = set()
+            if parent is not None:
+                self._subdirs[parent].add(posixpath.basename(rel))
+        return rel
+
+    def _drop_dir(self, rel: str) -> None:
+        for name in self._subdirs.pop(rel, ()):
+            self._drop_dir(_join(rel, name))
+        self._files.pop(rel, None)
+        self._mtimes.pop(rel, None)
+
+    def _scan(self, rel: str, recursive: bool) -> None:
+        path = self._disk_path(rel)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                entries = [(entry.name, entry.is_dir(follow_symlinks=False)) for entry in it]
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            entries, mtime = None, None
+
+        # files written but not flushed yet are not on disk and must survive the re-scan
+        prefix = "" if rel == "." else rel + "/"
+        pending, pending_dirs = set(), set()
+        for f in self._unflushed:
+            if f.startswith(prefix):
+                head, sep, _ = f[len(prefix):].partition("/")
+                (pending_dirs if sep else pending).add(head)
+
+        if entries is None and not pending and not pending_dirs and rel != ".":
+            parent = _parent(rel)
+            self._subdirs.get(parent, set()).discard(posixpath.basename(rel))
+            self._drop_dir(rel)
+            return
+
+        self._add_dirs(rel)
+        if mtime is not None:
+            self._mtimes[rel] = mtime
+        disk_dirs = {name for name, is_dir in entries or () if is_dir and not self.is_ignored(name)}
+        disk_files = {name for name, is_dir in entries or () if not is_dir and not self.is_ignored(name)}
+
+        subdirs = disk_dirs | pending_dirs
+        for removed in self._subdirs[rel] - subdirs:
+            self._drop_dir(_join(rel, removed))
+        known = set(self._subdirs[rel])
+        self._subdirs[rel] = subdirs
+        self._files[rel] = disk_files | pending
+
+        for name in disk_dirs:
+            child = _join(rel, name)
+            if recursive or name not in known or child not in self._mtimes:
+                self._scan(child, recursive=True)
@@ -1,143 +1,575 @@
-from dotenv import load_dotenv
-from langchain.globals import set_verbose, set_debug
-from langchain_groq.chat_models import ChatGroq
-from langgraph.constants import END
-from langgraph.graph import StateGraph
-from langgraph.prebuilt import create_react_agent
+import contextvars
+import functools
+import json
+from typing import Optional
 
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
+
+from agent import metrics
+from agent.checkpoint import RunManifest, step_fingerprint, step_fingerprints
+from agent.context import build_step_context
+from agent.hedging import hedge_from_env
+from agent.plan_library import plan_library_from_env
+from agent.plan_stream import StepStreamParser, tool_call_args
+from agent.llm_cache import CacheMissError, cache_from_env
 from agent.prompts import *
+from agent.rate_limit import classify_error, get_rate_limiter, wait_before_retry, with_retries
+from agent.routing import Route, model_for, route_step
+from agent.scheduler import (DEFAULT_MAX_CONCURRENCY, DependencyTracker, build_dependency_graph,
+                             critical_path_length, run_dag, run_dag_stream)
 from agent.states import *
-from agent.tools import (write_file, write_file_no_prefix,
-                        read_file, read_file_no_prefix,
-                        get_current_directory, get_current_directory_no_prefix,
-                        list_file, list_file_no_prefix,
-                        print_tree, print_tree_no_prefix,
-                        open_file, open_file_no_prefix)
+from agent.tools import add_write_hook, get_workspace, write_file
+from agent.toolsets import TOOLSETS, get_coder_agent, schema_savings, toolset_for_step
+from agent.validation import FileCheck, get_validator, placeholder
+
+
+# The LLM client and the compiled graph are built on first use rather than at
+# import time, so `main.py --help` and the app's first render stay fast.
+@functools.cache
+def get_llm_cache():
+    return cache_from_env()
+
+
+@functools.cache
+def get_plan_library():
+    return plan_library_from_env()
+
+
+# Chat model used instead of the Groq client when set, e.g. by the offline benchmarks
+_llm_override = None
+
+
+def set_llm(llm) -> None:
+    """Makes every node use `llm`; None restores the default Groq client."""
+    global _llm_override
+    _llm_override = llm
+
+
+def get_llm(model: Optional[str] = None):
+    """The chat model named `model` (default: the coder's), or the override when one is set."""
+    if _llm_override is not None:
+        return _llm_override
+    return _default_llm(model or model_for("coder"))
+
+
+@functools.cache
+def _default_llm(model: str):
+    from dotenv import load_dotenv
+    from langchain_groq.chat_models import ChatGroq
+
+    _ = load_dotenv()
+    if not metrics.configured():
+        metrics.configure_from_env()
+
+    # retries happen here rather than inside the client, so they can back off
+    # through the limiter that every concurrent run shares
+    limiter = get_rate_limiter()
+    llm = ChatGroq(model=model, cache=get_llm_cache(), max_retries=0,
+                   rate_limiter=limiter, callbacks=[limiter] if limiter else None)
+    return hedge_from_env(llm)
+
+# Stream writer of the running coder node; progress events sent through it reach
+# callers of agent.stream(..., stream_mode="custom").
+_progress_writer = contextvars.ContextVar("progress_writer", default=None)
+
+
+def _emit_progress(event: str, **data) -> None:
+    writer = _progress_writer.get()
+    if writer is not None:
+        writer({"event": event, **data})
+
+
+def _on_file_written(path: str, content: str) -> None:
+    _emit_progress("file_written", path=path, size=len(content))
 
-_ = load_dotenv()
 
-set_debug(True)
-set_verbose(True)
+add_write_hook(_on_file_written)
 
-llm = ChatGroq(model="openai/gpt-oss-120b")
+def _run_manifest() -> RunManifest:
+    workspace = get_workspace()
+    return RunManifest.for_project(workspace.root, persist=not workspace.in_memory)
 
-def planner_agent(state: dict) -> dict:
+
+def _is_incremental(config: RunnableConfig) -> bool:
+    return config.get("configurable", {}).get("incremental", False)
+
+
+def planner_agent(state: AgentState, config: RunnableConfig) -> dict:
     """Converts user prompt into a structured Plan."""
     user_prompt = state["user_prompt"]
-    resp = llm.with_structured_output(Plan).invoke(
-        planner_prompt(user_prompt)
-    )
+    manifest = _run_manifest()
+
+    previous = manifest.reusable_plan(user_prompt) if _is_incremental(config) else None
+    if previous is not None:
+        print("♻️  Prompt unchanged, reusing previous plan")
+        return {"plan": Plan.model_validate(previous), "task_plan": None}
+
+    library = get_plan_library()
+    match = library.lookup(user_prompt) if library is not None else None
+    if match is not None and match.reuse:
+        # the architect picks up the task plan from the state instead of generating one
+        print(f"📚 Reusing the plans of a similar prompt (similarity {match.similarity:.2f}): {match.prompt[:60]!r}")
+        manifest.record_plan(user_prompt, match.plan)
+        return {"plan": Plan.model_validate(match.plan), "task_plan": TaskPlan.model_validate(match.task_plan)}
+    if match is not None:
+        print(f"📚 Adapting the plan of a similar prompt (similarity {match.similarity:.2f}): {match.prompt[:60]!r}")
+
+    resp = with_retries(lambda: get_llm(model_for("planner")).with_structured_output(Plan).invoke(
+        planner_prompt(user_prompt) if match is None
+        else planner_prompt(user_prompt, match.prompt, json.dumps(match.plan))
+    ), "planner")
     if resp is None:
         raise ValueError("Planner did not return a valid response.")
-    return {"plan": resp}
+    manifest.record_plan(user_prompt, resp.model_dump())
+    return {"plan": resp, "task_plan": None}
 
 
-def architect_agent(state: dict) -> dict:
+def architect_agent(state: AgentState, config: RunnableConfig) -> dict:
     """Creates TaskPlan from Plan."""
     plan: Plan = state["plan"]
-    resp = llm.with_structured_output(TaskPlan).invoke(
-        architect_prompt(plan=plan.model_dump_json())
-    )
-    if resp is None:
-        raise ValueError("Planner did not return a valid response.")
+    manifest = _run_manifest()
 
-    resp.plan = plan
-    print(resp.model_dump_json())
+    previous = manifest.reusable_task_plan(plan.model_dump()) if _is_incremental(config) else None
+    if state.get("task_plan") is not None:
+        resp = state["task_plan"]  # reused from the plan library by the planner
+        manifest.record_task_plan(resp.model_dump())
+    elif previous is not None:
+        print("♻️  Plan unchanged, reusing previous task plan")
+        resp = TaskPlan.model_validate(previous)
+    else:
+        resp = with_retries(lambda: get_llm(model_for("architect")).with_structured_output(TaskPlan).invoke(
+            architect_prompt(plan=plan.model_dump_json())
+        ), "architect")
+        if resp is None:
+            raise ValueError("Planner did not return a valid response.")
+        manifest.record_task_plan(resp.model_dump())
+        _remember_plans(state["user_prompt"], plan, resp)
+
+    if metrics.debug_enabled():
+        print(resp.model_dump_json())
     return {"task_plan": resp}
 
 
-def coder_agent(state: dict) -> dict:
-    """LangGraph tool-using coder agent."""
-    coder_state: CoderState = state.get("coder_state")
-    if coder_state is None:
-        coder_state = CoderState(task_plan=state["task_plan"], current_step_idx=0)
+def _remember_plans(user_prompt: str, plan: Plan, task_plan: TaskPlan) -> None:
+    library = get_plan_library()
+    if library is not None:
+        library.add(user_prompt, plan.model_dump(), task_plan.model_dump())
+
 
-    steps = coder_state.task_plan.implementation_steps
-    if coder_state.current_step_idx >= len(steps):
-        return {"coder_state": coder_state, "status": "DONE"}
+def _log_route(task: ImplementationTask, route: Route) -> None:
+    print(f"🧭 [{task.filepath}] {route.model} ({route.reason})")
+    metrics.incr("coder_routes", model=route.model, fast=route.fast)
+    _emit_progress("step_route", filepath=task.filepath, model=route.model, reason=route.reason)
 
-    current_task = steps[coder_state.current_step_idx]
-    existing_content = read_file.run(current_task.filepath)
+
+def _run_step(task: ImplementationTask, plan: Optional[Plan] = None, related: list[str] = (),
+              escalate: bool = False) -> bool:
+    """Runs the ReAct coder on a single implementation step.
+
+    Simple steps go to the fast coder model when one is configured; a failed
+    attempt (or `escalate`) moves the step to the full coder model.
+    """
+    workspace = get_workspace()
+    file_exists = workspace.exists(task.filepath)
+    # target file, plan excerpt and outlines of related files, packed to the token budget
+    context = build_step_context(task, workspace, plan=plan, related=related)
+    print(f"📦 [{task.filepath}] context {context.tokens}/{context.budget} tokens"
+          + (f", elided {', '.join(context.elided)}" if context.elided else ""))
+    _emit_progress("step_context", filepath=task.filepath, tokens=context.tokens,
+                   budget=context.budget, sections=context.sections, elided=context.elided)
 
     system_prompt = coder_system_prompt()
-    user_prompt = (
-        f"Task: {current_task.task_description}\n"
-        f"File: {current_task.filepath}\n"
-        f"Existing content:\n{existing_content}\n"
-        "Use write_file(path, content) to save your changes."
-    )
-
-    coder_tools = [
-        read_file, read_file_no_prefix,
-        write_file, write_file_no_prefix,
-        list_file, list_file_no_prefix,
-        get_current_directory, get_current_directory_no_prefix,
-        print_tree, print_tree_no_prefix,
-        open_file, open_file_no_prefix
-    ]
-    react_agent = create_react_agent(llm, coder_tools)
+    if file_exists:
+        # only the changed region goes back out, so output tokens do not grow with the file
+        save_instruction = ("The file already exists. Change only what the task needs with "
+                            "edit_file(path, old_str, new_str) or apply_patch(path, patch); "
+                            "do not rewrite the whole file with write_file.")
+    else:
+        save_instruction = "Use write_file(path, content) to save your changes."
+    # one schema per tool, only the tools this kind of step needs; the agent is built once per set
+    toolset = toolset_for_step(file_exists)
+    if "run_cmd" in TOOLSETS[toolset]:
+        save_instruction += " You may run the project's tests or build with run_cmd(cmd) to check your change."
+    user_prompt = f"{context.text}\n\n{save_instruction}"
+
+    advertised, before = schema_savings(toolset)
+    route = route_step(task, context.tokens, escalate=escalate)
+    _log_route(task, route)
+    react_agent = get_coder_agent(get_llm(route.model), toolset)
 
     # CRITICAL: Add retry logic to handle model failures
     max_retries = 3
-    success = False
+    # rate-limited and transient failures back off and resend the same prompt, on their own budget
+    max_throttle_retries = 6
+    attempt = throttled = 0
 
-    for attempt in range(max_retries):
+    while attempt < max_retries:
         try:
-            react_agent.invoke({
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ]
-            })
-            success = True
-            break  # Success - exit retry loop
+            with metrics.timed("coder_attempt_seconds", model=route.model):
+                result = react_agent.invoke({
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ]
+                })
+            model_calls = sum(1 for m in result["messages"] if m.type == "ai")
+            metrics.incr("tool_schema_tokens_saved", (before - advertised) * model_calls, toolset=toolset)
+            return True
 
+        except CacheMissError:
+            raise
         except Exception as e:
             error_msg = str(e)
-            print(f"\n⚠️  Attempt {attempt + 1}/{max_retries} failed")
+            kind = classify_error(e)
+            metrics.incr("coder_step_attempt_failures", error=type(e).__name__, kind=kind)
+            if kind == "fatal":
+                raise
+            if kind in ("rate_limit", "transient") and throttled < max_throttle_retries:
+                delay = wait_before_retry(e, throttled)
+                throttled += 1
+                print(f"⏳ [{task.filepath}] {kind} ({type(e).__name__}), retrying in {delay:.1f}s")
+                continue
+
+            attempt += 1
+            print(f"\n⚠️  [{task.filepath}] Attempt {attempt}/{max_retries} failed")
             print(f"Error: {error_msg[:150]}...")
 
-            if attempt < max_retries - 1:
+            if attempt < max_retries:
+                if route.fast:
+                    route = route_step(task, context.tokens, escalate=True)
+                    _log_route(task, route)
+                    metrics.incr("coder_escalations")
+                    react_agent = get_coder_agent(get_llm(route.model), toolset)
                 print("🔄 Retrying with simplified prompt...")
                 # Simplify the prompt for retry
-                user_prompt = (
-                    f"Create file: {current_task.filepath}\n"
-                    f"Task: {current_task.task_description}\n"
-                    "IMPORTANT: Call write_file with ONLY path and content parameters. No other parameters."
-                )
+                if file_exists:
+                    user_prompt = (
+                        f"Update file: {task.filepath}\n"
+                        f"Task: {task.task_description}\n"
+                        "IMPORTANT: Call edit_file with ONLY path, old_str and new_str parameters. No other parameters."
+                    )
+                else:
+                    user_prompt = (
+                        f"Create file: {task.filepath}\n"
+                        f"Task: {task.task_description}\n"
+                        "IMPORTANT: Call write_file with ONLY path and content parameters. No other parameters."
+                    )
             else:
                 print(f"❌ Failed after {max_retries} attempts. Skipping this step.")
+                metrics.incr("coder_steps_failed")
+                if file_exists:
+                    # keep what earlier steps wrote rather than replacing it with a placeholder
+                    break
                 # Try to write a basic file directly as fallback
                 try:
-                    basic_content = f"// TODO: Implement {current_task.task_description}\n"
-                    write_file.invoke({"path": current_task.filepath, "content": basic_content})
-                    print(f"✅ Created placeholder file: {current_task.filepath}")
+                    basic_content = placeholder(task.filepath, task.task_description)
+                    write_file.invoke({"path": task.filepath, "content": basic_content})
+                    print(f"✅ Created placeholder file: {task.filepath}")
                 except:
                     print(f"⚠️  Could not create placeholder file")
+    return False
+
+
+def _step_runner(steps: list[ImplementationTask], deps: list[set[int]], fingerprints: list[str],
+                 plan: Optional[Plan], coder_state: CoderState, manifest: RunManifest):
+    """The function the scheduler calls for step `idx`; the lists may still be growing."""
+    workspace = get_workspace()
+
+    def run_step(idx: int) -> bool:
+        print(f"💻 Step {idx + 1}/{len(steps)}: {steps[idx].filepath}")
+        _emit_progress("step_started", step=idx + 1, total=len(steps), filepath=steps[idx].filepath)
+        related = [steps[dep].filepath for dep in sorted(deps[idx])] + steps[idx].depends_on
+        with metrics.timed("coder_step_seconds"):
+            ok = _run_step(steps[idx], plan=plan, related=related)
+        if workspace.flush_policy == "step":
+            workspace.flush()
+        if ok:
+            manifest.mark_step_done(fingerprints[idx], steps[idx].filepath)
+        else:
+            coder_state.failed_steps.append(idx)
+        coder_state.completed_steps.append(idx)
+        _emit_progress("step_finished", step=idx + 1, total=len(steps), filepath=steps[idx].filepath,
+                       ok=ok, completed=len(coder_state.completed_steps))
+        return ok
+
+    return run_step
+
+
+def coder_agent(state: AgentState, config: RunnableConfig) -> dict:
+    """LangGraph tool-using coder agent.
+
+    Runs the implementation steps as a dependency DAG: steps on the same file stay
+    in order, steps on files that import each other wait for their dependencies and
+    everything else runs concurrently, up to `coder_concurrency` steps at a time.
+
+    Finished steps are recorded in the project's RunManifest. In incremental mode
+    steps whose inputs are unchanged since the last run (and whose file still
+    exists) are skipped, which is also what lets a resumed run pick up mid-plan.
+    """
+    coder_state = state.get("coder_state") or CoderState()
+    steps = state["task_plan"].implementation_steps
+    plan = state.get("plan")
+    deps = build_dependency_graph(steps)
+    max_concurrency = config.get("configurable", {}).get("coder_concurrency", DEFAULT_MAX_CONCURRENCY)
+    fingerprints = step_fingerprints(steps, deps)
+    workspace = get_workspace()
+    manifest = _run_manifest()
+
+    if _is_incremental(config):
+        unchanged = [idx for idx, fp in enumerate(fingerprints)
+                     if idx not in coder_state.completed_steps and manifest.is_step_done(fp)
+                     and workspace.exists(steps[idx].filepath)]
+        coder_state.completed_steps.extend(unchanged)
+        if unchanged:
+            print(f"♻️  Skipping {len(unchanged)} unchanged steps")
+    manifest.prune_steps(set(fingerprints))
+
+    print(f"🗂️  {len(steps)} steps, critical path {critical_path_length(deps)}, "
+          f"concurrency {max_concurrency}")
+    run_step = _step_runner(steps, deps, fingerprints, plan, coder_state, manifest)
+
+    token = _progress_writer.set(get_stream_writer())
+    try:
+        _emit_progress("coder_started", total=len(steps), completed=len(coder_state.completed_steps))
+        run_dag(deps, run_step, max_concurrency, done=coder_state.completed_steps)
+    finally:
+        _progress_writer.reset(token)
+        workspace.flush()
+    return {"coder_state": coder_state, "status": "DONE"}
+
+
+def _stream_task_plan(plan: Plan, parser: StepStreamParser):
+    """Streams the architect's TaskPlan, yielding each implementation step once it is complete."""
+    llm = get_llm(model_for("architect")).bind_tools([TaskPlan], tool_choice="TaskPlan")
+    for args in tool_call_args(llm.stream(architect_prompt(plan=plan.model_dump_json()))):
+        yield from parser.feed(args)
+
+
+def pipelined_agent(state: AgentState, config: RunnableConfig) -> dict:
+    """Architect and coder overlapped: steps are coded while the TaskPlan is still being generated.
+
+    Every implementation step is dispatched once it has been parsed from the
+    streamed architect output and the steps it depends on have finished.
+    Runs the architect and coder one after the other instead when a task plan
+    can be reused or an LLM cache is configured (streamed calls bypass it), and
+    when the stream fails before a single step arrived.
+    """
+    plan: Plan = state["plan"]
+    manifest = _run_manifest()
+    incremental = _is_incremental(config)
+    if get_llm_cache() is not None or state.get("task_plan") is not None \
+            or (incremental and manifest.reusable_task_plan(plan.model_dump()) is not None):
+        return _architect_then_coder(state, config)
+
+    max_concurrency = config.get("configurable", {}).get("coder_concurrency", DEFAULT_MAX_CONCURRENCY)
+    workspace = get_workspace()
+    steps: list[ImplementationTask] = []
+    fingerprints: list[str] = []
+    tracker = DependencyTracker(file.path for file in plan.files)
+    coder_state = CoderState()
+    parser = StepStreamParser()
+    run_step = _step_runner(steps, tracker.deps, fingerprints, plan, coder_state, manifest)
+
+    def arriving_steps():
+        for step in _stream_task_plan(plan, parser):
+            deps = tracker.add(step)
+            fingerprints.append(step_fingerprint(step, [fingerprints[d] for d in deps]))
+            steps.append(step)
+            _emit_progress("step_planned", step=len(steps), filepath=step.filepath)
+            yield deps
+
+    def run_or_skip(idx: int) -> bool:
+        if incremental and manifest.is_step_done(fingerprints[idx]) and workspace.exists(steps[idx].filepath):
+            print(f"♻️  Step {idx + 1} unchanged, skipping")
+            coder_state.completed_steps.append(idx)
+            return True
+        return run_step(idx)
+
+    print(f"🗂️  Streaming the task plan, concurrency {max_concurrency}")
+    token = _progress_writer.set(get_stream_writer())
+    try:
+        run_dag_stream(arriving_steps(), run_or_skip, max_concurrency)
+    except Exception as e:
+        if steps:
+            raise
+        print(f"⚠️  Streaming the task plan failed ({type(e).__name__}), falling back to a full architect call")
+        return _architect_then_coder(state, config)
+    finally:
+        _progress_writer.reset(token)
+        workspace.flush()
+
+    resp = TaskPlan.model_validate_json(parser.text)
+    manifest.record_task_plan(resp.model_dump())
+    manifest.prune_steps(set(fingerprints))
+    _remember_plans(state["user_prompt"], plan, resp)
+    print(f"🗂️  {len(steps)} steps, critical path {critical_path_length(tracker.deps)}")
+    return {"task_plan": resp, "coder_state": coder_state, "status": "DONE"}
+
+
+def _check_files(paths: list[str]) -> list[FileCheck]:
+    """Local check failures among `paths`, read through the workspace so unflushed writes count."""
+    workspace = get_workspace()
+    files = {}
+    for path in paths:
+        content = workspace.read(path) if workspace.exists(path) else None
+        if content is not None:
+            files[path] = content
+    return [check for check in get_validator().validate(files) if check.error]
+
+
+def _fix_task(path: str, check: Optional[FileCheck], unfinished: list[ImplementationTask]) -> ImplementationTask:
+    """The step sent back to the coder for `path`: its unfinished tasks and its local check error."""
+    parts = []
+    if unfinished:
+        parts.append("Earlier attempts at these tasks failed and left this file unfinished; implement them now:\n"
+                     + "\n".join(f"- {task.task_description}" for task in unfinished))
+    if check is not None:
+        parts.append(f"A local {check.checker} check rejected this file:\n{check.error}\n"
+                     "Fix these errors, changing only what they need.")
+    return ImplementationTask(filepath=path, task_description="\n\n".join(parts))
+
+
+def validator_agent(state: AgentState, config: RunnableConfig) -> dict:
+    """Runs cheap local checks (syntax, well-formedness) over the generated files.
+
+    Only the files that fail go back to the coder, each as a fix step carrying
+    its error, on the full coder model; fixed files are checked again, for up
+    to `validation_rounds` rounds. Steps the coder gave up on go back the same
+    way, since the placeholder or partial edit they left behind may well pass
+    the checks. Files still failing are left in the state.
+    """
+    configurable = config.get("configurable", {})
+    task_plan = state.get("task_plan")
+    if task_plan is None or not configurable.get("validate", True):
+        return {"validation_errors": {}}
+
+    plan = state.get("plan")
+    steps = task_plan.implementation_steps
+    coder_state = (state.get("coder_state") or CoderState()).model_copy(deep=True)
+    max_concurrency = configurable.get("coder_concurrency", DEFAULT_MAX_CONCURRENCY)
+    paths = list(dict.fromkeys(step.filepath for step in steps))
+    failures = {check.path: check for check in _check_files(paths)}
+    # path -> indices of the failed steps on it
+    unfinished: dict[str, list[int]] = {}
+    for idx in sorted(set(coder_state.failed_steps)):
+        unfinished.setdefault(steps[idx].filepath, []).append(idx)
+    print(f"🩺 Checked {len(paths)} files locally, {len(failures)} failed, {len(unfinished)} left unfinished")
+
+    redone: set[int] = set()
+    token = _progress_writer.set(get_stream_writer())
+    try:
+        for _ in range(configurable.get("validation_rounds", 2)):
+            targets = list(dict.fromkeys([*unfinished, *failures]))
+            if not targets:
+                break
+            for check in failures.values():
+                print(f"🩺 [{check.path}] {check.checker}: {check.error.splitlines()[0]}")
+                _emit_progress("validation_failed", filepath=check.path, checker=check.checker, error=check.error)
+
+            def fix(idx: int) -> bool:
+                path = targets[idx]
+                task = _fix_task(path, failures.get(path), [steps[i] for i in unfinished.get(path, [])])
+                with metrics.timed("validation_fix_seconds"):
+                    return _run_step(task, plan=plan, escalate=True)
+
+            for idx, ok in run_dag([set() for _ in targets], fix, max_concurrency).items():
+                if ok and targets[idx] in unfinished:
+                    redone.update(unfinished.pop(targets[idx]))
+            failures = {check.path: check for check in _check_files(targets)}
+            still_failing = len(set(failures) | set(unfinished))
+            metrics.incr("validation_fixes", len(targets) - still_failing, outcome="fixed")
+            metrics.incr("validation_fixes", still_failing, outcome="still_failing")
+    finally:
+        _progress_writer.reset(token)
+        get_workspace().flush()
+
+    if redone:
+        manifest = _run_manifest()
+        fingerprints = step_fingerprints(steps, build_dependency_graph(steps))
+        for idx in sorted(redone):
+            manifest.mark_step_done(fingerprints[idx], steps[idx].filepath)
+        coder_state.failed_steps = [idx for idx in coder_state.failed_steps if idx not in redone]
+        print(f"🩺 Redid {len(redone)} failed steps")
+    if failures:
+        print(f"⚠️  {len(failures)} files still fail local checks: {', '.join(list(failures)[:10])}")
+    return {"validation_errors": {path: check.error for path, check in failures.items()}, "coder_state": coder_state}
+
+
+def _architect_then_coder(state: AgentState, config: RunnableConfig) -> dict:
+    update = architect_agent(state, config)
+    return {**update, **coder_agent({**state, **update}, config)}
+
+
+def _after_planner(state: AgentState, config: RunnableConfig) -> str:
+    return "pipelined" if config.get("configurable", {}).get("pipeline", False) else "architect"
+
+
+@functools.cache
+def get_graph():
+    """The uncompiled planner -> architect -> coder graph."""
+    from langgraph.constants import END
+    from langgraph.graph import StateGraph
+
+    graph = StateGraph(AgentState)
+
+    graph.add_node("planner", metrics.instrument_node("planner", planner_agent))
+    graph.add_node("architect", metrics.instrument_node("architect", architect_agent))
+    graph.add_node("coder", metrics.instrument_node("coder", coder_agent))
+    graph.add_node("pipelined", metrics.instrument_node("pipelined", pipelined_agent))
+    graph.add_node("validator", metrics.instrument_node("validator", validator_agent))
+
+    graph.add_conditional_edges("planner", _after_planner, ["architect", "pipelined"])
+    graph.add_edge("architect", "coder")
+    # the coder runs every step inside one node, so the plan size does not count against recursion_limit
+    graph.add_edge("coder", "validator")
+    graph.add_edge("pipelined", "validator")
+    graph.add_edge("validator", END)
+
+    graph.set_entry_point("planner")
+    return graph
+
+
+@functools.cache
+def get_agent():
+    """The graph compiled without a checkpointer, shared by callers that need no persistence."""
+    return get_graph().compile()
 
-    coder_state.current_step_idx += 1
-    return {"coder_state": coder_state}
 
+def __getattr__(name: str):
+    # `from agent.graph import agent` (and graph, llm, llm_cache) keep working, lazily
+    factories = {"agent": get_agent, "graph": get_graph, "llm": get_llm, "llm_cache": get_llm_cache,
+                 "plan_library": get_plan_library}
+    if name in factories:
+        return factories[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-graph = StateGraph(dict)
 
-graph.add_node("planner", planner_agent)
-graph.add_node("architect", architect_agent)
-graph.add_node("coder", coder_agent)
+def run_summary(state: AgentState) -> str:
+    """A few lines describing a finished run, printed instead of the whole final state."""
+    lines = []
+    plan = state.get("plan")
+    if plan is not None:
+        lines.append(f"Project: {plan.name} ({plan.techstack}), {len(plan.files)} files planned")
+    task_plan = state.get("task_plan")
+    coder_state = state.get("coder_state") or CoderState()
+    if task_plan is not None:
+        total = len(task_plan.implementation_steps)
+        done = len(set(coder_state.completed_steps))
+        failed = sorted(set(coder_state.failed_steps))
+        lines.append(f"Steps: {done}/{total} run, {len(failed)} failed"
+                     + (f" ({', '.join(str(i + 1) for i in failed[:10])}{', ...' if len(failed) > 10 else ''})"
+                        if failed else ""))
+    validation_errors = state.get("validation_errors") or {}
+    if validation_errors:
+        lines.append(f"Local checks: {len(validation_errors)} files still failing"
+                     f" ({', '.join(sorted(validation_errors)[:10])}{', ...' if len(validation_errors) > 10 else ''})")
+    lines.append(f"Status: {state.get('status', 'INCOMPLETE')}")
+    return "\n".join(lines)
 
-graph.add_edge("planner", "architect")
-graph.add_edge("architect", "coder")
-graph.add_conditional_edges(
-    "coder",
-    lambda s: "END" if s.get("status") == "DONE" else "coder",
-    {"END": END, "coder": "coder"}
-)
 
-graph.set_entry_point("planner")
-agent = graph.compile()
 if __name__ == "__main__":
-    result = agent.invoke({"user_prompt": "Build a colourful modern todo app in html css and js"},
-                          {"recursion_limit": 100})
-    print("Final State:", result)
+    result = get_agent().invoke({"user_prompt": "Build a colourful modern todo app in html css and js"})
+    print(run_summary(result))
 
 #Build a colourful modern todo app in html css and js
@@ -0,0 +1,204 @@
+# Request hedging: a duplicate request for model calls that run slower than usual
+
+import asyncio
+import collections
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from pydantic import PrivateAttr
+
+from agent import metrics
+
+
+class HedgedChatModel(BaseChatModel):
+    """Wraps a chat model and hedges its slow calls.
+
+    When a call has not returned after `hedge_after` seconds (or, when that is
+    unset, after the `percentile` of recent call latencies, once `min_samples`
+    calls have been seen) the same request is sent again and whichever answer
+    arrives first is used. Hedges are capped at `max_hedge_ratio` of all calls
+    and each needs a free slot from the rate limiter, so hedging never pushes
+    the process over its request budget.
+
+    The wrapper owns the cache, rate limiter and callbacks; `llm` is called
+    through `_generate` directly, so a hedged call is still cached, limited
+    and counted once. A losing sync request cannot be interrupted: it finishes
+    on its worker thread and its answer is dropped. The async path cancels it.
+    """
+
+    llm: BaseChatModel
+    """The model whose requests are hedged."""
+    hedge_after: Optional[float] = None
+    """Fixed hedging threshold in seconds; None uses the rolling percentile."""
+    percentile: float = 0.9
+    min_samples: int = 20
+    """Calls observed before the rolling threshold is trusted."""
+    window: int = 200
+    """Recent call latencies the percentile is taken over."""
+    max_hedge_ratio: float = 0.1
+    """Upper bound on hedges as a fraction of all calls."""
+    max_workers: int = 32
+
+    _latencies: collections.deque = PrivateAttr(default=None)
+    _calls: int = PrivateAttr(default=0)
+    _hedges: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _executor: Optional[ThreadPoolExecutor] = PrivateAttr(default=None)
+
+    def model_post_init(self, context: Any) -> None:
+        super().model_post_init(context)
+        self._latencies = collections.deque(maxlen=self.window)
+
+    @property
+    def _llm_type(self) -> str:
+        return f"hedged-{self.llm._llm_type}"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return self.llm._identifying_params
+
+    def _get_ls_params(self, stop: Optional[list[str]] = None, **kwargs):
+        return self.llm._get_ls_params(stop=stop, **kwargs)
+
+    def _get_llm_string(self, stop: Optional[list[str]] = None, **kwargs: Any) -> str:
+        # the same cache keys as the wrapped model, so turning hedging on keeps the cache warm
+        return self.llm._get_llm_string(stop=stop, **kwargs)
+
+    def bind_tools(self, tools, **kwargs):
+        # let the wrapped model format the tools, then bind its arguments to the wrapper
+        return self.bind(**self.llm.bind_tools(tools, **kwargs).kwargs)
+
+    # -- hedging policy -----------------------------------------------------
+
+    def threshold(self) -> Optional[float]:
+        """Seconds after which a call is hedged, or None while still warming up."""
+        if self.hedge_after is not None:
+            return self.hedge_after
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+
+    def _start_call(self) -> Optional[float]:
+        with self._lock:
+            self._calls += 1
+        return self.threshold()
+
+    def _record(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            if self._hedges + 1 > self.max_hedge_ratio * self._calls:
+                metrics.incr("llm_hedges_skipped", reason="budget")
+                return False
+        # the duplicate is a real request; it goes out only if the limiter has room right now
+        if self.rate_limiter is not None and not self.rate_limiter.acquire(blocking=False):
+            metrics.incr("llm_hedges_skipped", reason="rate_limit")
+            return False
+        with self._lock:
+            self._hedges += 1
+        metrics.incr("llm_hedges")
+        return True
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="llm-hedge")
+            return self._executor
+
+    @staticmethod
+    def _won(winner: str) -> None:
+        metrics.incr("llm_hedge_outcomes", winner=winner)
+
+    # -- calls ----------------------------------------------------------------
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        delay = self._start_call()
+        start = time.perf_counter()
+        if delay is None:
+            result = self.llm._generate(messages, stop=stop, **kwargs)
+            self._record(time.perf_counter() - start)
+            return result
+
+        executor = self._get_executor()
+        primary = executor.submit(self.llm._generate, messages, stop=stop, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._may_hedge():
+            result = primary.result()
+            self._record(time.perf_counter() - start)
+            return result
+
+        hedge = executor.submit(self.llm._generate, messages, stop=stop, **kwargs)
+        pending: set[Future] = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    self._won("hedge" if future is hedge else "primary")
+                    self._record(time.perf_counter() - start)
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        delay = self._start_call()
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(self.llm._agenerate(messages, stop=stop, **kwargs))
+        if delay is not None:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        if delay is None or done or not self._may_hedge():
+            result = await primary
+            self._record(time.perf_counter() - start)
+            return result
+
+        hedge = asyncio.ensure_future(self.llm._agenerate(messages, stop=stop, **kwargs))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._won("hedge" if task is hedge else "primary")
+                        self._record(time.perf_counter() - start)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def hedge_from_env(llm: BaseChatModel) -> BaseChatModel:
+    """Wraps `llm` in a HedgedChatModel when LLM_HEDGE=1, moving its cache,
+    rate limiter and callbacks onto the wrapper.
+
+    LLM_HEDGE_AFTER fixes the threshold in seconds (default: rolling
+    LLM_HEDGE_PERCENTILE, 0.9); LLM_HEDGE_MAX_RATIO caps the hedges (0.1).
+    """
+    if os.getenv("LLM_HEDGE", "0") != "1":
+        return llm
+    hedge_after = os.getenv("LLM_HEDGE_AFTER")
+    return HedgedChatModel(
+        llm=llm,
+        cache=llm.cache,
+        rate_limiter=llm.rate_limiter,
+        callbacks=llm.callbacks,
+        hedge_after=float(hedge_after) if hedge_after else None,
+        percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.9")),
+        max_hedge_ratio=float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1")),
+    )
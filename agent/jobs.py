@@ -0,0 +1,163 @@
+# In-process job queue so several front-end sessions can generate projects at once
+
+import pathlib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from pydantic import BaseModel, Field
+
+from agent.tools import init_project_root, use_workspace
+from agent.workspace import Workspace
+
+DEFAULT_JOBS_ROOT = pathlib.Path.cwd() / "generated_projects"
+
+
+class Job(BaseModel):
+    id: str = Field(description="Unique job id, also the name of the job's workspace directory")
+    prompt: str = Field(description="The user prompt being generated")
+    workspace: str = Field(description="Project root the job writes into")
+    status: str = Field("queued", description="queued, running, done or failed")
+    progress: int = Field(0, description="Completion percentage")
+    message: str = Field("Waiting for a free worker...", description="Latest human readable progress message")
+    files: list[str] = Field(default_factory=list, description="Files written so far, relative to the workspace")
+    created_at: float = Field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[dict[str, Any]] = Field(None, description="Final graph state once the job is done")
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+
+class JobQueue:
+    """Runs generation jobs on a bounded pool of worker threads.
+
+    Every job gets its own workspace under `jobs_root`, so concurrent jobs never
+    touch each other's files. Callers poll `get()` for status and results.
+    `config` is passed to every run, as main.py passes its run config. Finished
+    jobs are forgotten `finished_ttl` seconds after they end, and beyond the
+    `max_finished` most recent ones; their files stay on disk.
+    """
+
+    def __init__(self, agent, jobs_root: str | pathlib.Path = DEFAULT_JOBS_ROOT,
+                 max_workers: int = 2, config: Optional[dict] = None,
+                 finished_ttl: float = 3600, max_finished: int = 100):
+        self.agent = agent
+        self.jobs_root = pathlib.Path(jobs_root).absolute()
+        self.config = {"recursion_limit": 100, **(config or {})}
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+        self._jobs: dict[str, Job] = {}
+        self._workspaces: dict[str, Workspace] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def submit(self, prompt: str) -> Job:
+        job_id = uuid.uuid4().hex[:12]
+        job = Job(id=job_id, prompt=prompt, workspace=str(self.jobs_root / job_id))
+        with self._lock:
+            self._evict_finished()
+            self._jobs[job_id] = job
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._evict_finished()
+            return self._jobs.get(job_id)
+
+    def read_file(self, job_id: str, path: str) -> Optional[str]:
+        """Reads a job's file, including writes that have not been flushed to disk yet."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            workspace = self._workspaces.get(job_id)
+        if job is None:
+            return None
+        return (workspace or Workspace(job.workspace)).read(path)
+
+    def queue_position(self, job_id: str) -> int:
+        """Number of queued jobs submitted before `job_id`."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "queued":
+                return 0
+            return sum(1 for other in self._jobs.values()
+                       if other.status == "queued" and other.created_at < job.created_at)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _evict_finished(self) -> None:
+        """Drops expired finished jobs and the oldest beyond `max_finished`; call with the lock held."""
+        finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.finished_at)
+        expires = time.time() - self.finished_ttl
+        for idx, job in enumerate(finished):
+            if job.finished_at < expires or idx < len(finished) - self.max_finished:
+                del self._jobs[job.id]
+
+    def _finish(self, job: Job, status: str) -> None:
+        # together, so eviction never sees a finished job without its finish time
+        with self._lock:
+            job.finished_at = time.time()
+            job.status = status
+
+    def _run(self, job: Job) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        job.message = "📋 Planning your project..."
+        result = {}
+        workspace = Workspace(job.workspace)
+        with self._lock:
+            self._workspaces[job.id] = workspace
+        try:
+            with use_workspace(workspace):
+                init_project_root()
+                for mode, chunk in self.agent.stream(
+                    {"user_prompt": job.prompt},
+                    self.config,
+                    stream_mode=["updates", "custom"]
+                ):
+                    if mode == "updates":
+                        for node, update in chunk.items():
+                            result.update(update or {})
+                            _on_node_finished(job, node)
+                    else:
+                        _on_progress_event(job, chunk)
+            job.result = result
+            job.progress = 100
+            job.message = "✅ Project generated!"
+            self._finish(job, "done")
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.message = "❌ Generation failed"
+            self._finish(job, "failed")
+        finally:
+            # everything is on disk now, stop holding the file contents in memory
+            with self._lock:
+                self._workspaces.pop(job.id, None)
+
+
+def _on_node_finished(job: Job, node: str) -> None:
+    if node == "planner":
+        job.progress = 10
+        job.message = "🏗️ Designing architecture..."
+    elif node == "architect":
+        job.progress = 20
+        job.message = "💻 Writing code..."
+    elif node in ("coder", "pipelined"):
+        job.message = "🩺 Checking the generated files..."
+
+
+def _on_progress_event(job: Job, event: dict) -> None:
+    kind = event.get("event")
+    if kind == "step_started":
+        job.message = f"💻 Step {event['step']}/{event['total']}: {event['filepath']}"
+    elif kind in ("coder_started", "step_finished"):
+        job.progress = 20 + int(80 * event["completed"] / max(event["total"], 1))
+    elif kind == "file_written" and event["path"] not in job.files:
+        job.files.append(event["path"])
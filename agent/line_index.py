@@ -0,0 +1,77 @@
+# Line-offset index for ranged reads of large files
+
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Optional
+
+# Index of recently read files: resolved path -> (mtime_ns, size, offsets)
+_MAX_CACHED_FILES = 256
+_cache: "OrderedDict[str, tuple[int, int, array]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def build_offsets(buf, newline=b"\n") -> array:
+    """Start offset of every line in `buf` (bytes, mmap or str with newline="\\n")."""
+    offsets = array("q")
+    size = len(buf)
+    pos = 0
+    while pos < size:
+        offsets.append(pos)
+        nl = buf.find(newline, pos)
+        if nl < 0:
+            break
+        pos = nl + 1
+    return offsets
+
+
+def slice_lines(offsets: array, size: int, line_start: int, line_end: Optional[int]) -> tuple[int, int]:
+    """Start and end offsets of the 1-based, inclusive line range [line_start, line_end]."""
+    total = len(offsets)
+    first = min(max(line_start, 1), total + 1) - 1
+    last = total if line_end is None else min(max(line_end, first), total)
+    start = offsets[first] if first < total else size
+    end = offsets[last] if last < total else size
+    return start, end
+
+
+def _disk_offsets(path: str, fd: int, mm) -> array:
+    st = os.fstat(fd)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            _cache.move_to_end(path)
+            return cached[2]
+
+    offsets = build_offsets(mm)
+    with _cache_lock:
+        _cache[path] = (st.st_mtime_ns, st.st_size, offsets)
+        _cache.move_to_end(path)
+        while len(_cache) > _MAX_CACHED_FILES:
+            _cache.popitem(last=False)
+    return offsets
+
+
+def invalidate(path: str | os.PathLike) -> None:
+    with _cache_lock:
+        _cache.pop(str(path), None)
+
+
+def read_line_range(path: str | os.PathLike, line_start: int = 1,
+                    line_end: Optional[int] = None) -> tuple[str, int]:
+    """Reads lines [line_start, line_end] of a file without loading the rest of it.
+
+    The file is memory-mapped and the requested byte range is sliced out using a
+    cached line-offset index, which is rebuilt when the file's mtime or size
+    changes. Returns the text and the total number of lines in the file.
+    """
+    path = str(path)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return "", 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offsets = _disk_offsets(path, f.fileno(), mm)
+            start, end = slice_lines(offsets, len(mm), line_start, line_end)
+            return mm[start:end].decode("utf-8", errors="replace"), len(offsets)
@@ -0,0 +1,168 @@
+# Content-addressed, on-disk cache of LLM responses
+
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+
+DEFAULT_CACHE_PATH = pathlib.Path.cwd() / ".llm_cache" / "responses.sqlite"
+
+# Message fields that change between otherwise identical calls (random ids, timings)
+_VOLATILE_MESSAGE_FIELDS = ("id", "response_metadata", "usage_metadata")
+
+
+class CacheMissError(RuntimeError):
+    """Raised in replay-only mode when a call has no recorded response."""
+
+
+def _strip_volatile(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        if obj.get("type") == "constructor" and isinstance(obj.get("kwargs"), dict):
+            obj["kwargs"] = {k: v for k, v in obj["kwargs"].items() if k not in _VOLATILE_MESSAGE_FIELDS}
+        return {k: _strip_volatile(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_strip_volatile(v) for v in obj]
+    return obj
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """Hashes the serialized messages together with the model, tool and output schemas.
+
+    `llm_string` is LangChain's serialization of the model and its bound call
+    parameters (tools, tool_choice, structured output schema), so two calls share a
+    key exactly when they would send the same request.
+    """
+    try:
+        prompt = json.dumps(_strip_volatile(json.loads(prompt)), sort_keys=True)
+    except ValueError:
+        pass
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class DiskLLMCache(BaseCache):
+    """SQLite-backed LLM response cache with size/age based LRU eviction.
+
+    In `replay_only` mode a miss raises `CacheMissError` instead of letting the call
+    through, so a recorded pipeline run can be reproduced offline.
+    """
+
+    def __init__(self, path: str | os.PathLike = DEFAULT_CACHE_PATH,
+                 max_bytes: int = 512 * 1024 * 1024,
+                 max_age: Optional[float] = 30 * 24 * 3600,
+                 replay_only: bool = False):
+        self.path = pathlib.Path(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.replay_only = replay_only
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.max_age is not None and now - row[1] > self.max_age:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                row = None
+
+            if row is None:
+                self.misses += 1
+                if self.replay_only:
+                    raise CacheMissError(f"No recorded LLM response for key {key[:16]} (replay-only mode)")
+                return None
+
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return [loads(gen) for gen in json.loads(row[0])]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if self.replay_only:
+            return
+        key = cache_key(prompt, llm_string)
+        value = json.dumps([dumps(gen) for gen in return_val])
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        if self.max_age is not None:
+            cur = self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.max_age,))
+            self.evictions += cur.rowcount
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+def cache_from_env() -> Optional[DiskLLMCache]:
+    """Builds the response cache configured by LLM_CACHE (off | on | replay).
+
+    LLM_CACHE_PATH, LLM_CACHE_MAX_MB and LLM_CACHE_MAX_AGE_DAYS tune the store.
+    """
+    mode = os.getenv("LLM_CACHE", "off").lower()
+    if mode in ("", "0", "off", "false", "no"):
+        return None
+    if mode not in ("on", "1", "true", "yes", "replay"):
+        raise ValueError(f"Unknown LLM_CACHE mode: {mode!r} (expected off, on or replay)")
+
+    max_age_days = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30"))
+    return DiskLLMCache(
+        path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+        max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "512")) * 1024 * 1024),
+        max_age=max_age_days * 24 * 3600 if max_age_days > 0 else None,
+        replay_only=mode == "replay",
+    )
@@ -0,0 +1,263 @@
+# Opt-in timings and token counts for nodes, LLM calls, tools and coder steps
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional, TextIO
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class Metrics:
+    """Counters and latency summaries, optionally streamed as JSON lines.
+
+    Every observation updates an in-memory aggregate (count, sum, max) keyed by
+    metric name and labels; when `jsonl` is given it is also appended to it as
+    one JSON object per line. `prometheus_text()` renders the aggregates in the
+    Prometheus text exposition format.
+    """
+
+    def __init__(self, jsonl: Optional[TextIO] = None):
+        self.jsonl = jsonl
+        self.started_at = time.time()
+        self._summaries: dict[tuple[str, tuple], list[float]] = {}
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = [1, seconds, seconds]
+            else:
+                summary[0] += 1
+                summary[1] += seconds
+                summary[2] = max(summary[2], seconds)
+        self._write(name, labels, seconds=round(seconds, 6))
+
+    def incr(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._write(name, labels, value=value)
+
+    def _write(self, name: str, labels: dict, **fields) -> None:
+        if self.jsonl is None:
+            return
+        line = json.dumps({"ts": round(time.time(), 6), "metric": name, **labels, **fields})
+        with self._lock:
+            self.jsonl.write(line + "\n")
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "summaries": [{"metric": name, **dict(labels), "count": c, "sum": s, "max": m}
+                              for (name, labels), (c, s, m) in sorted(self._summaries.items())],
+                "counters": [{"metric": name, **dict(labels), "value": v}
+                             for (name, labels), v in sorted(self._counters.items())],
+            }
+
+    def prometheus_text(self, prefix: str = "agent_") -> str:
+        def fmt(labels: tuple) -> str:
+            if not labels:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in labels)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._summaries}):
+                lines.append(f"# TYPE {prefix}{name} summary")
+                for (metric, labels), (c, s, m) in sorted(self._summaries.items()):
+                    if metric == name:
+                        lines.append(f"{prefix}{name}_count{fmt(labels)} {c}")
+                        lines.append(f"{prefix}{name}_sum{fmt(labels)} {s:.6f}")
+                        lines.append(f"{prefix}{name}_max{fmt(labels)} {m:.6f}")
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {prefix}{name} counter")
+                for (metric, labels), value in sorted(self._counters.items()):
+                    if metric == name:
+                        lines.append(f"{prefix}{name}{fmt(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Short human-readable report of where the time and tokens went."""
+        snap = self.snapshot()
+        lines = [f"⏱️  Metrics ({time.time() - self.started_at:.1f}s wall)"]
+        for row in snap["summaries"]:
+            labels = ", ".join(f"{k}={v}" for k, v in row.items() if k not in ("metric", "count", "sum", "max"))
+            unit = "s" if row["metric"].endswith("_seconds") else ""  # e.g. command_peak_memory_mb
+            lines.append(f"  {row['metric']:<22} {labels:<32} n={row['count']:<5} "
+                         f"total={row['sum']:.2f}{unit} max={row['max']:.2f}{unit}")
+        for row in snap["counters"]:
+            labels = ", ".join(f"{k}={v}" for k, v in row.items() if k not in ("metric", "value"))
+            lines.append(f"  {row['metric']:<22} {labels:<32} {row['value']:g}")
+        return "\n".join(lines)
+
+
+# Active collector; None (the default) makes every hook below a cheap no-op
+_metrics: Optional[Metrics] = None
+_debug = False
+_configured = False
+_hook_registered = False
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Feeds LLM and tool callbacks into the active Metrics collector."""
+
+    raise_error = False
+
+    def __init__(self):
+        self._started: dict[UUID, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, name: str) -> None:
+        if _metrics is not None:
+            with self._lock:
+                self._started[run_id] = (time.perf_counter(), name)
+
+    def _finish(self, run_id: UUID) -> Optional[tuple[float, str]]:
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started is None:
+            return None
+        return time.perf_counter() - started[0], started[1]
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs) -> None:
+        self._start(run_id, (metadata or {}).get("ls_model_name") or "unknown")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs) -> None:
+        self._start(run_id, (metadata or {}).get("ls_model_name") or "unknown")
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        finished = self._finish(run_id)
+        metrics = _metrics
+        if finished is None or metrics is None:
+            return
+        seconds, model = finished
+        metrics.observe("llm_call_seconds", seconds, model=model)
+        usage = _token_usage(response)
+        if usage:
+            metrics.incr("llm_prompt_tokens", usage[0], model=model)
+            metrics.incr("llm_completion_tokens", usage[1], model=model)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        finished = self._finish(run_id)
+        if finished is not None and _metrics is not None:
+            _metrics.incr("llm_errors", model=finished[1], error=type(error).__name__)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        self._start(run_id, (serialized or {}).get("name") or kwargs.get("name") or "unknown")
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        finished = self._finish(run_id)
+        if finished is not None and _metrics is not None:
+            _metrics.observe("tool_call_seconds", finished[0], tool=finished[1])
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        finished = self._finish(run_id)
+        if finished is not None and _metrics is not None:
+            _metrics.observe("tool_call_seconds", finished[0], tool=finished[1])
+            _metrics.incr("tool_errors", tool=finished[1])
+
+
+def _token_usage(response) -> Optional[tuple[int, int]]:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+    return None
+
+
+def configure(enabled: bool = True, jsonl_path: Optional[str | os.PathLike] = None, debug: bool = False) -> Optional[Metrics]:
+    """Turns metrics collection (and LangChain's debug payload logging) on or off.
+
+    The callback handler is attached to every LangChain run through a configure
+    hook, so LLM and tool calls are measured wherever they happen, including in
+    worker threads.
+    """
+    global _metrics, _debug, _configured, _hook_registered
+    _configured = True
+    _debug = debug
+    if debug:
+        from langchain.globals import set_debug, set_verbose
+        set_debug(True)
+        set_verbose(True)
+
+    if not enabled:
+        _metrics = None
+        return None
+    jsonl = open(jsonl_path, "a", encoding="utf-8", buffering=1) if jsonl_path else None
+    _metrics = Metrics(jsonl)
+    if not _hook_registered:
+        from langchain_core.tracers.context import register_configure_hook
+        # a default (rather than a value set in this thread) is visible from every thread
+        register_configure_hook(contextvars.ContextVar("agent_metrics_handler", default=MetricsCallbackHandler()),
+                                inheritable=True)
+        _hook_registered = True
+    return _metrics
+
+
+def configure_from_env() -> Optional[Metrics]:
+    """Configures from AGENT_METRICS=1, AGENT_METRICS_FILE=<path> and AGENT_DEBUG=1."""
+    jsonl_path = os.getenv("AGENT_METRICS_FILE") or None
+    enabled = os.getenv("AGENT_METRICS", "0") == "1" or jsonl_path is not None
+    return configure(enabled, jsonl_path, debug=os.getenv("AGENT_DEBUG", "0") == "1")
+
+
+def configured() -> bool:
+    return _configured
+
+
+def get_metrics() -> Optional[Metrics]:
+    return _metrics
+
+
+def debug_enabled() -> bool:
+    return _debug
+
+
+def incr(name: str, value: float = 1, **labels) -> None:
+    if _metrics is not None:
+        _metrics.incr(name, value, **labels)
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    if _metrics is not None:
+        _metrics.observe(name, seconds, **labels)
+
+
+@contextlib.contextmanager
+def timed(name: str, **labels) -> Iterator[None]:
+    """Records the duration of the block as `name`, errors included."""
+    if _metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _metrics
+        if metrics is not None:
+            metrics.observe(name, time.perf_counter() - start, **labels)
+
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """Wraps a graph node so its wall time is recorded as node_seconds{node=name}."""
+    @functools.wraps(node)
+    def wrapper(state, config):
+        if _metrics is None:
+            return node(state, config)
+        with timed("node_seconds", node=name):
+            return node(state, config)
+    return wrapper
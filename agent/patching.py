@@ -0,0 +1,116 @@
+# Targeted file edits: exact string replacement, unified diffs and line ranges
+
+import re
+from typing import Optional
+
+# "@@ -a,b +c,d @@", but models also send a bare "@@" without line numbers
+_HUNK_HEADER = re.compile(r"^@@\s*(?:-(\d+)(?:,(\d+))?\s+\+(\d+)(?:,(\d+))?\s*@@)?")
+
+
+class PatchError(ValueError):
+    """An edit that cannot be applied cleanly to the current file content."""
+
+
+def _split(text: str) -> tuple[list[str], bool]:
+    return text.splitlines(), text.endswith("\n")
+
+
+def _join(lines: list[str], trailing_newline: bool) -> str:
+    text = "\n".join(lines)
+    return text + "\n" if lines and trailing_newline else text
+
+
+def replace_string(text: str, old: str, new: str, replace_all: bool = False) -> tuple[str, int]:
+    """Replaces `old` with `new`; `old` must occur exactly once unless `replace_all` is set."""
+    if not old:
+        raise PatchError("old_str is empty; use write_file to create a file")
+    count = text.count(old)
+    if count == 0:
+        raise PatchError("old_str was not found. Re-read the file and copy the text exactly, including whitespace")
+    if count > 1 and not replace_all:
+        lines = [text.count("\n", 0, m.start()) + 1 for m in re.finditer(re.escape(old), text)]
+        raise PatchError(f"old_str matches {count} times (lines {', '.join(map(str, lines[:10]))}); "
+                         "include more surrounding context to make it unique, or set replace_all")
+    return text.replace(old, new), count
+
+
+def replace_lines(text: str, line_start: int, line_end: int, content: str) -> str:
+    """Replaces lines [line_start, line_end] (1-based, inclusive) with `content`.
+
+    `line_end = line_start - 1` inserts before `line_start` without removing anything.
+    """
+    lines, trailing_newline = _split(text)
+    if line_start < 1 or line_start > len(lines) + 1:
+        raise PatchError(f"line_start {line_start} is outside the file (1-{len(lines) + 1})")
+    if line_end < line_start - 1 or line_end > len(lines):
+        raise PatchError(f"line_end {line_end} is outside the file ({line_start - 1}-{len(lines)})")
+    lines[line_start - 1:line_end] = content.splitlines()
+    return _join(lines, trailing_newline or not text)
+
+
+def _parse_hunks(patch: str) -> list[tuple[Optional[int], list[str], list[str]]]:
+    hunks, current = [], None
+    for line in patch.splitlines():
+        header = _HUNK_HEADER.match(line)
+        if header:
+            current = (int(header.group(1)) if header.group(1) else None, [], [])
+            hunks.append(current)
+        elif current is None or line.startswith(("--- ", "+++ ")) and not current[1] and not current[2]:
+            continue  # file headers, "diff --git", "index" lines
+        elif line.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        elif line.startswith("-"):
+            current[1].append(line[1:])
+        elif line.startswith("+"):
+            current[2].append(line[1:])
+        else:
+            # context line; models often drop the leading space of blank ones
+            current[1].append(line[1:] if line.startswith(" ") else line)
+            current[2].append(line[1:] if line.startswith(" ") else line)
+    if not hunks:
+        raise PatchError("no hunks found; a unified diff needs at least one '@@ -a,b +c,d @@' header")
+    return hunks
+
+
+def _find(lines: list[str], old: list[str], start: int, hint: Optional[int]) -> list[int]:
+    """Positions at or after `start` where `old` matches, nearest to `hint` first."""
+    last = len(lines) - len(old)
+    matches = [i for i in range(start, last + 1) if lines[i:i + len(old)] == old]
+    if not matches:
+        # tolerate trailing-whitespace differences, which models rarely reproduce exactly
+        stripped = [line.rstrip() for line in old]
+        matches = [i for i in range(start, last + 1)
+                   if [line.rstrip() for line in lines[i:i + len(old)]] == stripped]
+    if hint is not None:
+        matches.sort(key=lambda i: abs(i - hint))
+    return matches
+
+
+def apply_unified_diff(text: str, patch: str) -> tuple[str, int]:
+    """Applies every hunk of `patch` to `text`, or none of them.
+
+    Hunks are located by their context and removed lines, so line numbers in
+    the headers only break ties and may be off or missing. Returns the new text
+    and the number of hunks applied.
+    """
+    lines, trailing_newline = _split(text)
+    offset, cursor = 0, 0
+    for number, (old_start, old, new) in enumerate(_parse_hunks(patch), start=1):
+        hint = None if old_start is None else max(old_start - 1 + offset, 0)
+        if not old:
+            # a pure insertion ("@@ -a,0 ...") goes after line a, not before it
+            at = len(lines) if old_start is None else min(max(old_start + offset, 0), len(lines))
+        else:
+            matches = _find(lines, old, cursor, hint)
+            if not matches:
+                preview = "\n".join(old[:5])
+                raise PatchError(f"hunk {number} does not apply: these lines were not found "
+                                 f"(re-read the file, it may have changed):\n{preview}")
+            if hint is None and len(matches) > 1:
+                raise PatchError(f"hunk {number} matches {len(matches)} places; add line numbers "
+                                 "to its @@ header or more context lines")
+            at = matches[0]
+        lines[at:at + len(old)] = new
+        offset += len(new) - len(old)
+        cursor = at + len(new)
+    return _join(lines, trailing_newline or not text), number
@@ -0,0 +1,189 @@
+# Library of past plans, matched to new prompts through a TF-IDF index
+
+import json
+import os
+import pathlib
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from agent import metrics
+
+DEFAULT_LIBRARY_PATH = pathlib.Path.cwd() / ".plan_library" / "plans.sqlite"
+
+# Terms are hashed into this many features, so the index needs no vocabulary
+_N_FEATURES = 2 ** 18
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _terms(text: str) -> tuple[np.ndarray, np.ndarray]:
+    """Hashed features of `text` and their counts: words, word pairs and character trigrams.
+
+    The trigrams let spelling variants ("colour"/"color", "todo"/"todos") still overlap.
+    """
+    words = _WORD.findall(text.lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f" {word} "
+        grams += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    features = np.fromiter((zlib.crc32(g.encode("utf-8")) % _N_FEATURES for g in grams), dtype=np.int64)
+    return np.unique(features, return_counts=True)
+
+
+class PlanMatch(NamedTuple):
+    prompt: str
+    """The stored prompt that matched."""
+    plan: dict
+    task_plan: dict
+    similarity: float
+    reuse: bool
+    """True when similar enough to reuse as is; otherwise the plan only seeds the planner."""
+
+
+class PlanLibrary:
+    """Plan / TaskPlan pairs of past prompts, searched by prompt similarity.
+
+    Prompts are indexed as L2-normalized TF-IDF vectors of hashed terms, kept
+    sparse (one entry per distinct term of each prompt) and compared by cosine
+    similarity. The index lives in memory and is rebuilt from the SQLite store
+    on the first search after a change. A match scoring at least
+    `reuse_threshold` is reused as is; one scoring at least `seed_threshold`
+    is handed to the planner to adapt. The least recently used entries beyond
+    `max_entries` are dropped.
+    """
+
+    def __init__(self, path: str | os.PathLike = DEFAULT_LIBRARY_PATH,
+                 reuse_threshold: float = 0.9, seed_threshold: float = 0.3, max_entries: int = 1000):
+        self.path = pathlib.Path(path)
+        self.reuse_threshold = reuse_threshold
+        self.seed_threshold = seed_threshold
+        self.max_entries = max_entries
+        self.hits = {"reuse": 0, "seed": 0}
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            " prompt TEXT PRIMARY KEY, plan TEXT NOT NULL, task_plan TEXT NOT NULL,"
+            " created REAL NOT NULL, used REAL NOT NULL, uses INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.commit()
+
+    def add(self, prompt: str, plan: dict, task_plan: dict) -> None:
+        """Stores the plans generated for `prompt`, replacing any earlier entry for it."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans (prompt, plan, task_plan, created, used) VALUES (?, ?, ?, ?, ?)",
+                (prompt, json.dumps(plan), json.dumps(task_plan), now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM plans WHERE prompt NOT IN (SELECT prompt FROM plans ORDER BY used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+            self._index = None
+
+    def _build_index(self):
+        prompts = [row[0] for row in self._conn.execute("SELECT prompt FROM plans ORDER BY rowid")]
+        if not prompts:
+            return prompts, None
+        terms, counts = zip(*map(_terms, prompts))
+        indices = np.concatenate(terms)
+        rows = np.repeat(np.arange(len(prompts)), [len(t) for t in terms])
+        df = np.bincount(indices, minlength=_N_FEATURES)
+        idf = np.log((1 + len(prompts)) / (1 + df)) + 1
+        data = (1 + np.log(np.concatenate(counts))) * idf[indices]
+        norms = np.sqrt(np.bincount(rows, weights=data ** 2, minlength=len(prompts)))
+        data /= np.maximum(norms, 1e-12)[rows]
+        return prompts, (indices, rows, data, idf)
+
+    def search(self, prompt: str) -> Optional[tuple[str, float]]:
+        """The most similar stored prompt and its cosine similarity, if any shares a term."""
+        with self._lock:
+            if self._index is None:
+                self._index = self._build_index()
+            prompts, index = self._index
+        if index is None:
+            return None
+        indices, rows, data, idf = index
+        query_terms, query_counts = _terms(prompt)
+        weights = (1 + np.log(query_counts)) * idf[query_terms]
+        weights /= max(np.linalg.norm(weights), 1e-12)
+        # sparse dot product: only the terms the query shares with a stored prompt contribute
+        shared = np.isin(indices, query_terms)
+        similarity = np.bincount(rows[shared], minlength=len(prompts),
+                                 weights=data[shared] * weights[np.searchsorted(query_terms, indices[shared])])
+        best = int(np.argmax(similarity))
+        if similarity[best] <= 0:
+            return None
+        return prompts[best], float(min(similarity[best], 1.0))
+
+    def lookup(self, prompt: str) -> Optional[PlanMatch]:
+        """The stored plans most similar to `prompt`, when above `seed_threshold`; counted as a hit or miss."""
+        with metrics.timed("plan_library_lookup_seconds"):
+            found = self.search(prompt)
+        if found is not None:
+            metrics.observe("plan_library_similarity", found[1])
+        if found is None or found[1] < self.seed_threshold:
+            with self._lock:
+                self.misses += 1
+            metrics.incr("plan_library_lookups", outcome="miss")
+            return None
+
+        stored, similarity = found
+        reuse = similarity >= self.reuse_threshold
+        with self._lock:
+            row = self._conn.execute("SELECT plan, task_plan FROM plans WHERE prompt = ?", (stored,)).fetchone()
+            if row is None:  # dropped since the index was built
+                self.misses += 1
+                metrics.incr("plan_library_lookups", outcome="miss")
+                return None
+            self._conn.execute("UPDATE plans SET used = ?, uses = uses + 1 WHERE prompt = ?", (time.time(), stored))
+            self._conn.commit()
+            self.hits["reuse" if reuse else "seed"] += 1
+        metrics.incr("plan_library_lookups", outcome="reuse" if reuse else "seed")
+        return PlanMatch(stored, json.loads(row[0]), json.loads(row[1]), similarity, reuse)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+        lookups = sum(self.hits.values()) + self.misses
+        return {
+            "reused": self.hits["reuse"],
+            "seeded": self.hits["seed"],
+            "misses": self.misses,
+            "hit_rate": sum(self.hits.values()) / lookups if lookups else 0.0,
+            "reuse_rate": self.hits["reuse"] / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+
+def plan_library_from_env() -> Optional[PlanLibrary]:
+    """Builds the plan library configured by PLAN_LIBRARY (off | on | seed).
+
+    "on" reuses plans of prompts at least PLAN_LIBRARY_THRESHOLD similar (0.9)
+    and seeds the planner with those at least PLAN_LIBRARY_SEED_THRESHOLD
+    similar (0.3); "seed" never reuses a plan as is. PLAN_LIBRARY_PATH and
+    PLAN_LIBRARY_MAX_ENTRIES tune the store.
+    """
+    mode = os.getenv("PLAN_LIBRARY", "off").lower()
+    if mode in ("", "0", "off", "false", "no"):
+        return None
+    if mode not in ("on", "1", "true", "yes", "seed"):
+        raise ValueError(f"Unknown PLAN_LIBRARY mode: {mode!r} (expected off, on or seed)")
+    return PlanLibrary(
+        path=os.getenv("PLAN_LIBRARY_PATH", DEFAULT_LIBRARY_PATH),
+        reuse_threshold=float("inf") if mode == "seed" else float(os.getenv("PLAN_LIBRARY_THRESHOLD", "0.9")),
+        seed_threshold=float(os.getenv("PLAN_LIBRARY_SEED_THRESHOLD", "0.3")),
+        max_entries=int(os.getenv("PLAN_LIBRARY_MAX_ENTRIES", "1000")),
+    )
@@ -0,0 +1,74 @@
+# Incremental parsing of a TaskPlan whose JSON arguments are still being streamed
+
+import json
+from typing import Iterable, Iterator
+
+from agent.states import ImplementationTask
+
+
+class StepStreamParser:
+    """Pulls complete implementation steps out of a TaskPlan JSON document as it grows.
+
+    Feed the document in arbitrary pieces; every object of the top-level
+    "implementation_steps" array is returned as soon as its closing brace has
+    arrived. Each character is scanned once, however the text is split.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_key = None
+        self._steps_depth = None  # depth inside the implementation_steps array
+        self._step_start = None
+
+    def feed(self, piece: str) -> list[ImplementationTask]:
+        self.text += piece
+        steps = []
+        text = self.text
+        for pos in range(self._pos, len(text)):
+            ch = text[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start + 1:pos]
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif ch in "{[":
+                if ch == "[" and self._depth == 1 and self._last_key == "implementation_steps":
+                    self._steps_depth = 2
+                elif ch == "{" and self._depth == self._steps_depth:
+                    self._step_start = pos
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if ch == "}" and self._step_start is not None and self._depth == self._steps_depth:
+                    steps.append(ImplementationTask.model_validate(json.loads(text[self._step_start:pos + 1])))
+                    self._step_start = None
+                elif ch == "]" and self._depth == 1:
+                    self._steps_depth = None
+        self._pos = len(text)
+        return steps
+
+
+def tool_call_args(chunks: Iterable) -> Iterator[str]:
+    """The argument text of the first tool call in a stream of AI message chunks."""
+    for chunk in chunks:
+        tool_chunks = getattr(chunk, "tool_call_chunks", None)
+        if tool_chunks:
+            for tool_chunk in tool_chunks:
+                if tool_chunk.get("index") in (None, 0) and tool_chunk.get("args"):
+                    yield tool_chunk["args"]
+        elif getattr(chunk, "tool_calls", None):
+            # a model without native streaming answers with one complete message
+            yield json.dumps(chunk.tool_calls[0]["args"])
@@ -1,11 +1,21 @@
 #Prompt functions for agents
 
-def planner_prompt(user_prompt: str) -> str:
+def planner_prompt(user_prompt: str, similar_prompt: str = None, similar_plan: str = None) -> str:
     PLANNER_PROMPT = f"""
 You are the PLANNER agent. Convert the user prompt into a COMPLETE engineering project plan.
 
 User request:
 {user_prompt}
+    """
+    if similar_plan:
+        PLANNER_PROMPT += f"""
+A plan made earlier for a similar request is below. Adapt it: keep what fits this request and change what differs.
+
+Similar request:
+{similar_prompt}
+
+Its plan:
+{similar_plan}
     """
     return PLANNER_PROMPT
 
@@ -22,6 +32,7 @@ RULES:
     * Mention how this task depends on or will be used by previous tasks.
     * Include integration details: imports, expected function signatures, data flow.
 - Order tasks so that dependencies are implemented first.
+- For each task, list in depends_on the paths of the other files it imports from or relies on.
 - Each step must be SELF-CONTAINED but also carry FORWARD the relevant context from earlier tasks.
 
 Project Plan:
@@ -34,11 +45,14 @@ def coder_system_prompt() -> str:
     CODER_SYSTEM_PROMPT = """
 You are the CODER agent.
 You are implementing a specific engineering task.
-You have access to tools to read and write files.
+You have access to tools to read, write and edit files.
 
 Always:
-- Review all existing files to maintain compatibility.
-- Implement the FULL file content, integrating with other modules.
+- Rely on the project context in the task (plan, current file, outlines of related files); read or open other files only when an outline is not enough.
+- To check what another module defines, use lookup_symbol(name) or file_outline(path) instead of reading the whole file.
+- For a NEW file, implement the FULL file content with write_file, integrating with other modules.
+- For an EXISTING file, change only what the task needs with edit_file (exact text replacement) or apply_patch (unified diff). Do not rewrite the whole file.
+- If an edit is rejected, re-read the file and retry with text copied exactly from it.
 - Maintain consistent naming of variables, functions, and imports.
 - When a module is imported from another file, ensure it exists and is implemented as described.
     """
@@ -0,0 +1,247 @@
+# Process-wide request/token rate limiting and retry backoff for the LLM client
+
+import asyncio
+import contextvars
+import functools
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from agent import metrics
+
+T = TypeVar("T")
+
+# Estimated prompt tokens of the chat model call being started in this context
+_pending_call: contextvars.ContextVar[Optional[tuple[UUID, int]]] = contextvars.ContextVar(
+    "pending_llm_call", default=None)
+
+
+class TokenBucketLimiter(BaseRateLimiter, BaseCallbackHandler):
+    """Token buckets for requests per minute and tokens per minute.
+
+    Used both as the chat model's `rate_limiter` (gating every request that is
+    not answered from the cache) and as one of its callbacks. That lets it
+    reserve the estimated prompt tokens when a request is let through and
+    settle them against the reported usage once it finishes. The token bucket
+    may go into debt; new requests wait until it has been paid back.
+
+    `pause()` holds every caller, e.g. when the server answers with a
+    retry-after, so concurrent runs back off together instead of cascading.
+    A limit of 0 disables that bucket.
+    """
+
+    raise_error = False
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 burst_seconds: float = 10.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        # a bucket holds `burst_seconds` worth of quota, so bursts stay well inside the minute window
+        self._request_capacity = max(1.0, requests_per_minute * burst_seconds / 60)
+        self._token_capacity = tokens_per_minute * burst_seconds / 60
+        self._requests = self._request_capacity
+        self._tokens = self._token_capacity
+        self._paused_until = 0.0
+        self._updated = time.monotonic()
+        self._reserved: dict[UUID, int] = {}
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self._request_capacity, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self._token_capacity, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _try_acquire(self) -> float:
+        """Takes a request slot and returns 0, or returns how long to wait for one."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            waits = [self._paused_until - now]
+            if self.requests_per_minute and self._requests < 1:
+                waits.append((1 - self._requests) * 60 / self.requests_per_minute)
+            if self.tokens_per_minute and self._tokens < 0:
+                waits.append(-self._tokens * 60 / self.tokens_per_minute)
+            wait = max(waits)
+            if wait > 0:
+                return wait
+            if self.requests_per_minute:
+                self._requests -= 1
+            pending = _pending_call.get()
+            if pending is not None and self.tokens_per_minute:
+                run_id, estimate = pending
+                self._tokens -= estimate
+                self._reserved[run_id] = estimate
+            return 0.0
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        start = None
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                break
+            if not blocking:
+                return False
+            start = start or time.perf_counter()
+            time.sleep(min(wait, 1.0))
+        if start is not None:
+            metrics.observe("rate_limit_wait_seconds", time.perf_counter() - start)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        start = None
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                break
+            if not blocking:
+                return False
+            start = start or time.perf_counter()
+            await asyncio.sleep(min(wait, 1.0))
+        if start is not None:
+            metrics.observe("rate_limit_wait_seconds", time.perf_counter() - start)
+        return True
+
+    def pause(self, seconds: float) -> None:
+        """Holds every request for `seconds`, e.g. after a 429 with retry-after."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    # -- token accounting through the chat model's callbacks --------------------
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        if self.tokens_per_minute:
+            estimate = sum(len(str(m.content)) for batch in messages for m in batch) // 4
+            _pending_call.set((run_id, estimate))
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        with self._lock:
+            reserved = self._reserved.pop(run_id, None)
+            if reserved is None:
+                return  # answered from the cache, or token limiting is off
+            used = _total_tokens(response)
+            if used is not None:
+                self._tokens -= used - reserved
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        with self._lock:
+            reserved = self._reserved.pop(run_id, None)
+            # a rejected request did not use its tokens
+            if reserved is not None and classify_error(error) == "rate_limit":
+                self._tokens += reserved
+
+
+def _total_tokens(response) -> Optional[int]:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("total_tokens") or usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return token_usage.get("total_tokens")
+
+
+@functools.cache
+def get_rate_limiter() -> Optional[TokenBucketLimiter]:
+    """The limiter shared by every run in this process, from LLM_RPM / LLM_TPM (0, the default, disables).
+
+    Off unless configured, so local and scripted models are never throttled;
+    set LLM_RPM to the provider's quota (e.g. 30 on Groq's free tier) to pace
+    requests instead of relying on 429 backoff.
+    """
+    rpm = float(os.getenv("LLM_RPM", "0"))
+    tpm = float(os.getenv("LLM_TPM", "0"))
+    if not rpm and not tpm:
+        return None
+    return TokenBucketLimiter(rpm, tpm, burst_seconds=float(os.getenv("LLM_BURST_SECONDS", "10")))
+
+
+# -- error classification and backoff ------------------------------------------
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(error: BaseException) -> str:
+    """One of "rate_limit", "transient", "tool_call" (the model produced an unusable call) or "fatal"."""
+    from agent.llm_cache import CacheMissError
+
+    if isinstance(error, CacheMissError):
+        return "fatal"
+    status = _status_code(error)
+    name = type(error).__name__
+    if status == 429 or name == "RateLimitError":
+        return "rate_limit"
+    if status in (401, 403, 404) or name in ("AuthenticationError", "PermissionDeniedError", "NotFoundError"):
+        return "fatal"
+    if (status is not None and status >= 500) or name in ("APIConnectionError", "APITimeoutError") \
+            or isinstance(error, (TimeoutError, ConnectionError)):
+        return "transient"
+    return "tool_call"
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait, from the Retry-After header."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0, server_hint: Optional[float] = None) -> float:
+    """Exponential backoff with full jitter, never shorter than the server's retry-after."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    return max(delay, server_hint or 0.0)
+
+
+def wait_before_retry(error: BaseException, attempt: int) -> float:
+    """Sleeps before retrying a rate-limited or transient failure; returns the delay.
+
+    A retry-after from the server also pauses the shared limiter, so every other
+    run in the process waits out the same window.
+    """
+    hint = retry_after(error)
+    limiter = get_rate_limiter()
+    if hint and limiter is not None:
+        limiter.pause(hint)
+    delay = backoff_delay(attempt, server_hint=hint)
+    kind = classify_error(error)
+    with metrics.timed("backoff_seconds", kind=kind):
+        time.sleep(delay)
+    return delay
+
+
+def with_retries(fn: Callable[[], T], what: str, max_attempts: int = 5) -> T:
+    """Calls `fn`, retrying every failure but fatal ones.
+
+    Rate-limited and transient failures back off first; an unusable tool call
+    is simply asked for again.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            kind = classify_error(e)
+            metrics.incr("llm_call_failures", node=what, kind=kind)
+            attempt += 1
+            if kind == "fatal" or attempt >= max_attempts:
+                raise
+            if kind in ("rate_limit", "transient"):
+                delay = wait_before_retry(e, attempt - 1)
+                print(f"⏳ [{what}] {kind} ({type(e).__name__}), retrying in {delay:.1f}s")
+            else:
+                print(f"🔄 [{what}] {type(e).__name__}, retrying ({attempt}/{max_attempts})")
@@ -0,0 +1,54 @@
+# Chooses the chat model for each node, and a smaller one for simple coder steps
+
+import os
+from pathlib import PurePosixPath
+from typing import NamedTuple, Optional
+
+from agent.states import ImplementationTask
+
+DEFAULT_MODEL = "openai/gpt-oss-120b"
+
+# File types (suffix, or the name of suffix-less files) a small model writes about as well as a large one
+FAST_FILE_TYPES = frozenset({
+    ".css", ".scss", ".md", ".txt", ".json", ".svg", ".yml", ".yaml", ".toml", ".ini", ".cfg",
+    ".gitignore", ".env", "license", "readme",
+})
+# Steps whose packed context is at most this many tokens count as small; 0 routes by file type only
+FAST_MAX_CONTEXT_TOKENS = int(os.getenv("LLM_FAST_MAX_TOKENS", "800"))
+
+
+class Route(NamedTuple):
+    model: str
+    reason: str
+    fast: bool
+
+
+def model_for(node: str) -> str:
+    """Model for `node` ("planner", "architect" or "coder"): LLM_MODEL_<NODE>, else LLM_MODEL."""
+    return os.getenv(f"LLM_MODEL_{node.upper()}") or os.getenv("LLM_MODEL") or DEFAULT_MODEL
+
+
+def fast_coder_model() -> Optional[str]:
+    """The model for simple coder steps, from LLM_MODEL_CODER_FAST; unset turns routing off."""
+    return os.getenv("LLM_MODEL_CODER_FAST") or None
+
+
+def route_step(task: ImplementationTask, context_tokens: int, escalate: bool = False) -> Route:
+    """Sends a coder step to the fast model when its file type is simple or it is small.
+
+    `escalate` (set after a failed attempt or validation) always picks the
+    coder model.
+    """
+    large = model_for("coder")
+    fast = fast_coder_model()
+    if fast is None or fast == large:
+        return Route(large, "default", False)
+    if escalate:
+        return Route(large, "escalated", False)
+    path = PurePosixPath(task.filepath)
+    kind = path.suffix.lower() or path.name.lower()
+    if kind in FAST_FILE_TYPES:
+        return Route(fast, f"file type {kind}", True)
+    if context_tokens <= FAST_MAX_CONTEXT_TOKENS and not task.depends_on:
+        return Route(fast, "small step", True)
+    return Route(large, "large step", False)
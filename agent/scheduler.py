@@ -0,0 +1,256 @@
+# Dependency-aware scheduling of implementation steps
+
+import contextvars
+import os
+import posixpath
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import TYPE_CHECKING, Callable, Iterable
+
+if TYPE_CHECKING:
+    from agent.states import ImplementationTask
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("CODER_MAX_CONCURRENCY", "4"))
+
+# import/include statements whose target is a relative file path
+_REFERENCE_PATTERNS = [
+    re.compile(r"""(?:import|export)\s[^'"]*?from\s+['"]([^'"]+)['"]"""),
+    re.compile(r"""(?:import|require)\s*\(?\s*['"]([^'"]+)['"]"""),
+    re.compile(r"""(?:src|href)\s*=\s*['"]([^'"]+)['"]"""),
+    re.compile(r"""@import\s+(?:url\()?['"]?([^'")\s;]+)"""),
+    re.compile(r"""^\s*from\s+([\w.]+)\s+import""", re.MULTILINE),
+    re.compile(r"""^\s*import\s+([\w.]+)""", re.MULTILINE),
+]
+# words that may name a file of the plan
+_PATH_WORD = re.compile(r"[\w./-]+")
+
+
+def normalize_path(path: str) -> str:
+    path = posixpath.normpath(path.replace("\\", "/"))
+    while path.startswith("./"):
+        path = path[2:]
+    return path.lstrip("/")
+
+
+def _module_aliases(path: str) -> set[str]:
+    """Names another file may use to refer to `path` (file name, module path, extensionless path)."""
+    stem, ext = posixpath.splitext(path)
+    aliases = {path, stem}
+    if ext == ".py":
+        aliases.add(stem.replace("/", "."))
+        if posixpath.basename(stem) == "__init__":
+            aliases.add(posixpath.dirname(stem).replace("/", "."))
+    return {a for a in aliases if a}
+
+
+def _mentions(text: str) -> tuple[set[str], set[str]]:
+    """Paths and bare file names written out in `text`.
+
+    Each path-like word also counts without a trailing ".ext" or sentence dot
+    ("see app.js."), and a path also by every trailing part of it
+    ("frontend/src/app.js" mentions "src/app.js"). Only words without a
+    directory count as file names.
+    """
+    paths, names = set(), set()
+    for word in _PATH_WORD.findall(text):
+        ends = [idx for idx, char in enumerate(word) if char == "."] + [len(word)]
+        for prefix in filter(None, (word[:end] for end in ends)):
+            if "/" not in prefix:
+                names.add(prefix)
+            parts = prefix.split("/")
+            paths.update(normalize_path("/".join(parts[idx:])) for idx in range(len(parts)))
+    return paths, names
+
+
+class _PathIndex:
+    """The aliases and file names of known paths, kept up to date as paths are added."""
+
+    def __init__(self, paths: Iterable[str] = ()):
+        self.paths: set[str] = set()
+        self._by_alias: dict[str, set[str]] = {}
+        self._by_basename: dict[str, set[str]] = {}
+        for path in paths:
+            self.add(path)
+
+    def add(self, path: str) -> None:
+        if path in self.paths:
+            return
+        self.paths.add(path)
+        for alias in _module_aliases(path):
+            self._by_alias.setdefault(alias, set()).add(path)
+        self._by_basename.setdefault(posixpath.basename(path), set()).add(path)
+
+    def references(self, task: "ImplementationTask") -> set[str]:
+        """Known paths that `task` imports or includes, mentions, or names by a file name no other path has."""
+        text = task.task_description
+        base_dir = posixpath.dirname(normalize_path(task.filepath))
+
+        refs = set()
+        for pattern in _REFERENCE_PATTERNS:
+            for match in pattern.findall(text):
+                for target in (match, normalize_path(posixpath.join(base_dir, match))):
+                    refs.update(self._by_alias.get(target, ()))
+
+        paths, names = _mentions(text)
+        refs.update(paths & self.paths)
+        for name in names:
+            found = self._by_basename.get(name, ())
+            if len(found) == 1:
+                refs.update(found)
+        return refs
+
+
+def infer_references(task: "ImplementationTask", known_paths: Iterable[str]) -> set[str]:
+    """Files of the plan that `task` imports, includes or mentions."""
+    return _PathIndex(known_paths).references(task)
+
+
+class DependencyTracker:
+    """Works out step dependencies one step at a time, as steps arrive.
+
+    `known_paths` are the files references are resolved against; the path of
+    every added step joins them. They are indexed once, so adding a step costs
+    time in the length of its description rather than the number of files.
+    """
+
+    def __init__(self, known_paths: Iterable[str] = ()):
+        self._index = _PathIndex(normalize_path(p) for p in known_paths)
+        self.deps: list[set[int]] = []
+        self._last_writer: dict[str, int] = {}
+
+    @property
+    def known_paths(self) -> set[str]:
+        return self._index.paths
+
+    def add(self, step: "ImplementationTask") -> set[int]:
+        """Registers the next step and returns the indices of the earlier steps it waits for."""
+        path = normalize_path(step.filepath)
+        self._index.add(path)
+        step_deps = set()
+        if path in self._last_writer:
+            step_deps.add(self._last_writer[path])
+
+        referenced = self._index.references(step)
+        referenced.update(normalize_path(p) for p in step.depends_on)
+        for ref in referenced:
+            if ref != path and ref in self._last_writer:
+                step_deps.add(self._last_writer[ref])
+
+        self._last_writer[path] = len(self.deps)
+        self.deps.append(step_deps)
+        return step_deps
+
+
+def build_dependency_graph(steps: list["ImplementationTask"]) -> list[set[int]]:
+    """Returns, for every step, the indices of earlier steps it must wait for.
+
+    A step waits for the previous step on the same file and for the latest earlier
+    step of every file it declares in `depends_on` or references in its description.
+    Only earlier steps are considered, so the result is always acyclic.
+    """
+    tracker = DependencyTracker(step.filepath for step in steps)
+    for step in steps:
+        tracker.add(step)
+    return tracker.deps
+
+
+def critical_path_length(deps: list[set[int]]) -> int:
+    """Number of steps on the longest dependency chain."""
+    depth = []
+    for step_deps in deps:
+        depth.append(1 + max((depth[d] for d in step_deps), default=0))
+    return max(depth, default=0)
+
+
+def run_dag(deps: list[set[int]], run_step: Callable[[int], object],
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+            done: Iterable[int] = ()) -> dict[int, object]:
+    """Runs every step not in `done` once all of its dependencies have finished.
+
+    Independent steps run concurrently on at most `max_concurrency` threads, so
+    wall-clock time follows the critical path rather than the step count.
+    Returns the result of `run_step` for each executed step index.
+    """
+    finished = set(done)
+    pending = [idx for idx in range(len(deps)) if idx not in finished]
+    results: dict[int, object] = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        while pending or running:
+            ready = [idx for idx in pending if deps[idx] <= finished]
+            for idx in ready[:max(1, max_concurrency) - len(running)]:
+                pending.remove(idx)
+                # copy the context so per-run context variables reach the worker thread
+                ctx = contextvars.copy_context()
+                running[pool.submit(ctx.run, run_step, idx)] = idx
+
+            if not running:
+                raise RuntimeError(f"Unsatisfiable step dependencies: {sorted(pending)}")
+
+            completed, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in completed:
+                idx = running.pop(future)
+                results[idx] = future.result()
+                finished.add(idx)
+    return results
+
+
+def run_dag_stream(step_deps: Iterable[set[int]], run_step: Callable[[int], object],
+                   max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> dict[int, object]:
+    """Like run_dag, for steps that are still arriving while earlier ones run.
+
+    `step_deps` yields the dependencies of steps 0, 1, 2, ... as they become
+    known, e.g. parsed from a plan that is still being generated. It is consumed
+    on its own thread and every step starts as soon as it has arrived and its
+    dependencies have finished. An error raised by `step_deps` is re-raised once
+    the steps already started have finished.
+    """
+    events: queue.Queue = queue.Queue()
+
+    def feed():
+        try:
+            for step in step_deps:
+                events.put(("step", set(step)))
+        except BaseException as e:
+            events.put(("error", e))
+        else:
+            events.put(("end", None))
+
+    deps: list[set[int]] = []
+    finished: set[int] = set()
+    pending: list[int] = []
+    results: dict[int, object] = {}
+    running = {}
+    feeding, error = True, None
+
+    threading.Thread(target=contextvars.copy_context().run, args=(feed,), daemon=True).start()
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        while feeding or pending or running:
+            ready = [idx for idx in pending if deps[idx] <= finished]
+            for idx in ready[:max(1, max_concurrency) - len(running)]:
+                pending.remove(idx)
+                ctx = contextvars.copy_context()
+                future = pool.submit(ctx.run, run_step, idx)
+                running[idx] = future
+                future.add_done_callback(lambda _, idx=idx: events.put(("finished", idx)))
+
+            if not running and not feeding:
+                if pending:
+                    raise RuntimeError(f"Unsatisfiable step dependencies: {sorted(pending)}")
+                break
+
+            kind, value = events.get()
+            if kind == "step":
+                pending.append(len(deps))
+                deps.append(value)
+            elif kind == "finished":
+                results[value] = running.pop(value).result()
+                finished.add(value)
+            else:
+                feeding, error = False, value
+    if error is not None:
+        raise error
+    return results
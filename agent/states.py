@@ -1,6 +1,6 @@
 # Classes for agent schemas
 
-from typing import Optional
+from typing import Optional, TypedDict
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -23,6 +23,8 @@ class ImplementationTask(BaseModel):
     filepath: str = Field(description="The path to the file to be modified")
     task_description: str = Field(
         description="A detailed description of the task to be performed on the file, e.g. 'add user authentication', 'implement data processing logic', etc.")
+    depends_on: list[str] = Field(default_factory=list,
+                                  description="Paths of other files this task imports from or relies on")
 
 class TaskPlan(BaseModel):
     implementation_steps: list[ImplementationTask] = Field(
@@ -30,7 +32,17 @@ class TaskPlan(BaseModel):
     model_config = ConfigDict(extra="allow")
 
 class CoderState(BaseModel):
-    task_plan: TaskPlan = Field(description="The plan for the task to be implemented")
-    current_step_idx: int = Field(0, description="The index of the current step in the implementation steps")
-    current_file_content: Optional[str] = Field(None,
-                                                description="The content of the file currently being edited or created")
+    completed_steps: list[int] = Field(default_factory=list,
+                                       description="Indices of the implementation steps that have been executed")
+    failed_steps: list[int] = Field(default_factory=list,
+                                    description="Indices of the executed steps that did not succeed")
+
+class AgentState(TypedDict, total=False):
+    """Graph state. Every key is a channel of its own, so a node only returns the keys it changes
+    and the plans are stored once rather than copied into every later state."""
+    user_prompt: str
+    plan: Plan
+    task_plan: Optional[TaskPlan]
+    coder_state: CoderState
+    validation_errors: dict[str, str]
+    status: str
@@ -0,0 +1,176 @@
+# Index of the symbols each generated file defines, for cross-file lookups
+
+import ast
+import difflib
+import posixpath
+import re
+import threading
+from typing import NamedTuple, Optional
+
+
+class Symbol(NamedTuple):
+    name: str
+    kind: str
+    path: str
+    line: int
+    signature: str
+
+
+_JS_PATTERNS = [
+    (re.compile(r"^[ \t]*(export\s+)?(?:default\s+)?(?:async\s+)?function\*?\s+([\w$]+)\s*(\([^)]*\))", re.MULTILINE), "function"),
+    (re.compile(r"^[ \t]*(export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([\w$]+)([^{]*)", re.MULTILINE), "class"),
+    (re.compile(r"^(export\s+)?(?:const|let|var)\s+([\w$]+)\s*=\s*(?:async\s+)?(\([^)]*\)|[\w$]+)\s*=>", re.MULTILINE), "function"),
+    (re.compile(r"^(export\s+)?(?:const|let|var)\s+([\w$]+)()\s*[=:]", re.MULTILINE), "variable"),
+    (re.compile(r"^[ \t]*(export\s+)?(?:interface|type)\s+([\w$]+)([^{=]*)", re.MULTILINE), "type"),
+    (re.compile(r"^[ \t]*(export\s+)?(?:const\s+)?enum\s+([\w$]+)()", re.MULTILINE), "enum"),
+    (re.compile(r"^[ \t]+(?:static\s+)?(?:async\s+)?(?!if\b|for\b|while\b|switch\b|catch\b|function\b|return\b)"
+                r"([\w$]+)\s*(\([^)]*\))\s*\{", re.MULTILINE), "method"),
+]
+_HTML_ID = re.compile(r"""<([\w-]+)[^>]*?\bid\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+_CSS_RULE = re.compile(r"^[ \t]*([^{}@/\n][^{}]*?)\s*\{", re.MULTILINE)
+_CSS_NAME = re.compile(r"([.#])(-?[_a-zA-Z][\w-]*)")
+_CSS_VAR = re.compile(r"(--[\w-]+)\s*:")
+
+_JS_EXTENSIONS = {".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx"}
+_CSS_EXTENSIONS = {".css", ".scss", ".less"}
+_HTML_EXTENSIONS = {".html", ".htm"}
+SUPPORTED_EXTENSIONS = {".py"} | _JS_EXTENSIONS | _CSS_EXTENSIONS | _HTML_EXTENSIONS
+
+
+def _line_of(content: str, pos: int) -> int:
+    return content.count("\n", 0, pos) + 1
+
+
+def _python_symbols(path: str, content: str) -> list[Symbol]:
+    try:
+        tree = ast.parse(content)
+    except SyntaxError:
+        return []
+
+    def signature(node) -> str:
+        prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+        returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+        return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+    found = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            found.append(Symbol(node.name, "function", path, node.lineno, signature(node)))
+        elif isinstance(node, ast.ClassDef):
+            bases = f"({', '.join(ast.unparse(b) for b in node.bases)})" if node.bases else ""
+            found.append(Symbol(node.name, "class", path, node.lineno, f"class {node.name}{bases}"))
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    found.append(Symbol(f"{node.name}.{item.name}", "method", path, item.lineno, signature(item)))
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    found.append(Symbol(target.id, "variable", path, node.lineno,
+                                        ast.get_source_segment(content, node).split("\n")[0][:120]))
+    return found
+
+
+def _js_symbols(path: str, content: str) -> list[Symbol]:
+    found: dict[str, Symbol] = {}
+    for pattern, kind in _JS_PATTERNS:
+        for m in pattern.finditer(content):
+            name = m.group(1) if kind == "method" else m.group(2)
+            # the first (most specific) pattern to see a name wins, e.g. arrow functions over plain consts
+            if name not in found:
+                signature = " ".join(m.group(0).split()).rstrip("{=: ")
+                found[name] = Symbol(name, kind, path, _line_of(content, m.start()), signature[:120])
+    return list(found.values())
+
+
+def _html_symbols(path: str, content: str) -> list[Symbol]:
+    return [Symbol(f"#{m.group(2)}", "element", path, _line_of(content, m.start()), f"<{m.group(1)} id=\"{m.group(2)}\">")
+            for m in _HTML_ID.finditer(content)]
+
+
+def _css_symbols(path: str, content: str) -> list[Symbol]:
+    found: dict[str, Symbol] = {}
+    for m in _CSS_RULE.finditer(content):
+        selector = " ".join(m.group(1).split())
+        for prefix, name in _CSS_NAME.findall(selector):
+            found.setdefault(prefix + name, Symbol(prefix + name, "selector", path,
+                                                   _line_of(content, m.start()), selector[:120]))
+    for m in _CSS_VAR.finditer(content):
+        found.setdefault(m.group(1), Symbol(m.group(1), "variable", path, _line_of(content, m.start()),
+                                            m.group(0).rstrip(":")))
+    return sorted(found.values(), key=lambda s: s.line)
+
+
+def format_outline(symbols: list[Symbol]) -> str:
+    # several selectors of one CSS rule share a line and signature
+    return "\n".join(dict.fromkeys(f"{s.line}: {s.signature}" for s in symbols))
+
+
+def extract_symbols(path: str, content: str) -> list[Symbol]:
+    """Symbols defined in `content`, chosen by the file extension of `path`."""
+    ext = posixpath.splitext(path)[1].lower()
+    if ext == ".py":
+        return _python_symbols(path, content)
+    if ext in _JS_EXTENSIONS:
+        return sorted(_js_symbols(path, content), key=lambda s: s.line)
+    if ext in _HTML_EXTENSIONS:
+        return _html_symbols(path, content)
+    if ext in _CSS_EXTENSIONS:
+        return _css_symbols(path, content)
+    return []
+
+
+class SymbolIndex:
+    """Symbols per file and files per symbol name.
+
+    The workspace drops a file's entry whenever it is written and re-indexes it
+    the next time it is looked up, so each version of a file is parsed at most
+    once and only if someone asks.
+    """
+
+    def __init__(self):
+        self._by_path: dict[str, list[Symbol]] = {}
+        self._by_name: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def update(self, path: str, content: str) -> list[Symbol]:
+        symbols = extract_symbols(path, content)
+        with self._lock:
+            self._remove(path)
+            self._by_path[path] = symbols
+            for symbol in symbols:
+                for key in {symbol.name, symbol.name.rpartition(".")[2]}:
+                    self._by_name.setdefault(key, set()).add(path)
+        return symbols
+
+    def remove(self, path: str) -> None:
+        with self._lock:
+            self._remove(path)
+
+    def _remove(self, path: str) -> None:
+        for symbol in self._by_path.pop(path, ()):
+            for key in {symbol.name, symbol.name.rpartition(".")[2]}:
+                paths = self._by_name.get(key)
+                if paths is not None:
+                    paths.discard(path)
+                    if not paths:
+                        del self._by_name[key]
+
+    def has(self, path: str) -> bool:
+        return path in self._by_path
+
+    def outline(self, path: str) -> Optional[list[Symbol]]:
+        with self._lock:
+            return self._by_path.get(path)
+
+    def lookup(self, name: str) -> list[Symbol]:
+        """Definitions of `name`; a bare method name also matches `Class.method`."""
+        with self._lock:
+            paths = sorted(self._by_name.get(name, ()))
+            return [s for p in paths for s in self._by_path[p]
+                    if s.name == name or s.name.rpartition(".")[2] == name]
+
+    def close_matches(self, name: str, n: int = 5) -> list[str]:
+        with self._lock:
+            names = list(self._by_name)
+        return difflib.get_close_matches(name, names, n=n, cutoff=0.6)
@@ -1,26 +1,92 @@
+import contextlib
+import contextvars
+import os
 import pathlib
-import subprocess
-from typing import Tuple
+import posixpath
+from typing import Callable, Iterator, Tuple
 
 from langchain_core.tools import tool
 
+from agent import patching
+from agent.commands import get_command_pool
+from agent.symbols import format_outline
+from agent.workspace import Workspace
+
 PROJECT_ROOT = pathlib.Path.cwd() / "generated_project"
 
+# Caps on what a single read_file/open_file call returns to the model
+READ_MAX_LINES = int(os.getenv("READ_MAX_LINES", "400"))
+READ_MAX_BYTES = int(os.getenv("READ_MAX_BYTES", "32000"))
+
+# Workspace of the project the current run writes into. Context-local so concurrent
+# runs (batch mode, several app sessions) each get their own.
+_workspace: contextvars.ContextVar[Workspace] = contextvars.ContextVar("workspace", default=Workspace(PROJECT_ROOT))
+
+
+# Callbacks run after every successful write_file, with the project-relative path and content
+_write_hooks: list[Callable[[str, str], None]] = []
+
+
+def add_write_hook(hook: Callable[[str, str], None]) -> None:
+    if hook not in _write_hooks:
+        _write_hooks.append(hook)
+
+
+def get_workspace() -> Workspace:
+    return _workspace.get()
+
+
+def get_project_root() -> pathlib.Path:
+    return _workspace.get().root
+
+
+@contextlib.contextmanager
+def use_workspace(workspace: Workspace) -> Iterator[Workspace]:
+    """Routes the file tools through `workspace` for the duration of the block, then flushes it."""
+    token = _workspace.set(workspace)
+    try:
+        yield workspace
+    finally:
+        _workspace.reset(token)
+        workspace.flush()
+
+
+@contextlib.contextmanager
+def project_root(path: str | pathlib.Path, in_memory: bool = False) -> Iterator[Workspace]:
+    """Points the file tools at a fresh workspace rooted at `path` for the duration of the block."""
+    with use_workspace(Workspace(path, in_memory=in_memory)) as workspace:
+        yield workspace
+
 
 def safe_path_for_project(path: str) -> pathlib.Path:
-    p = (PROJECT_ROOT / path).resolve()
-    if PROJECT_ROOT.resolve() not in p.parents and PROJECT_ROOT.resolve() != p.parent and PROJECT_ROOT.resolve() != p:
-        raise ValueError("Attempt to write outside project root")
-    return p
+    return get_workspace().disk_path(path)
 
 
 # Helper function to actually write a file
 def _write_file_impl(path: str, content: str) -> str:
-    p = safe_path_for_project(path)
-    p.parent.mkdir(parents=True, exist_ok=True)
-    with open(p, "w", encoding="utf-8") as f:
-        f.write(content)
-    return f"WROTE:{p}"
+    workspace = get_workspace()
+    rel = workspace.write(path, content)
+    for hook in _write_hooks:
+        hook(rel, content)
+    return f"WROTE:{workspace.root / rel}"
+
+
+def _edit_impl(path: str, edit: Callable[[str], tuple[str, str]]) -> str:
+    """Applies `edit` to the current content of `path` and writes the result back.
+
+    `edit` returns the new content and a short summary; a PatchError leaves the
+    file untouched and is reported to the model so it can retry.
+    """
+    workspace = get_workspace()
+    try:
+        content = workspace.read(path)
+        if content is None:
+            return f"ERROR: File {path} does not exist. Use write_file to create it."
+        new_content, summary = edit(content)
+    except (patching.PatchError, ValueError) as e:
+        return f"ERROR: Could not edit {path}: {e}"
+    _write_file_impl(path, new_content)
+    return f"EDITED:{workspace.root / workspace.relpath(path)} ({summary})"
 
 
 @tool("repo_browser.write_file")
@@ -35,45 +101,134 @@ def write_file_no_prefix(path: str, content: str) -> str:
     return _write_file_impl(path, content)
 
 
+def _edit_file_impl(path: str, old_str: str, new_str: str, replace_all: bool = False) -> str:
+    def edit(content):
+        content, count = patching.replace_string(content, old_str, new_str, replace_all)
+        return content, f"{count} replacement{'s' if count > 1 else ''}"
+    return _edit_impl(path, edit)
+
+
+@tool("repo_browser.edit_file")
+def edit_file(path: str, old_str: str, new_str: str, replace_all: bool = False) -> str:
+    """Replaces the exact text old_str with new_str in an existing file. old_str must match exactly once unless replace_all is true. Prefer this over write_file for changing existing files."""
+    return _edit_file_impl(path, old_str, new_str, replace_all)
+
+
+@tool("edit_file")
+def edit_file_no_prefix(path: str, old_str: str, new_str: str, replace_all: bool = False) -> str:
+    """Replaces the exact text old_str with new_str in an existing file. old_str must match exactly once unless replace_all is true. Prefer this over write_file for changing existing files."""
+    return _edit_file_impl(path, old_str, new_str, replace_all)
+
+
+def _apply_patch_impl(path: str, patch: str) -> str:
+    def edit(content):
+        content, hunks = patching.apply_unified_diff(content, patch)
+        return content, f"{hunks} hunk{'s' if hunks > 1 else ''} applied"
+    return _edit_impl(path, edit)
+
+
+@tool("repo_browser.apply_patch")
+def apply_patch(path: str, patch: str) -> str:
+    """Applies a unified diff (@@ hunks with ' ', '-' and '+' lines) to an existing file. Either every hunk applies or the file is left unchanged."""
+    return _apply_patch_impl(path, patch)
+
+
+@tool("apply_patch")
+def apply_patch_no_prefix(path: str, patch: str) -> str:
+    """Applies a unified diff (@@ hunks with ' ', '-' and '+' lines) to an existing file. Either every hunk applies or the file is left unchanged."""
+    return _apply_patch_impl(path, patch)
+
+
+def _replace_lines_impl(path: str, line_start: int, line_end: int, content: str) -> str:
+    def edit(text):
+        summary = (f"inserted before line {line_start}" if line_end < line_start
+                   else f"lines {line_start}-{line_end} replaced")
+        return patching.replace_lines(text, line_start, line_end, content), summary
+    return _edit_impl(path, edit)
+
+
+@tool("repo_browser.replace_lines")
+def replace_lines(path: str, line_start: int, line_end: int, content: str) -> str:
+    """Replaces lines line_start to line_end (1-based, inclusive) of an existing file with content. Use line_end = line_start - 1 to insert before line_start."""
+    return _replace_lines_impl(path, line_start, line_end, content)
+
+
+@tool("replace_lines")
+def replace_lines_no_prefix(path: str, line_start: int, line_end: int, content: str) -> str:
+    """Replaces lines line_start to line_end (1-based, inclusive) of an existing file with content. Use line_end = line_start - 1 to insert before line_start."""
+    return _replace_lines_impl(path, line_start, line_end, content)
+
+
+def _cap_lines(path: str, text: str, first_line: int, last_wanted: int, total_lines: int) -> str:
+    """Trims `text` (lines starting at `first_line`) to the read caps and tells the model how to page on."""
+    lines = text.splitlines(keepends=True)
+    kept, size, cut = [], 0, False
+    for line in lines:
+        line_size = len(line.encode("utf-8"))
+        if size + line_size > READ_MAX_BYTES:
+            if not kept:
+                # a single huge line (minified code): return its head rather than nothing
+                kept.append(line.encode("utf-8")[:READ_MAX_BYTES].decode("utf-8", errors="ignore"))
+                cut = True
+            break
+        kept.append(line)
+        size += line_size
+
+    last_line = first_line + len(kept) - 1
+    if not cut and last_line >= min(last_wanted, total_lines):
+        return text
+    hint = f"showing lines {first_line}-{last_line} of {total_lines}"
+    if cut:
+        hint = f"line {last_line} cut at {READ_MAX_BYTES} bytes, " + hint
+    if last_line < total_lines:
+        hint += f". Call open_file(path=\"{path}\", line_start={last_line + 1}) to continue"
+    return "".join(kept) + f"\n[... truncated: {hint}.]"
+
+
 # Helper function to read
 def _read_file_impl(path: str) -> str:
-    p = safe_path_for_project(path)
-    if not p.exists():
+    content = get_workspace().read(path)
+    return "" if content is None else content
+
+
+def _read_file_capped(path: str) -> str:
+    result = get_workspace().read_lines(path, 1, READ_MAX_LINES)
+    if result is None:
         return ""
-    with open(p, "r", encoding="utf-8") as f:
-        return f.read()
+    text, total_lines = result
+    return _cap_lines(path, text, 1, total_lines, total_lines)
 
 
 @tool("repo_browser.read_file")
 def read_file(path: str) -> str:
-    """Reads content from a file at the specified path within the project root."""
-    return _read_file_impl(path)
+    """Reads content from a file at the specified path within the project root. Large files are truncated; page through them with open_file."""
+    return _read_file_capped(path)
 
 
 @tool("read_file")
 def read_file_no_prefix(path: str) -> str:
-    """Reads content from a file at the specified path within the project root."""
-    return _read_file_impl(path)
+    """Reads content from a file at the specified path within the project root. Large files are truncated; page through them with open_file."""
+    return _read_file_capped(path)
 
 
 @tool("repo_browser.get_current_directory")
 def get_current_directory() -> str:
     """Returns the current working directory."""
-    return str(PROJECT_ROOT)
+    return str(get_project_root())
 
 
 @tool("get_current_directory")
 def get_current_directory_no_prefix() -> str:
     """Returns the current working directory."""
-    return str(PROJECT_ROOT)
+    return str(get_project_root())
 
 
 # Helper for list_file
 def _list_file_impl(directory: str = ".") -> str:
-    p = safe_path_for_project(directory)
-    if not p.is_dir():
-        return f"ERROR: {p} is not a directory"
-    files = [str(f.relative_to(PROJECT_ROOT)) for f in p.glob("**/*") if f.is_file()]
+    workspace = get_workspace()
+    if not workspace.is_dir(directory):
+        return f"ERROR: {workspace.root / workspace.relpath(directory)} is not a directory"
+    files = workspace.list_files(directory)
     return "\n".join(files) if files else "No files found."
 
 
@@ -91,32 +246,31 @@ def list_file_no_prefix(directory: str = ".") -> str:
 
 # Helper for print_tree
 def _print_tree_impl(path: str = ".", depth: int = 3) -> str:
-    p = safe_path_for_project(path)
-    if not p.is_dir():
-        return f"ERROR: {p} is not a directory"
+    workspace = get_workspace()
+    rel = workspace.relpath(path)
+    if not workspace.is_dir(rel):
+        return f"ERROR: {workspace.root / rel} is not a directory"
 
     def build_tree(directory, prefix="", current_depth=0):
         if current_depth >= depth:
             return []
 
         contents = []
-        try:
-            items = sorted(directory.iterdir(), key=lambda x: (not x.is_dir(), x.name))
-            for i, item in enumerate(items):
-                is_last = i == len(items) - 1
-                current_prefix = "└── " if is_last else "├── "
-                contents.append(f"{prefix}{current_prefix}{item.name}")
-
-                if item.is_dir() and current_depth < depth - 1:
-                    extension = "    " if is_last else "│   "
-                    contents.extend(build_tree(item, prefix + extension, current_depth + 1))
-        except PermissionError:
-            pass
+        dirs, files = workspace.listdir(directory)
+        items = [(name, True) for name in dirs] + [(name, False) for name in files]
+        for i, (name, is_dir) in enumerate(items):
+            is_last = i == len(items) - 1
+            current_prefix = "└── " if is_last else "├── "
+            contents.append(f"{prefix}{current_prefix}{name}")
+
+            if is_dir and current_depth < depth - 1:
+                extension = "    " if is_last else "│   "
+                contents.extend(build_tree(posixpath.join(directory, name), prefix + extension, current_depth + 1))
 
         return contents
 
-    tree_lines = [str(p.relative_to(PROJECT_ROOT.parent)) + "/"]
-    tree_lines.extend(build_tree(p))
+    tree_lines = [posixpath.normpath(posixpath.join(workspace.root.name, rel)) + "/"]
+    tree_lines.extend(build_tree(rel))
     return "\n".join(tree_lines)
 
 
@@ -134,43 +288,96 @@ def print_tree_no_prefix(path: str = ".", depth: int = 3) -> str:
 
 # Helper for open_file
 def _open_file_impl(path: str, line_start: int = 1, line_end: int = None) -> str:
-    p = safe_path_for_project(path)
-    if not p.exists():
-        return f"ERROR: File {path} does not exist"
-
     try:
-        with open(p, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-        start_idx = max(0, line_start - 1)
-        end_idx = len(lines) if line_end is None else min(len(lines), line_end)
-
-        selected_lines = lines[start_idx:end_idx]
-        return "".join(selected_lines)
+        line_start = max(1, line_start)
+        # only ever pull one page off disk, whatever range was asked for
+        page_end = line_start + READ_MAX_LINES - 1
+        result = get_workspace().read_lines(path, line_start, page_end if line_end is None else min(line_end, page_end))
+        if result is None:
+            return f"ERROR: File {path} does not exist"
+        text, total_lines = result
+        if not text:
+            return ""
+        return _cap_lines(path, text, line_start, total_lines if line_end is None else line_end, total_lines)
     except Exception as e:
         return f"ERROR: Could not read file {path}: {str(e)}"
 
 
 @tool("repo_browser.open_file")
 def open_file(path: str, line_start: int = 1, line_end: int = None) -> str:
-    """Opens a file and returns specific lines. If line_end is None, returns from line_start to end."""
+    """Opens a file and returns specific lines. If line_end is None, returns from line_start to end. Output is capped; a hint tells you which line_start to use to continue."""
     return _open_file_impl(path, line_start, line_end)
 
 
 @tool("open_file")
 def open_file_no_prefix(path: str, line_start: int = 1, line_end: int = None) -> str:
-    """Opens a file and returns specific lines. If line_end is None, returns from line_start to end."""
+    """Opens a file and returns specific lines. If line_end is None, returns from line_start to end. Output is capped; a hint tells you which line_start to use to continue."""
     return _open_file_impl(path, line_start, line_end)
 
 
+def _lookup_symbol_impl(name: str) -> str:
+    workspace = get_workspace()
+    found = workspace.find_symbol(name)
+    if not found:
+        similar = workspace.symbols.close_matches(name)
+        return f"No symbol named {name}" + (f". Did you mean: {', '.join(similar)}?" if similar else "")
+    return "\n".join(f"{s.path}:{s.line}: {s.signature}" for s in found)
+
+
+@tool("repo_browser.lookup_symbol")
+def lookup_symbol(name: str) -> str:
+    """Finds where a function, class, variable, element id or CSS selector is defined in the project and returns its file, line and signature."""
+    return _lookup_symbol_impl(name)
+
+
+@tool("lookup_symbol")
+def lookup_symbol_no_prefix(name: str) -> str:
+    """Finds where a function, class, variable, element id or CSS selector is defined in the project and returns its file, line and signature."""
+    return _lookup_symbol_impl(name)
+
+
+def _file_outline_impl(path: str) -> str:
+    try:
+        symbols = get_workspace().outline(path)
+    except ValueError as e:
+        return f"ERROR: {e}"
+    if symbols is None:
+        return f"ERROR: File {path} does not exist"
+    return format_outline(symbols) or f"No symbols found in {path}"
+
+
+@tool("repo_browser.file_outline")
+def file_outline(path: str) -> str:
+    """Lists the functions, classes, exports, element ids or selectors a file defines, with line numbers and signatures, without reading the whole file."""
+    return _file_outline_impl(path)
+
+
+@tool("file_outline")
+def file_outline_no_prefix(path: str) -> str:
+    """Lists the functions, classes, exports, element ids or selectors a file defines, with line numbers and signatures, without reading the whole file."""
+    return _file_outline_impl(path)
+
+
 @tool
 def run_cmd(cmd: str, cwd: str = None, timeout: int = 30) -> Tuple[int, str, str]:
-    """Runs a shell command in the specified directory and returns the result."""
-    cwd_dir = safe_path_for_project(cwd) if cwd else PROJECT_ROOT
-    res = subprocess.run(cmd, shell=True, cwd=str(cwd_dir), capture_output=True, text=True, timeout=timeout)
+    """Runs a shell command in the specified directory and returns (exit code, stdout, stderr). Long output is truncated in the middle; a command that times out returns exit code 124 and the output it printed so far."""
+    workspace = get_workspace()
+    if workspace.in_memory:
+        return 1, "", "ERROR: commands cannot run in an in-memory workspace"
+    # the command sees the disk, so pending writes go first and cached reads are dropped after
+    workspace.flush()
+    cwd_dir = workspace.disk_path(cwd) if cwd else workspace.root
+    try:
+        res = get_command_pool(workspace.root).run(cmd, cwd=str(cwd_dir), timeout=timeout)
+    finally:
+        workspace.invalidate()
+    if res.timed_out:
+        return 124, res.stdout, res.stderr + f"\n[timed out after {timeout}s]"
     return res.returncode, res.stdout, res.stderr
 
 
 def init_project_root():
-    PROJECT_ROOT.mkdir(parents=True, exist_ok=True)
-    return str(PROJECT_ROOT)
+    workspace = get_workspace()
+    if not workspace.in_memory:
+        workspace.root.mkdir(parents=True, exist_ok=True)
+    return str(workspace.root)
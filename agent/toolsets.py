@@ -0,0 +1,109 @@
+# One advertised schema per coder tool, per-step tool subsets and cached ReAct agents
+
+import functools
+import json
+import os
+import threading
+from typing import TYPE_CHECKING, Any
+
+from agent import metrics
+from agent import tools as tools_module
+from agent.context import estimate_tokens
+from agent.tools import (write_file_no_prefix, edit_file_no_prefix, apply_patch_no_prefix,
+                         replace_lines_no_prefix, read_file_no_prefix, get_current_directory_no_prefix,
+                         list_file_no_prefix, print_tree_no_prefix, open_file_no_prefix,
+                         lookup_symbol_no_prefix, file_outline_no_prefix, run_cmd)
+
+if TYPE_CHECKING:
+    from langchain_core.tools import BaseTool
+
+# The schema advertised for each capability; the model may still call it under an alias
+CODER_TOOLS: dict[str, "BaseTool"] = {t.name: t for t in [
+    read_file_no_prefix, write_file_no_prefix, edit_file_no_prefix, apply_patch_no_prefix,
+    replace_lines_no_prefix, list_file_no_prefix, get_current_directory_no_prefix,
+    print_tree_no_prefix, open_file_no_prefix, lookup_symbol_no_prefix, file_outline_no_prefix, run_cmd,
+]}
+
+# Models trained on a repo_browser namespace keep calling tools by that name
+ALIASES = {f"repo_browser.{name}": name for name in CODER_TOOLS}
+
+# Tools offered per kind of step. A new file is written in one go and only needs to look
+# at other files; an existing file is changed in place and may need line ranges of itself.
+TOOLSETS: dict[str, tuple[str, ...]] = {
+    "new_file": ("write_file", "read_file", "list_file", "print_tree", "lookup_symbol", "file_outline"),
+    "existing_file": ("edit_file", "apply_patch", "replace_lines", "open_file", "read_file", "write_file",
+                      "list_file", "lookup_symbol", "file_outline"),
+    "all": tuple(CODER_TOOLS),
+}
+
+# Opt-in: lets the coder run the project's tests and builds through the command pool. The
+# commands run on this machine with only the pool's resource limits, so it is off by default.
+RUN_COMMANDS = os.getenv("CODER_RUN_COMMANDS", "0") == "1"
+if RUN_COMMANDS:
+    for _name in ("new_file", "existing_file"):
+        TOOLSETS[_name] += ("run_cmd",)
+
+
+def toolset_for_step(file_exists: bool) -> str:
+    return "existing_file" if file_exists else "new_file"
+
+
+def schema_tokens(tools) -> int:
+    """Estimated prompt tokens the tool schemas add to every model call."""
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+
+    return sum(estimate_tokens(json.dumps(convert_to_openai_tool(t))) for t in tools)
+
+
+@functools.cache
+def schema_savings(toolset: str) -> tuple[int, int]:
+    """Schema tokens per call of `toolset`, and of every tool plus its alias as advertised before."""
+    tools = [CODER_TOOLS[name] for name in TOOLSETS[toolset]]
+    # the prefixed tools are bound to the same names in agent.tools, minus the prefix;
+    # run_cmd never had a prefixed twin
+    doubled = list(CODER_TOOLS.values()) + [getattr(tools_module, name) for name in CODER_TOOLS
+                                            if name != "run_cmd"]
+    return schema_tokens(tools), schema_tokens(doubled)
+
+
+@functools.cache
+def _alias_tool_node_class():
+    from langgraph.prebuilt import ToolNode
+
+    class AliasToolNode(ToolNode):
+        """ToolNode that also runs a tool when the model calls it by one of its ALIASES."""
+
+        def inject_tool_args(self, tool_call, input, store):
+            name = ALIASES.get(tool_call["name"])
+            if name is not None and name in self.tools_by_name:
+                tool_call = {**tool_call, "name": name}
+            return super().inject_tool_args(tool_call, input, store)
+
+    return AliasToolNode
+
+
+# (id(llm), toolset) -> (llm, compiled agent); the model is kept so its id cannot be reused
+_agents: dict[tuple[int, str], tuple[Any, Any]] = {}
+_agents_lock = threading.Lock()
+
+
+def get_coder_agent(llm, toolset: str):
+    """The compiled ReAct agent for `llm` with the tools of `toolset`, built once and reused."""
+    from langgraph.prebuilt import create_react_agent
+
+    key = (id(llm), toolset)
+    # built under the lock, so concurrent first steps do not each build the same agent
+    with _agents_lock:
+        cached = _agents.get(key)
+        if cached is not None and cached[0] is llm:
+            return cached[1]
+        tools = [CODER_TOOLS[name] for name in TOOLSETS[toolset]]
+        # no checkpointer of its own, nor the run's: a resumed coder node gets the same task id,
+        # and inherited checkpoints would replay the n-th conversation of the failed attempt
+        agent = create_react_agent(llm, _alias_tool_node_class()(tools), checkpointer=False)
+        _agents[key] = (llm, agent)
+    advertised, before = schema_savings(toolset)
+    print(f"🧰 Coder tools '{toolset}': {len(tools)} schemas, ~{advertised} tokens per call "
+          f"(was ~{before} with every tool and alias)")
+    metrics.incr("coder_agents_built", toolset=toolset)
+    return agent
@@ -0,0 +1,322 @@
+# Cheap local checks of generated files, run in a process pool and cached by content hash
+
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import pathlib
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from html.parser import HTMLParser
+from typing import NamedTuple, Optional
+
+# Worker processes import this module, so it sticks to the standard library;
+# LangChain and the metrics module are only imported in the parent.
+
+_MAX_ERRORS = 5
+# Result of a file whose checker could not run; reported as unchecked and never cached
+_UNCHECKED = object()
+
+
+def _check_python(source: str) -> Optional[str]:
+    try:
+        compile(source, "<generated>", "exec", dont_inherit=True)
+    except SyntaxError as e:
+        return f"line {e.lineno}: {type(e).__name__}: {e.msg}"
+    except ValueError as e:  # e.g. null bytes
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def _check_json(source: str) -> Optional[str]:
+    try:
+        json.loads(source)
+    except json.JSONDecodeError as e:
+        return f"line {e.lineno}: {e.msg} (column {e.colno})"
+    return None
+
+
+# Elements that never have an end tag, and those whose end tag may be left out
+_VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+                  "source", "track", "wbr"}
+_OPTIONAL_END = {"html", "head", "body", "p", "li", "dt", "dd", "option", "optgroup", "tr", "td", "th",
+                 "thead", "tbody", "tfoot", "colgroup", "rp", "rt"}
+
+
+class _TagBalance(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.open: list[tuple[str, int]] = []
+        self.errors: list[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in _VOID_ELEMENTS:
+            self.open.append((tag, self.getpos()[0]))
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_ELEMENTS:
+            return
+        line = self.getpos()[0]
+        for idx in range(len(self.open) - 1, -1, -1):
+            if self.open[idx][0] == tag:
+                for name, opened in self.open[idx + 1:]:
+                    if name not in _OPTIONAL_END:
+                        self.errors.append(f"line {opened}: <{name}> is not closed before </{tag}> on line {line}")
+                del self.open[idx:]
+                return
+        self.errors.append(f"line {line}: </{tag}> has no matching <{tag}>")
+
+
+def _check_html(source: str) -> Optional[str]:
+    parser = _TagBalance()
+    parser.feed(source)
+    parser.close()
+    errors = parser.errors + [f"line {opened}: <{name}> is never closed"
+                              for name, opened in parser.open if name not in _OPTIONAL_END]
+    return "\n".join(errors[:_MAX_ERRORS]) or None
+
+
+def _check_css(source: str) -> Optional[str]:
+    """Balanced braces and parentheses, terminated comments and strings."""
+    stack: list[tuple[str, int]] = []
+    line, idx, n = 1, 0, len(source)
+    while idx < n:
+        char = source[idx]
+        if char == "\n":
+            line += 1
+        elif source.startswith("/*", idx):
+            end = source.find("*/", idx + 2)
+            if end < 0:
+                return f"line {line}: unterminated comment"
+            line += source.count("\n", idx, end)
+            idx = end + 2
+            continue
+        elif char in "\"'":
+            end = idx + 1
+            while end < n and source[end] != char and source[end] != "\n":
+                end += 2 if source[end] == "\\" else 1
+            if end >= n or source[end] == "\n":
+                return f"line {line}: unterminated string"
+            idx = end + 1
+            continue
+        elif char in "{(":
+            stack.append((char, line))
+        elif char in "})":
+            expected = "{" if char == "}" else "("
+            if not stack or stack[-1][0] != expected:
+                return f"line {line}: unexpected '{char}'"
+            stack.pop()
+        idx += 1
+    if stack:
+        return f"line {stack[-1][1]}: '{stack[-1][0]}' is never closed"
+    return None
+
+
+# Compiles every source of a JSON list without running it; scripts first, then as ES modules
+_NODE_CHECK = r"""
+const vm = require("vm");
+let input = "";
+process.stdin.on("data", (d) => { input += d; }).on("end", () => {
+  const out = JSON.parse(input).map((source) => {
+    let error;
+    try { new vm.Script(source, { filename: "f" }); return null; } catch (e) { error = e; }
+    if (error.name === "SyntaxError" && /import|export|await/.test(error.message) && vm.SourceTextModule) {
+      try { new vm.SourceTextModule(source, { identifier: "f" }); return null; } catch (e) { error = e; }
+    }
+    if (error.name !== "SyntaxError") return null;
+    const line = (String(error.stack).split("\n")[0].match(/:(\d+)$/) || [])[1];
+    return (line ? `line ${line}: ` : "") + `SyntaxError: ${error.message}`;
+  });
+  process.stdout.write(JSON.stringify(out));
+});
+"""
+
+
+@functools.cache
+def _node() -> Optional[str]:
+    return shutil.which("node")
+
+
+def _check_javascript(sources: list[str]) -> list[Optional[str]]:
+    """Syntax errors of many scripts from a single node process."""
+    res = subprocess.run([_node(), "--experimental-vm-modules", "--no-warnings", "-e", _NODE_CHECK],
+                         input=json.dumps(sources), capture_output=True, text=True, encoding="utf-8",
+                         timeout=30 + len(sources) // 10)
+    if res.returncode != 0:
+        raise RuntimeError(f"node exited with {res.returncode}: {res.stderr.strip()[:200]}")
+    return json.loads(res.stdout)
+
+
+_CHECKERS = {
+    "python": _check_python,
+    "json": _check_json,
+    "html": _check_html,
+    "css": _check_css,
+}
+_CHECKER_FOR_SUFFIX = {
+    ".py": "python", ".json": "json", ".html": "html", ".htm": "html", ".css": "css",
+    ".js": "javascript", ".mjs": "javascript", ".cjs": "javascript",
+}
+
+
+def checker_for(path: str) -> Optional[str]:
+    """Name of the local check for `path`, or None when there is none (or no local parser)."""
+    checker = _CHECKER_FOR_SUFFIX.get(pathlib.PurePath(path).suffix.lower())
+    if checker == "javascript" and _node() is None:
+        return None
+    return checker
+
+
+def check_batch(items: list[tuple[str, str]]) -> list[Optional[str]]:
+    """Errors of (checker, source) pairs, None for those that pass; what a worker process runs."""
+    errors: list[Optional[str]] = [None] * len(items)
+    scripts = [idx for idx, (checker, _) in enumerate(items) if checker == "javascript"]
+    if scripts:
+        for idx, error in zip(scripts, _check_javascript([items[idx][1] for idx in scripts])):
+            errors[idx] = error
+    for idx, (checker, source) in enumerate(items):
+        if checker != "javascript":
+            errors[idx] = _CHECKERS[checker](source)
+    return errors
+
+
+class FileCheck(NamedTuple):
+    path: str
+    checker: Optional[str]
+    """None when no local check handles the file type, or its check could not run."""
+    error: Optional[str]
+
+
+class Validator:
+    """Runs the local checks over files, caching results by content hash.
+
+    Large batches of uncached files are spread over a process pool, one chunk
+    (and one node process for its scripts) per worker. Batches smaller than
+    `min_pool_batch` run in the calling thread: the checks take well under a
+    millisecond per file, less than handing the file to a worker. Workers are
+    started with "spawn", so they do not inherit the parent's threads or open
+    connections; they start on first use and are kept for later batches.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, min_pool_batch: int = 64, cache_entries: int = 4096):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.min_pool_batch = min_pool_batch
+        self.cache_entries = cache_entries
+        self._cache: OrderedDict[str, Optional[str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _run(self, items: list[tuple[str, str]]) -> list:
+        try:
+            return self._run_batches(items)
+        except (RuntimeError, subprocess.TimeoutExpired, OSError) as e:
+            # node crashed, hung or could not start; the run's code is written, so check what we still can
+            print(f"⚠️  JavaScript checks failed ({type(e).__name__}: {str(e).splitlines()[0][:200]}), "
+                  "leaving scripts unchecked")
+            others = [idx for idx, (checker, _) in enumerate(items) if checker != "javascript"]
+            errors: list = [_UNCHECKED] * len(items)
+            for idx, error in zip(others, check_batch([items[idx] for idx in others])):
+                errors[idx] = error
+            return errors
+
+    def _run_batches(self, items: list[tuple[str, str]]) -> list[Optional[str]]:
+        if len(items) < self.min_pool_batch or self.max_workers < 2:
+            return check_batch(items)
+        size = -(-len(items) // self.max_workers)
+        chunks = [items[start:start + size] for start in range(0, len(items), size)]
+        try:
+            return [error for errors in self._get_pool().map(check_batch, chunks) for error in errors]
+        except BrokenProcessPool:
+            # e.g. the main module lacks the `if __name__ == "__main__"` guard spawned workers need
+            print("⚠️  Validation workers could not start, checking files in-process")
+            self.close()
+            self.max_workers = 1
+            return check_batch(items)
+
+    def validate(self, files: dict[str, str]) -> list[FileCheck]:
+        """Checks every file of a path -> content mapping."""
+        from agent import metrics
+
+        results: dict[str, FileCheck] = {}
+        pending: list[tuple[str, str, str]] = []
+        with metrics.timed("validation_seconds"):
+            for path, content in files.items():
+                checker = checker_for(path)
+                if checker is None:
+                    results[path] = FileCheck(path, None, None)
+                    metrics.incr("validation_files", checker="none", result="skipped")
+                    continue
+                key = hashlib.sha256(f"{checker}\0{content}".encode("utf-8")).hexdigest()
+                with self._lock:
+                    cached = key in self._cache
+                    if cached:
+                        self._cache.move_to_end(key)
+                        results[path] = FileCheck(path, checker, self._cache[key])
+                if cached:
+                    metrics.incr("validation_cache_hits", checker=checker)
+                else:
+                    pending.append((path, key, checker))
+
+            errors = self._run([(checker, files[path]) for path, _, checker in pending]) if pending else []
+            with self._lock:
+                for (path, key, checker), error in zip(pending, errors):
+                    if error is _UNCHECKED:
+                        results[path] = FileCheck(path, None, None)
+                        metrics.incr("validation_files", checker=checker, result="unchecked")
+                        continue
+                    results[path] = FileCheck(path, checker, error)
+                    self._cache[key] = error
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+        for check in results.values():
+            if check.checker is not None:
+                metrics.incr("validation_files", checker=check.checker, result="error" if check.error else "ok")
+        return [results[path] for path in files]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+@functools.cache
+def get_validator() -> Validator:
+    """The validator shared by every run in this process; VALIDATION_WORKERS sizes its pool."""
+    workers = os.getenv("VALIDATION_WORKERS")
+    return Validator(max_workers=int(workers) if workers else None)
+
+
+# Comment delimiters for the placeholder of a step that could not be implemented; no end means a line comment
+_COMMENT_STYLES = {
+    ".py": ("# ", ""), ".sh": ("# ", ""), ".rb": ("# ", ""), ".yml": ("# ", ""), ".yaml": ("# ", ""),
+    ".toml": ("# ", ""), ".sql": ("-- ", ""), ".txt": ("", ""), ".css": ("/* ", " */"),
+    ".html": ("<!-- ", " -->"), ".htm": ("<!-- ", " -->"), ".xml": ("<!-- ", " -->"), ".svg": ("<!-- ", " -->"),
+    ".md": ("<!-- ", " -->"),
+}
+
+
+def placeholder(path: str, description: str) -> str:
+    """A TODO placeholder for `path` written in that language's comment syntax, so the file still parses.
+
+    The validator sends the step that left it behind back to the coder, since the checks alone would pass it.
+    """
+    suffix = pathlib.PurePath(path).suffix.lower()
+    if suffix == ".json":
+        return "{}\n"  # JSON has no comments
+    start, end = _COMMENT_STYLES.get(suffix, ("// ", ""))
+    text = f"TODO: Implement {description}"
+    if end:
+        return f"{start}{text.replace(end.strip(), '')}{end}\n"
+    return "".join(f"{start}{line}\n" for line in text.splitlines())
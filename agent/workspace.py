@@ -0,0 +1,214 @@
+# In-memory, write-back overlay of a project tree used by the file tools
+
+import os
+import pathlib
+import posixpath
+import threading
+from array import array
+from typing import Optional
+
+from agent import line_index
+from agent.file_index import FileIndex
+from agent.symbols import SUPPORTED_EXTENSIONS, Symbol, SymbolIndex
+
+# When dirty files are written to disk: after every coder step, or once per run
+FLUSH_POLICIES = ("step", "run")
+
+
+class Workspace:
+    """Overlay of the project tree that the file tools read and write through.
+
+    Reads are served from memory after the first disk read, writes only touch
+    memory until `flush()` writes the dirty files back in one batch. With
+    `in_memory=True` nothing is ever read from or written to disk, which keeps
+    tests and benchmarks free of filesystem effects.
+
+    Listings and existence checks are answered by a FileIndex that the write
+    path keeps current, so they never walk the tree.
+    """
+
+    def __init__(self, root: str | os.PathLike, in_memory: bool = False,
+                 flush_policy: str = os.getenv("WORKSPACE_FLUSH", "step")):
+        if flush_policy not in FLUSH_POLICIES:
+            raise ValueError(f"Unknown flush policy: {flush_policy!r} (expected one of {FLUSH_POLICIES})")
+        self.root = pathlib.Path(root).absolute()
+        self.in_memory = in_memory
+        self.flush_policy = flush_policy
+        self._resolved_root: Optional[pathlib.Path] = None
+        self._files: dict[str, str] = {}
+        self._missing: set[str] = set()
+        self._dirty: set[str] = set()
+        self._rel_cache: dict[str, str] = {}
+        self._line_offsets: dict[str, array] = {}
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self.index = FileIndex(None if in_memory else self.root)
+        self.symbols = SymbolIndex()
+
+    @property
+    def resolved_root(self) -> pathlib.Path:
+        if self._resolved_root is None:
+            self._resolved_root = self.root.resolve()
+        return self._resolved_root
+
+    def relpath(self, path: str | os.PathLike) -> str:
+        """Normalizes `path` to a project-relative POSIX path without touching the disk."""
+        key = str(path)
+        rel = self._rel_cache.get(key)
+        if rel is not None:
+            return rel
+
+        raw = key.replace("\\", "/")
+        if posixpath.isabs(raw):
+            for root in (self.root.as_posix(), self.resolved_root.as_posix()):
+                if raw == root or raw.startswith(root + "/"):
+                    raw = raw[len(root):].lstrip("/") or "."
+                    break
+            else:
+                raise ValueError("Attempt to write outside project root")
+        rel = posixpath.normpath(raw)
+        if rel == ".." or rel.startswith("../"):
+            raise ValueError("Attempt to write outside project root")
+        self._rel_cache[key] = rel
+        return rel
+
+    def disk_path(self, path: str | os.PathLike) -> pathlib.Path:
+        """Resolved on-disk location of `path`, refusing anything outside the root (symlinks included)."""
+        root = self.resolved_root
+        p = (root / self.relpath(path)).resolve()
+        if root not in p.parents and root != p:
+            raise ValueError("Attempt to write outside project root")
+        return p
+
+    def read(self, path: str | os.PathLike) -> Optional[str]:
+        """Content of `path`, or None if the file does not exist."""
+        rel = self.relpath(path)
+        with self._lock:
+            if rel in self._files:
+                return self._files[rel]
+            if rel in self._missing or self.in_memory:
+                return None
+        # ignored paths, e.g. a .vscode/settings.json the coder wrote, are looked up on disk
+        if self.index.covers(rel) and not self.index.has_file(rel):
+            return None
+
+        p = self.disk_path(rel)
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                content = f.read()
+        except (FileNotFoundError, IsADirectoryError):
+            content = None
+
+        with self._lock:
+            if rel in self._files:
+                return self._files[rel]
+            if content is None:
+                self._missing.add(rel)
+            else:
+                self._files[rel] = content
+        return content
+
+    def read_lines(self, path: str | os.PathLike, line_start: int = 1,
+                   line_end: Optional[int] = None) -> Optional[tuple[str, int]]:
+        """Lines [line_start, line_end] of `path` and its total line count, or None if it does not exist.
+
+        Files already in memory are sliced with a cached line-offset index; files
+        only on disk are memory-mapped so just the requested byte range is read.
+        """
+        rel = self.relpath(path)
+        with self._lock:
+            content = self._files.get(rel)
+            if content is not None:
+                offsets = self._line_offsets.get(rel)
+                if offsets is None:
+                    offsets = self._line_offsets[rel] = line_index.build_offsets(content, "\n")
+                start, end = line_index.slice_lines(offsets, len(content), line_start, line_end)
+                return content[start:end], len(offsets)
+            if rel in self._missing or self.in_memory:
+                return None
+        if self.index.covers(rel) and not self.index.has_file(rel):
+            return None
+        try:
+            return line_index.read_line_range(self.disk_path(rel), line_start, line_end)
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+
+    def write(self, path: str | os.PathLike, content: str) -> str:
+        rel = self.relpath(path)
+        if rel == ".":
+            raise ValueError("Cannot write to the project root itself")
+        with self._lock:
+            self._files[rel] = content
+            self._dirty.add(rel)
+            self._missing.discard(rel)
+            self._line_offsets.pop(rel, None)
+            self.symbols.remove(rel)
+        self.index.add(rel)
+        return rel
+
+    def exists(self, path: str | os.PathLike) -> bool:
+        return self.read(path) is not None
+
+    def is_dir(self, path: str | os.PathLike) -> bool:
+        return self.index.is_dir(self.relpath(path))
+
+    def listdir(self, path: str | os.PathLike = ".") -> tuple[list[str], list[str]]:
+        """Names of the sub-directories and files directly inside `path`."""
+        return self.index.listdir(self.relpath(path))
+
+    def list_files(self, path: str | os.PathLike = ".") -> list[str]:
+        """Project-relative paths of every file below `path`."""
+        return self.index.files_under(self.relpath(path))
+
+    def outline(self, path: str | os.PathLike) -> Optional[list[Symbol]]:
+        """Symbols defined in `path`, or None if it does not exist."""
+        rel = self.relpath(path)
+        symbols = self.symbols.outline(rel)
+        if symbols is not None:
+            return symbols
+        content = self.read(rel)
+        if content is None:
+            return None
+        symbols = self.symbols.update(rel, content)
+        with self._lock:
+            if self._files.get(rel) is not content:
+                self.symbols.remove(rel)  # rewritten while we were parsing
+        return symbols
+
+    def find_symbol(self, name: str) -> list[Symbol]:
+        """Definitions of `name` across the project."""
+        for rel in self.list_files():
+            if not self.symbols.has(rel) and posixpath.splitext(rel)[1].lower() in SUPPORTED_EXTENSIONS:
+                self.outline(rel)
+        return self.symbols.lookup(name)
+
+    def dirty_files(self) -> list[str]:
+        with self._lock:
+            return sorted(self._dirty)
+
+    def flush(self) -> int:
+        """Writes every dirty file to disk in one batch; returns how many were written."""
+        if self.in_memory:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                pending = {rel: self._files[rel] for rel in self._dirty}
+                self._dirty.clear()
+
+            for rel, content in pending.items():
+                p = self.disk_path(rel)
+                p.parent.mkdir(parents=True, exist_ok=True)
+                with open(p, "w", encoding="utf-8") as f:
+                    f.write(content)
+                line_index.invalidate(p)
+            self.index.mark_flushed(pending)
+        return len(pending)
+
+    def invalidate(self) -> None:
+        """Drops cached reads so the next access sees external changes on disk."""
+        with self._lock:
+            self._files = {rel: self._files[rel] for rel in self._dirty}
+            self._missing.clear()
+            self._line_offsets = {rel: self._line_offsets[rel] for rel in self._dirty if rel in self._line_offsets}
+            self.symbols = SymbolIndex()
+        self.index.refresh(force=True)
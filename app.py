@@ -1,9 +1,8 @@
 import streamlit as st
 import sys
 import os
+import time
 from pathlib import Path
-import zipfile
-from io import BytesIO
 from dotenv import load_dotenv  # ← ADD THIS IMPORT
 
 # Load environment variables from .env file FIRST
@@ -12,9 +11,6 @@ load_dotenv()  # ← ADD THIS LINE
 # Add agent to path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from agent.graph import agent
-from agent.tools import PROJECT_ROOT, init_project_root
-
 # Get API key from environment (loaded from .env file)
 # No hardcoded key needed - it reads from .env automatically
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -31,9 +27,6 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize project root
-init_project_root()
-
 # Title and description
 st.title("🤖 AI Coding Assistant")
 st.markdown("**AI-powered code generator** - Transform your ideas into working code!")
@@ -69,182 +62,203 @@ user_prompt = st.text_area(
     label_visibility="collapsed"
 )
 
+@st.cache_resource
+def get_job_queue():
+    """One job queue per server process, shared by every browser session.
+
+    The agent is imported here rather than at the top, so the page renders
+    without loading LangChain; the first generation pays for it once.
+    """
+    from agent.graph import get_agent
+    from agent.jobs import JobQueue
+
+    return JobQueue(
+        get_agent(),
+        max_workers=int(os.getenv("APP_MAX_WORKERS", "2")),
+        config={"recursion_limit": int(os.getenv("APP_RECURSION_LIMIT", "100"))},
+        finished_ttl=float(os.getenv("APP_JOB_TTL_SECONDS", "3600")),
+        max_finished=int(os.getenv("APP_MAX_FINISHED_JOBS", "100")),
+    )
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_artifacts(job_id: str, workspace: str):
+    """File list, contents and ZIP of a finished run, kept across reruns (such as a
+    download click) and shared by every session showing the same run."""
+    from agent.artifacts import ProjectArtifacts
+
+    return ProjectArtifacts(Path(workspace))
+
+
+# Files larger than this only render once their "Show" toggle is switched on
+LAZY_RENDER_BYTES = int(os.getenv("APP_LAZY_RENDER_BYTES", str(32 * 1024)))
+
+# Language mapping for syntax highlighting
+lang_map = {
+    '.py': 'python',
+    '.js': 'javascript',
+    '.html': 'html',
+    '.css': 'css',
+    '.json': 'json',
+    '.md': 'markdown',
+    '.jsx': 'javascript',
+    '.tsx': 'typescript',
+    '.ts': 'typescript',
+    '.yml': 'yaml',
+    '.yaml': 'yaml',
+    '.txt': 'text',
+}
+
 # Generate button
 if st.button("🚀 Generate Project", type="primary", use_container_width=True):
     if not user_prompt:
         st.error("❌ Please enter a project description!")
     else:
-        # Clear previous project
-        import shutil
-
-        if PROJECT_ROOT.exists():
-            shutil.rmtree(PROJECT_ROOT)
-        init_project_root()
-
-        # Progress tracking
-        progress_bar = st.progress(0, text="🤖 Coder Buddy is working...")
-        status = st.empty()
-
-        try:
-            # Planning phase
-            status.info("📋 Planning your project...")
-            progress_bar.progress(25)
-
-            # Architecture phase
-            status.info("🏗️ Designing architecture...")
-            progress_bar.progress(50)
-
-            # Coding phase
-            status.info("💻 Writing code...")
-            progress_bar.progress(75)
-
-            # Generate project
-            result = agent.invoke(
-                {"user_prompt": user_prompt},
-                {"recursion_limit": 100}
-            )
+        # Each job runs in its own workspace on the shared worker pool
+        st.session_state["job_id"] = get_job_queue().submit(user_prompt).id
+
+job_queue = get_job_queue() if "job_id" in st.session_state else None
+job = job_queue.get(st.session_state["job_id"]) if job_queue is not None else None
+
+if job is not None and not job.finished:
+    # Progress tracking
+    st.progress(job.progress, text="🤖 Coder Buddy is working...")
+    position = job_queue.queue_position(job.id)
+    if job.status == "queued" and position:
+        st.info(f"⏳ Waiting in queue ({position} job(s) ahead)...")
+    else:
+        st.info(job.message)
+
+    # Files show up as soon as the coder writes them
+    if job.files:
+        st.caption("📂 Files written so far")
+        for path in sorted(job.files):
+            with st.expander(f"📄 {path}", expanded=False):
+                content = job_queue.read_file(job.id, path)
+                if content is None:
+                    st.caption("⏳ Not written yet")
+                else:
+                    st.code(content)
 
-            progress_bar.progress(100)
-            status.success("✅ Project generated!")
-
-            # Display success message
-            st.success("🎉 **Project generated successfully!**")
-
-            # Extract plan from result
-            if "plan" in result:
-                plan = result["plan"]
-
-                # Project overview
-                st.header("📊 Project Overview")
-
-                col1, col2 = st.columns(2)
-
-                with col1:
-                    st.subheader("📦 Details")
-                    st.write(f"**Name:** {plan.name}")
-                    st.write(f"**Description:** {plan.description}")
-                    st.write(f"**Tech Stack:** {plan.techstack}")
-
-                with col2:
-                    st.subheader("✨ Features")
-                    for feature in plan.features:
-                        st.write(f"- {feature}")
-
-                # Files planned
-                st.subheader("📁 Files Created")
-                for file in plan.files:
-                    st.write(f"- `{file.path}` - {file.purpose}")
-
-            # Display generated files
-            st.header("💻 Generated Code")
-
-            if PROJECT_ROOT.exists():
-                # Get all generated files
-                files = list(PROJECT_ROOT.rglob("*"))
-                file_list = [f for f in files if f.is_file()]
-
-                if file_list:
-                    st.write(f"**Total files created:** {len(file_list)}")
-
-                    # Language mapping for syntax highlighting
-                    lang_map = {
-                        '.py': 'python',
-                        '.js': 'javascript',
-                        '.html': 'html',
-                        '.css': 'css',
-                        '.json': 'json',
-                        '.md': 'markdown',
-                        '.jsx': 'javascript',
-                        '.tsx': 'typescript',
-                        '.ts': 'typescript',
-                        '.yml': 'yaml',
-                        '.yaml': 'yaml',
-                        '.txt': 'text',
-                    }
-
-                    # Display each file
-                    for file_path in sorted(file_list):
-                        relative_path = file_path.relative_to(PROJECT_ROOT)
-
-                        with st.expander(f"📄 {relative_path}", expanded=False):
-                            try:
-                                with open(file_path, 'r', encoding='utf-8') as f:
-                                    content = f.read()
-
-                                # Get language for syntax highlighting
-                                ext = file_path.suffix.lower()
-                                lang = lang_map.get(ext, 'text')
-
-                                # Display code with syntax highlighting
-                                st.code(content, language=lang, line_numbers=True)
-
-                                # Download button for individual file
-                                st.download_button(
-                                    label=f"⬇️ Download {file_path.name}",
-                                    data=content,
-                                    file_name=file_path.name,
-                                    mime="text/plain",
-                                    key=f"download_{relative_path}"
-                                )
-
-                            except Exception as e:
-                                st.error(f"Could not read file: {e}")
-
-                    # Download all as ZIP
-                    st.header("📦 Download Project")
-
-                    # Create ZIP file
-                    zip_buffer = BytesIO()
-                    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                        for file_path in file_list:
-                            zip_file.write(
-                                file_path,
-                                file_path.relative_to(PROJECT_ROOT)
-                            )
-
-                    zip_buffer.seek(0)
-
-                    # Clean filename - check if plan exists first
-                    if "plan" in result and hasattr(result["plan"], "name"):
-                        project_name = result["plan"].name.replace(' ', '_').replace('/', '_').lower()
-                    else:
-                        project_name = "generated_project"
-
-                    st.download_button(
-                        label="📥 Download Complete Project as ZIP",
-                        data=zip_buffer,
-                        file_name=f"{project_name}_project.zip",
-                        mime="application/zip",
-                        use_container_width=True
-                    )
-
-                    # Show where files are saved
-                    st.info(f"📁 Files are also saved locally at: `{PROJECT_ROOT}`")
+    # Poll the job until it finishes
+    time.sleep(1)
+    st.rerun()
 
-                else:
-                    st.warning("⚠️ No files were generated.")
-                    st.info(
-                        "💡 **Tip:** Try being more specific in your prompt. For example: 'Create a calculator with HTML, CSS, and JavaScript that can add, subtract, multiply, and divide.'")
+elif job is not None and job.status == "failed":
+    st.error(f"❌ Error generating project: {job.error}")
+
+    # Provide helpful troubleshooting
+    st.info("""
+    **Common issues:**
+    - API key not set correctly
+    - Network connection problems
+    - Recursion limit reached (try a simpler project)
+    """)
+
+elif job is not None:
+    result = job.result
+    project_root = Path(job.workspace)
+
+    # Display success message
+    st.success("🎉 **Project generated successfully!**")
+
+    # Extract plan from result
+    if "plan" in result:
+        plan = result["plan"]
+
+        # Project overview
+        st.header("📊 Project Overview")
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.subheader("📦 Details")
+            st.write(f"**Name:** {plan.name}")
+            st.write(f"**Description:** {plan.description}")
+            st.write(f"**Tech Stack:** {plan.techstack}")
+
+        with col2:
+            st.subheader("✨ Features")
+            for feature in plan.features:
+                st.write(f"- {feature}")
+
+        # Files planned
+        st.subheader("📁 Files Created")
+        for file in plan.files:
+            st.write(f"- `{file.path}` - {file.purpose}")
+
+    # Display generated files
+    st.header("💻 Generated Code")
+
+    if project_root.exists():
+        # Scanned once per run; reruns reuse the list, the cached contents and the ZIP
+        artifacts = get_artifacts(job.id, job.workspace)
+
+        if artifacts.files:
+            st.write(f"**Total files created:** {len(artifacts.files)} "
+                     f"({artifacts.total_size / 1024:.1f} KB)")
+
+            # Display each file
+            for file in artifacts.files:
+                file_name = Path(file.path).name
+
+                with st.expander(f"📄 {file.path}", expanded=False):
+                    if file.size > LAZY_RENDER_BYTES and not st.toggle(
+                            f"Show {file.size / 1024:.0f} KB of content", key=f"show_{job.id}_{file.path}"):
+                        continue
+                    try:
+                        content = artifacts.read(file.path)
+
+                        # Get language for syntax highlighting
+                        lang = lang_map.get(Path(file.path).suffix.lower(), 'text')
+
+                        # Display code with syntax highlighting
+                        st.code(content, language=lang, line_numbers=True)
+
+                        # Download button for individual file
+                        st.download_button(
+                            label=f"⬇️ Download {file_name}",
+                            data=content,
+                            file_name=file_name,
+                            mime="text/plain",
+                            key=f"download_{job.id}_{file.path}"
+                        )
+
+                    except Exception as e:
+                        st.error(f"Could not read file: {e}")
+
+            # Download all as ZIP
+            st.header("📦 Download Project")
+
+            # Clean filename - check if plan exists first
+            if "plan" in result and hasattr(result["plan"], "name"):
+                project_name = result["plan"].name.replace(' ', '_').replace('/', '_').lower()
             else:
-                st.warning("⚠️ Project directory not found.")
-                st.info("The project folder should be created automatically. This might be a permissions issue.")
-
-            # Show raw state only in expander for debugging
-            with st.expander("🔍 Debug: View Raw State"):
-                st.json(result)
-
-        except Exception as e:
-            st.error(f"❌ Error generating project: {str(e)}")
-            with st.expander("🐛 View Error Details"):
-                st.exception(e)
-
-            # Provide helpful troubleshooting
-            st.info("""
-            **Common issues:**
-            - API key not set correctly
-            - Network connection problems
-            - Recursion limit reached (try a simpler project)
-            """)
+                project_name = "generated_project"
+
+            # Called on click, so reruns neither build nor read the ZIP
+            st.download_button(
+                label="📥 Download Complete Project as ZIP",
+                data=lambda: Path(artifacts.zip_path()).read_bytes(),
+                file_name=f"{project_name}_project.zip",
+                mime="application/zip",
+                use_container_width=True
+            )
+
+            # Show where files are saved
+            st.info(f"📁 Files are also saved locally at: `{project_root}`")
+
+        else:
+            st.warning("⚠️ No files were generated.")
+            st.info(
+                "💡 **Tip:** Try being more specific in your prompt. For example: 'Create a calculator with HTML, CSS, and JavaScript that can add, subtract, multiply, and divide.'")
+    else:
+        st.warning("⚠️ Project directory not found.")
+        st.info("The project folder should be created automatically. This might be a permissions issue.")
+
+    # Show raw state only in expander for debugging
+    with st.expander("🔍 Debug: View Raw State"):
+        st.json(result)
 
 # Footer
 st.markdown("---")
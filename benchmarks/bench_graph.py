@@ -0,0 +1,111 @@
+"""End-to-end planner -> architect -> coder runs against the scripted model."""
+
+import contextlib
+import io
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Optional
+
+from agent import metrics
+from agent.graph import get_graph, set_llm
+from agent.hedging import HedgedChatModel
+from agent.tools import add_write_hook, project_root
+
+from fake_llm import ScriptedChatModel
+
+
+# perf_counter() of the first file write of the current run
+_first_write: list[float] = []
+
+
+def _on_write(path: str, content: str) -> None:
+    if not _first_write:
+        _first_write.append(time.perf_counter())
+
+
+add_write_hook(_on_write)
+
+
+def _run(n_steps: int, concurrency: int, pipeline: bool = False, disk: bool = False) -> tuple[float, float]:
+    """Wall time of one run and the time until its first file was written.
+
+    With `disk`, files are flushed into a temporary directory and the run
+    manifest is written beside it, as in a real run.
+    """
+    agent = get_graph().compile()
+    config = {"recursion_limit": 100, "configurable": {"coder_concurrency": concurrency, "pipeline": pipeline}}
+    _first_write.clear()
+    # the per-step progress prints would dominate a terminal-bound run
+    with tempfile.TemporaryDirectory() as tmp, project_root(Path(tmp) / "project", in_memory=not disk), \
+            contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        agent.invoke({"user_prompt": f"synthetic project with {n_steps} steps"}, config)
+        end = time.perf_counter()
+    return end - start, (_first_write[0] if _first_write else end) - start
+
+
+def bench_graph(n_steps: int, latency: float = 0.0, concurrency: int = 4, memory: bool = True,
+                token_latency: float = 0.0, stall_every: int = 0, stall_seconds: float = 0.0,
+                hedge_after: Optional[float] = None, hedge: bool = False,
+                pipeline: bool = False, disk: bool = False) -> dict[str, float]:
+    """Runs the whole graph over a synthetic plan of `n_steps` steps.
+
+    `overhead_ms_per_step` is the time a coder step spends outside the model
+    (prompt packing, agent construction, tool dispatch, scheduling), summed over
+    worker threads. Memory is measured in a second run under tracemalloc, which
+    would otherwise distort the timings.
+
+    With `hedge`, the model is wrapped in a HedgedChatModel (rolling threshold,
+    or `hedge_after` seconds); `stall_every` / `stall_seconds` inject the slow
+    calls it is meant to absorb, and `step_max_s` shows the tail. `pipeline`
+    streams the architect's answer into the coder; compare `first_file_s`.
+    `disk` runs against a temporary directory instead of an in-memory
+    workspace, which adds the file flushes and the run manifest.
+    """
+    model = ScriptedChatModel(n_steps=n_steps, latency=latency, seconds_per_output_token=token_latency,
+                              stall_every=stall_every,
+                              stall_seconds=stall_seconds)
+    set_llm(HedgedChatModel(llm=model, hedge_after=hedge_after, min_samples=10) if hedge else model)
+    collected = metrics.configure(enabled=True)
+    try:
+        wall, first_file = _run(n_steps, concurrency, pipeline, disk)
+        snapshot = collected.snapshot()
+        stats = model.stats()
+
+        step_seconds = sum(row["sum"] for row in snapshot["summaries"] if row["metric"] == "coder_step_seconds")
+        step_max = max((row["max"] for row in snapshot["summaries"] if row["metric"] == "coder_step_seconds"),
+                       default=0.0)
+        tool_seconds = sum(row["sum"] for row in snapshot["summaries"] if row["metric"] == "tool_call_seconds")
+        tool_calls = sum(row["count"] for row in snapshot["summaries"] if row["metric"] == "tool_call_seconds")
+        result = {
+            "wall_s": wall,
+            "first_file_s": first_file,
+            "ms_per_step": wall * 1000 / n_steps,
+            "llm_calls": sum(stats["calls"].values()),
+            "llm_s": sum(stats["seconds"].values()),
+            "overhead_ms_per_step": (step_seconds - stats["seconds"].get("coder", 0.0) - tool_seconds) * 1000 / n_steps,
+            "tool_ms_per_call": tool_seconds * 1000 / max(tool_calls, 1),
+            "step_max_s": step_max,
+        }
+        if hedge:
+            counters = snapshot["counters"]
+            result["llm_hedges"] = sum(row["value"] for row in counters if row["metric"] == "llm_hedges")
+            result["llm_hedge_wins"] = sum(row["value"] for row in counters
+                                           if row["metric"] == "llm_hedge_outcomes" and row["winner"] == "hedge")
+
+        if memory:
+            metrics.configure(enabled=False)
+            tracemalloc.start()
+            try:
+                _run(n_steps, concurrency, pipeline, disk)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            result["peak_mib"] = peak / 2 ** 20
+            result["peak_kib_per_step"] = peak / 1024 / n_steps
+        return result
+    finally:
+        metrics.configure(enabled=False)
+        set_llm(None)
@@ -0,0 +1,69 @@
+"""Microbenchmarks of the file tools on a large on-disk project tree."""
+
+import itertools
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from agent.tools import (apply_patch, edit_file, file_outline, list_file, lookup_symbol, open_file,
+                         print_tree, project_root, read_file, run_cmd, write_file)
+
+from fake_llm import synthetic_file
+
+
+def build_tree(root: Path, dirs: int, files_per_dir: int, big_file_lines: int) -> None:
+    for d in range(dirs):
+        directory = root / f"pkg{d}"
+        directory.mkdir(parents=True)
+        for f in range(files_per_dir):
+            (directory / f"mod{f}.js").write_text(synthetic_file(f"pkg{d}/mod{f}.js", f, 5), encoding="utf-8")
+    (root / "big.txt").write_text("".join(f"line {n} of a large file\n" for n in range(big_file_lines)),
+                                  encoding="utf-8")
+
+
+def _time(fn: Callable[[], object], repeat: int) -> float:
+    """Median microseconds per call."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def bench_tools(dirs: int = 50, files_per_dir: int = 100, big_file_lines: int = 200_000,
+                repeat: int = 200) -> dict[str, float]:
+    """Median latency in microseconds of each tool, called the way the agent calls it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        build_tree(root, dirs, files_per_dir, big_file_lines)
+        results = {}
+        with project_root(root) as workspace:
+            counter = itertools.count()
+            middle = big_file_lines // 2
+            cases = {
+                "write_file": lambda: write_file.invoke(
+                    {"path": f"out/new{next(counter)}.js", "content": "export const x = 1;\n"}),
+                "read_file": lambda: read_file.invoke({"path": "pkg7/mod7.js"}),
+                "open_file_big_middle": lambda: open_file.invoke(
+                    {"path": "big.txt", "line_start": middle, "line_end": middle + 50}),
+                "list_file_root": lambda: list_file.invoke({"directory": "."}),
+                "list_file_subdir": lambda: list_file.invoke({"directory": "pkg3"}),
+                "print_tree": lambda: print_tree.invoke({"path": ".", "depth": 2}),
+                "edit_file": lambda: edit_file.invoke(
+                    {"path": "pkg1/mod1.js", "old_str": "// next-step", "new_str": "// next-step"}),
+                "apply_patch": lambda: apply_patch.invoke(
+                    {"path": "pkg2/mod2.js", "patch": "@@ -1,1 +1,1 @@\n-// pkg2/mod2.js: module 2\n+// pkg2/mod2.js: module 2\n"}),
+                "file_outline": lambda: file_outline.invoke({"path": "pkg4/mod4.js"}),
+                "lookup_symbol": lambda: lookup_symbol.invoke({"name": "fn9_3"}),
+                "run_cmd": lambda: run_cmd.invoke({"cmd": "echo ok"}),
+            }
+            # first calls build the indexes; report them separately from the steady state
+            results["cold_list_file_root_us"] = _time(cases["list_file_root"], 1)
+            results["cold_lookup_symbol_us"] = _time(cases["lookup_symbol"], 1)
+            for name, fn in cases.items():
+                results[f"{name}_us"] = _time(fn, repeat)
+            workspace.flush()
+    return results
@@ -0,0 +1,178 @@
+"""Deterministic stand-in for the Groq chat model, for offline benchmarks.
+
+`ScriptedChatModel` answers the planner and architect with synthetic `Plan` /
+`TaskPlan` structured outputs of a configurable size and drives the coder's
+ReAct loop with scripted tool calls: the first step on a file writes it with
+write_file, later steps on the same file change it with edit_file. Latency is
+simulated with `time.sleep`, so runs are reproducible and cost nothing;
+`stall_every` makes every n-th call stall, to exercise tail-latency handling.
+Streaming calls spread the same delay over the chunks of the answer.
+"""
+
+import json
+import re
+import threading
+import time
+from typing import Any, Iterator, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+# Inserted into every generated file; each later step on the file edits it
+EDIT_MARKER = "// next-step"
+
+
+def synthetic_file(path: str, index: int, functions: int) -> str:
+    lines = [f"// {path}: module {index}", f"import {{ helper }} from './mod{index // 2}.js';", ""]
+    for n in range(functions):
+        lines += [f"export function fn{index}_{n}(a, b) {{", f"  return helper(a) + b * {n};", "}", ""]
+    lines.append(EDIT_MARKER)
+    return "\n".join(lines) + "\n"
+
+
+class ScriptedChatModel(BaseChatModel):
+    n_steps: int = 10
+    """Implementation steps in the synthetic TaskPlan."""
+    steps_per_file: int = 2
+    """Steps sharing one file; every step after the first edits it."""
+    functions_per_file: int = 20
+    """Size of each generated file."""
+    latency: float = 0.0
+    """Seconds slept per call."""
+    seconds_per_output_token: float = 0.0
+    """Extra seconds slept per (estimated) output token, to model generation speed."""
+    stall_every: int = 0
+    """Every n-th call (counted across kinds) sleeps `stall_seconds` more; 0 never stalls."""
+    stall_seconds: float = 0.0
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _started: int = PrivateAttr(default=0)
+    _calls: dict[str, int] = PrivateAttr(default_factory=dict)
+    _seconds: dict[str, float] = PrivateAttr(default_factory=dict)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"n_steps": self.n_steps, "steps_per_file": self.steps_per_file}
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], tool_choice=tool_choice, **kwargs)
+
+    @property
+    def n_files(self) -> int:
+        return max(1, -(-self.n_steps // self.steps_per_file))
+
+    def file_path(self, index: int) -> str:
+        return f"src/mod{index}.js"
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Calls and seconds spent inside the model, per kind (plan, task_plan, coder)."""
+        with self._lock:
+            return {"calls": dict(self._calls), "seconds": dict(self._seconds)}
+
+    def _plan(self) -> dict:
+        return {
+            "name": "bench-app",
+            "description": f"Synthetic project with {self.n_files} modules",
+            "techstack": "javascript",
+            "features": ["synthetic"],
+            "files": [{"path": self.file_path(i), "purpose": f"module {i}"} for i in range(self.n_files)],
+        }
+
+    def _task_plan(self) -> dict:
+        steps = []
+        for step in range(self.n_steps):
+            index = step % self.n_files
+            steps.append({
+                "filepath": self.file_path(index),
+                "task_description": f"step {step}: implement part {step // self.n_files} of module {index}",
+                "depends_on": [self.file_path(index // 2)] if index else [],
+            })
+        return {"implementation_steps": steps}
+
+    def _coder_turn(self, messages: list[BaseMessage]) -> tuple[str, AIMessage]:
+        if isinstance(messages[-1], ToolMessage):
+            return "coder", AIMessage("done")
+        prompt = next(m.content for m in messages if m.type == "human")
+        step = int(re.search(r"step (\d+):", prompt).group(1))
+        path = re.search(r"^File: (\S+)", prompt, re.MULTILINE).group(1)
+        index = step % self.n_files
+        if step < self.n_files:
+            call = {"name": "write_file",
+                    "args": {"path": path, "content": synthetic_file(path, index, self.functions_per_file)}}
+        else:
+            call = {"name": "edit_file",
+                    "args": {"path": path, "old_str": EDIT_MARKER,
+                             "new_str": f"export const part{step} = {step};\n{EDIT_MARKER}"}}
+        return "coder", AIMessage("", tool_calls=[{**call, "id": f"call-{step}"}])
+
+    def _respond(self, messages: list[BaseMessage], **kwargs) -> tuple[str, AIMessage, float]:
+        """The answer to `messages`, its kind and the seconds it should take."""
+        with self._lock:
+            self._started += 1
+            stalled = self.stall_every and self._started % self.stall_every == 0
+        names = [t["function"]["name"] for t in kwargs.get("tools", [])]
+        if "Plan" in names:
+            kind, message = "plan", AIMessage("", tool_calls=[{"name": "Plan", "args": self._plan(), "id": "plan"}])
+        elif "TaskPlan" in names:
+            kind, message = "task_plan", AIMessage(
+                "", tool_calls=[{"name": "TaskPlan", "args": self._task_plan(), "id": "task_plan"}])
+        else:
+            kind, message = self._coder_turn(messages)
+
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        output_tokens = (len(str(message.tool_calls)) + len(message.content)) // 4
+        message.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                  "total_tokens": input_tokens + output_tokens}
+        delay = self.latency + output_tokens * self.seconds_per_output_token
+        if stalled:
+            delay += self.stall_seconds
+        return kind, message, delay
+
+    def _record(self, kind: str, start: float) -> None:
+        with self._lock:
+            self._calls[kind] = self._calls.get(kind, 0) + 1
+            self._seconds[kind] = self._seconds.get(kind, 0.0) + time.perf_counter() - start
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        start = time.perf_counter()
+        kind, message, delay = self._respond(messages, **kwargs)
+        if delay:
+            time.sleep(delay)
+        self._record(kind, start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                run_manager=None, chunk_chars: int = 64, **kwargs) -> Iterator[ChatGenerationChunk]:
+        start = time.perf_counter()
+        kind, message, delay = self._respond(messages, **kwargs)
+        # `latency` is the time to the first chunk; the rest is spread over the chunks
+        first = min(delay, self.latency)
+        if first:
+            time.sleep(first)
+        if message.tool_calls:
+            call = message.tool_calls[0]
+            args = json.dumps(call["args"])
+            pieces = [args[i:i + chunk_chars] for i in range(0, len(args), chunk_chars)] or [""]
+        else:
+            pieces = [message.content[i:i + chunk_chars] for i in range(0, len(message.content), chunk_chars)] or [""]
+        for n, piece in enumerate(pieces):
+            if n:
+                time.sleep((delay - first) / (len(pieces) - 1))
+            if message.tool_calls:
+                chunk = AIMessageChunk("", tool_call_chunks=[
+                    {"name": call["name"] if n == 0 else None, "args": piece,
+                     "id": call["id"] if n == 0 else None, "index": 0}])
+            else:
+                chunk = AIMessageChunk(piece)
+            if n == len(pieces) - 1:
+                chunk.usage_metadata = message.usage_metadata
+            yield ChatGenerationChunk(message=chunk)
+        self._record(kind, start)
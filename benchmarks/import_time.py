@@ -0,0 +1,113 @@
+"""Startup cost of the CLI and the agent package, measured with `python -X importtime`.
+
+Usage:
+    python benchmarks/import_time.py              # report
+    python benchmarks/import_time.py --check      # also fail on regressions
+
+Each target runs in a fresh interpreter. `--check` fails when `main.py --help`
+or the app's first render (run headless through Streamlit's AppTest, skipped
+when Streamlit is not installed) pulls in LangChain/LangGraph/Groq, when
+importing agent.graph builds the Groq client, or when a target takes longer
+than its budget. The report ends with what the deferred imports save.
+"""
+
+import argparse
+import importlib.util
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must not be imported before there is actual generation work to do
+HEAVY_MODULES = ("langchain", "langchain_core", "langchain_groq", "langgraph", "groq", "langsmith")
+
+# Renders app.py once without a browser, the way a first page view does
+_APP_RENDER = ("from streamlit.testing.v1 import AppTest; "
+               "at = AppTest.from_file('app.py').run(timeout=30); assert not at.exception, at.exception")
+
+# name -> (argv after the interpreter, budget in ms, heavy modules it may import)
+TARGETS = {
+    "main --help": (["main.py", "--help"], 300, ()),
+    "light agent modules": (["-c", "import agent.checkpoint, agent.scheduler, agent.workspace"], 300, ()),
+    "app first render": (["-c", _APP_RENDER], 2000, ()),
+    # the model client is only built, and Groq only imported, by the first get_llm()
+    "agent.graph": (["-c", "import agent.graph"], 1500, ("langchain", "langchain_core", "langgraph", "langsmith")),
+    "agent.graph + compile": (["-c", "import agent.graph as g; g.get_agent()"], 2000, HEAVY_MODULES),
+    "agent.graph + llm": (["-c", "import agent.graph as g; g.get_agent(); g.get_llm()"], 2500, HEAVY_MODULES),
+    # the same entry points with agent.graph imported up front, as before it was deferred
+    "main --help, eager": (["-c", "import agent.graph, runpy, sys; sys.argv = ['main.py', '--help']; "
+                                  "runpy.run_path('main.py', run_name='__main__')"], 2000, HEAVY_MODULES),
+    "app first render, eager": (["-c", "import agent.graph; " + _APP_RENDER], 3000, HEAVY_MODULES),
+}
+# (lazy target, the same work with the deferred imports done eagerly)
+SAVINGS = [
+    ("main --help", "main --help, eager"),
+    ("app first render", "app first render, eager"),
+    ("agent.graph", "agent.graph + llm"),
+]
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure(argv: list[str]) -> tuple[float, dict[str, int], set[str]]:
+    """Wall time in ms, cumulative import time in us per top-level import, and every module imported."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.setdefault("GROQ_API_KEY", "benchmark")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", *argv], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} failed:\n{proc.stderr[-2000:]}")
+
+    top_level, imported = {}, set()
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            imported.add(m.group(4))
+            if len(m.group(3)) <= 1:
+                top_level[m.group(4)] = int(m.group(2))
+    return wall_ms, top_level, imported
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure import-time startup cost")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero when a budget is exceeded")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per target; the fastest is reported")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports to list per target")
+    args = parser.parse_args()
+
+    failures, walls = [], {}
+    for name, (argv, budget_ms, heavy_allowed) in TARGETS.items():
+        if name.startswith("app first render") and importlib.util.find_spec("streamlit") is None:
+            print(f"{name:<24} skipped (Streamlit is not installed)")
+            continue
+        runs = [measure(argv) for _ in range(args.repeat)]
+        wall_ms, modules, imported = min(runs, key=lambda r: r[0])
+        walls[name] = wall_ms
+        heavy = sorted(m for m in imported
+                       if m.split(".")[0] in HEAVY_MODULES and m.split(".")[0] not in heavy_allowed)
+        print(f"{name:<24} {wall_ms:8.1f} ms  (budget {budget_ms} ms)")
+        for module, us in sorted(modules.items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f"    {us / 1000:8.1f} ms  {module}")
+
+        if wall_ms > budget_ms:
+            failures.append(f"{name}: {wall_ms:.0f} ms > {budget_ms} ms")
+        if heavy:
+            failures.append(f"{name}: imports {', '.join(heavy[:5])}{' ...' if len(heavy) > 5 else ''}")
+
+    for lazy, eager in SAVINGS:
+        if lazy in walls and eager in walls:
+            print(f"{lazy:<24} {walls[eager] - walls[lazy]:8.1f} ms saved against {eager!r}")
+
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if args.check and failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Offline benchmark suite: whole-graph runs on a scripted model plus tool microbenchmarks.
+
+Usage:
+    python benchmarks/run.py                                  # 10/100/1000/2000-step runs + tools
+    python benchmarks/run.py --disk-steps                     # skip the on-disk runs
+    python benchmarks/run.py --steps 10 100 --latency 0.05    # simulate a slow model
+    python benchmarks/run.py --stall-every 10 --stall-seconds 1 --hedge   # tail latency
+    python benchmarks/run.py --token-latency 0.001 --pipeline # overlap architect and coder
+    python benchmarks/run.py --save-baseline baseline.json    # record a baseline
+    python benchmarks/run.py --baseline baseline.json         # fail on regressions
+
+No network access or API key is needed. Every reported number is "lower is
+better", so a comparison flags any metric that grew by more than --tolerance.
+The 1000- and 2000-step plans also run against a temporary directory
+(--disk-steps), which adds the file flushes and the run manifest that the
+in-memory runs leave out. The two largest runs of each kind double as a
+scaling check: the time per step of the larger may exceed that of the smaller
+by at most --max-scaling, so a cost that grows with the plan size fails the
+run even without a baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import warnings
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+
+from bench_graph import bench_graph  # noqa: E402
+from bench_tools import bench_tools  # noqa: E402
+
+# Metrics too small or noisy to compare against a baseline on their own
+_MIN_COMPARABLE = {"_us": 5.0, "_ms_per_step": 0.05, "_ms_per_call": 0.01, "_s": 0.05}
+_NOT_COMPARED = ("llm_calls", "llm_s", "llm_hedges", "llm_hedge_wins", "scaling_ratio")
+
+
+def compare(results: dict[str, float], baseline: dict[str, float], tolerance: float) -> list[str]:
+    regressions = []
+    for key, before in sorted(baseline.items()):
+        now = results.get(key)
+        if now is None or key.endswith(_NOT_COMPARED):
+            continue
+        floor = next((v for suffix, v in _MIN_COMPARABLE.items() if key.endswith(suffix)), 0.0)
+        if now > before * (1 + tolerance) and now - before > floor:
+            regressions.append(f"{key}: {before:.3f} -> {now:.3f} (+{(now / before - 1) * 100 if before else float('inf'):.0f}%)")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument("--steps", type=int, nargs="+", default=[10, 100, 1000, 2000],
+                        help="Synthetic plan sizes to run through the graph (default: 10 100 1000 2000)")
+    parser.add_argument("--disk-steps", type=int, nargs="*", default=[1000, 2000],
+                        help="Plan sizes to also run on disk, without the memory pass (default: 1000 2000)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Simulated seconds per model call (default: 0, which isolates orchestration cost)")
+    parser.add_argument("--token-latency", type=float, default=0.0, metavar="SECONDS",
+                        help="Simulated seconds per output token (default: 0)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Stream the architect's task plan into the coder")
+    parser.add_argument("--stall-every", type=int, default=0, metavar="N",
+                        help="Make every N-th model call stall (default: never)")
+    parser.add_argument("--stall-seconds", type=float, default=1.0, help="Length of a stall (default: 1)")
+    parser.add_argument("--hedge", action="store_true", help="Hedge slow model calls")
+    parser.add_argument("--hedge-after", type=float, metavar="SECONDS",
+                        help="Fixed hedging threshold (default: rolling p90)")
+    parser.add_argument("--concurrency", "-c", type=int, default=4, help="Coder concurrency (default: 4)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--no-tools", action="store_true", help="Skip the tool microbenchmarks")
+    parser.add_argument("--tree", type=int, nargs=2, default=[50, 100], metavar=("DIRS", "FILES"),
+                        help="Size of the tree the tools run on (default: 50 dirs x 100 files)")
+    parser.add_argument("--json", metavar="FILE", help="Write the results to FILE")
+    parser.add_argument("--save-baseline", metavar="FILE", help="Store the results as a baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="Compare against a stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown before a metric counts as regressed (default: 0.25)")
+    parser.add_argument("--max-scaling", type=float, default=1.5, metavar="RATIO",
+                        help="Allowed growth of the time per step from the second largest to the largest "
+                             "plan (default: 1.5; a per-step cost linear in the plan size doubles it at 2x)")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    results: dict[str, float] = {}
+    for prefix, sizes, disk in (("graph", args.steps, False), ("graph.disk", args.disk_steps, True)):
+        for n_steps in sizes:
+            print(f"{prefix}: {n_steps} steps ...", file=sys.stderr, flush=True)
+            for key, value in bench_graph(n_steps, args.latency, args.concurrency,
+                                          memory=not (args.no_memory or disk),
+                                          stall_every=args.stall_every, stall_seconds=args.stall_seconds,
+                                          hedge_after=args.hedge_after, hedge=args.hedge,
+                                          token_latency=args.token_latency, pipeline=args.pipeline,
+                                          disk=disk).items():
+                results[f"{prefix}.steps={n_steps}.{key}"] = value
+        sizes = sorted(set(sizes))
+        if len(sizes) >= 2:
+            smaller, larger = sizes[-2:]
+            results[f"{prefix}.steps={smaller}->{larger}.scaling_ratio"] = (
+                results[f"{prefix}.steps={larger}.ms_per_step"] / results[f"{prefix}.steps={smaller}.ms_per_step"])
+    if not args.no_tools:
+        print(f"tools: {args.tree[0]}x{args.tree[1]} tree ...", file=sys.stderr, flush=True)
+        for key, value in bench_tools(dirs=args.tree[0], files_per_dir=args.tree[1]).items():
+            results[f"tools.{key}"] = value
+
+    width = max(map(len, results), default=0)
+    for key, value in results.items():
+        print(f"{key:<{width}}  {value:12.3f}")
+
+    document = {"python": platform.python_version(), "latency": args.latency,
+                "concurrency": args.concurrency, "stall_every": args.stall_every,
+                "token_latency": args.token_latency, "hedge": args.hedge, "pipeline": args.pipeline,
+                "results": results}
+    for path in filter(None, [args.json, args.save_baseline]):
+        Path(path).write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+
+    status = 0
+    for key, ratio in results.items():
+        if key.endswith("scaling_ratio") and ratio > args.max_scaling:
+            print(f"SCALING {key}: {ratio:.2f} > {args.max_scaling:.2f}", file=sys.stderr)
+            status = 1
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,23 +2,88 @@ import argparse
 import sys
 import traceback
 
-from agent.graph import agent
+from agent.checkpoint import DEFAULT_CHECKPOINT_PATH, new_run_id, open_checkpointer, run_config
+from agent.scheduler import DEFAULT_MAX_CONCURRENCY
 
 
 def main():
     parser = argparse.ArgumentParser(description="Run engineering project planner")
     parser.add_argument("--recursion-limit", "-r", type=int, default=100,
-                        help="Recursion limit for processing (default: 100)")
+                        help="Recursion limit for the graph's supersteps; independent of the number of steps (default: 100)")
+    parser.add_argument("--concurrency", "-c", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help=f"Maximum implementation steps run in parallel (default: {DEFAULT_MAX_CONCURRENCY})")
+    parser.add_argument("--run-id", default=None,
+                        help="Id to checkpoint this run under (default: generated)")
+    parser.add_argument("--resume", metavar="RUN_ID", default=None,
+                        help="Resume a previous run from its last checkpoint")
+    parser.add_argument("--incremental", "-i", action="store_true",
+                        help="Reuse the previous plan and skip implementation steps whose inputs did not change")
+    parser.add_argument("--pipeline", "-p", action="store_true",
+                        help="Start coding steps while the architect is still streaming the task plan")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="Skip the local syntax checks of the generated files and the fix steps they trigger")
+    parser.add_argument("--checkpoint-db", default=str(DEFAULT_CHECKPOINT_PATH),
+                        help=f"SQLite file holding run checkpoints (default: {DEFAULT_CHECKPOINT_PATH})")
+    parser.add_argument("--batch", metavar="JSONL", default=None,
+                        help="Run every prompt of a JSONL file instead of asking for one")
+    parser.add_argument("--workers", "-w", type=int, default=4,
+                        help="Concurrent runs in batch mode (default: 4)")
+    parser.add_argument("--out-dir", default="batch_output",
+                        help="Directory holding one project root per batch run (default: batch_output)")
+    parser.add_argument("--results", default="batch_results.jsonl",
+                        help="JSONL file receiving one result record per batch run (default: batch_results.jsonl)")
+    parser.add_argument("--metrics", metavar="JSONL", default=None,
+                        help="Record node, LLM, tool and step timings and token counts, appending them to JSONL")
+    parser.add_argument("--prometheus", metavar="FILE", default=None,
+                        help="Write a Prometheus text snapshot of the metrics to FILE when the run ends")
+    parser.add_argument("--debug", action="store_true",
+                        help="Log full LLM payloads (LangChain debug/verbose output)")
 
     args = parser.parse_args()
 
+    # the LangChain stack is only loaded once we know there is work to do
+    from agent import metrics
+    from agent.batch import read_requests, run_batch
+    from agent.graph import get_graph, get_llm_cache, get_plan_library, run_summary
+
+    if args.metrics or args.prometheus or args.debug:
+        metrics.configure(enabled=bool(args.metrics or args.prometheus), jsonl_path=args.metrics, debug=args.debug)
+    else:
+        metrics.configure_from_env()
+
     try:
-        user_prompt = input("Enter your project prompt: ")
-        result = agent.invoke(
-            {"user_prompt": user_prompt},
-            {"recursion_limit": args.recursion_limit}
-        )
-        print("Final State:", result)
+        agent = get_graph().compile(checkpointer=open_checkpointer(args.checkpoint_db))
+        run_id = args.resume or args.run_id or new_run_id()
+        config = run_config(run_id,
+                            coder_concurrency=args.concurrency,
+                            incremental=args.incremental or args.resume is not None,
+                            pipeline=args.pipeline,
+                            validate=not args.no_validate)
+        config["recursion_limit"] = args.recursion_limit
+
+        if args.batch:
+            print(f"Batch run id: {run_id}")
+            with open(args.results, "a", encoding="utf-8") as results:
+                counts = run_batch(agent, read_requests(args.batch), results, args.out_dir,
+                                   workers=args.workers, config=config)
+            print(f"Batch finished: {counts['ok']} ok, {counts['error']} failed -> {args.results}")
+            sys.exit(1 if counts["error"] else 0)
+        elif args.resume:
+            if not agent.get_state(config).next:
+                print(f"Run {run_id} has nothing left to resume.", file=sys.stderr)
+                sys.exit(1)
+            print(f"Resuming run {run_id}")
+            result = agent.invoke(None, config)
+        else:
+            user_prompt = input("Enter your project prompt: ")
+            print(f"Run id: {run_id} (resume with --resume {run_id})")
+            result = agent.invoke({"user_prompt": user_prompt}, config)
+
+        print(run_summary(result))
+        if get_llm_cache() is not None:
+            print("LLM cache:", get_llm_cache().stats())
+        if get_plan_library() is not None:
+            print("Plan library:", get_plan_library().stats())
     except KeyboardInterrupt:
         print("\nOperation cancelled by user.")
         sys.exit(0)
@@ -26,6 +91,13 @@ def main():
         traceback.print_exc()
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        collected = metrics.get_metrics()
+        if collected is not None:
+            print(collected.summary())
+            if args.prometheus:
+                with open(args.prometheus, "w", encoding="utf-8") as f:
+                    f.write(collected.prometheus_text())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+"""Reading batch requests and giving every run a project root of its own."""
+
+import io
+import json
+import pathlib
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from agent.batch import _unique_name, read_requests, run_batch  # noqa: E402
+from agent.tools import get_workspace  # noqa: E402
+
+
+class ReadRequestsTest(unittest.TestCase):
+    def read(self, *lines: str) -> list[dict]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / "requests.jsonl"
+            path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            return list(read_requests(path))
+
+    def test_prompt_and_id_fields(self):
+        requests = self.read(
+            json.dumps({"id": "a", "prompt": "p1"}),
+            "",
+            json.dumps({"request_id": "b", "body": "p2"}),
+            json.dumps({"user_prompt": "p3"}),
+        )
+        self.assertEqual(requests, [
+            {"id": "a", "line": 1, "prompt": "p1"},
+            {"id": "b", "line": 3, "prompt": "p2"},
+            {"id": "line-4", "line": 4, "prompt": "p3"},
+        ])
+
+    def test_bad_lines_become_errors_without_stopping(self):
+        requests = self.read("{not json", "[1, 2]", json.dumps({"id": "x"}), json.dumps({"prompt": "ok"}))
+        for request, error in zip(requests, ["invalid JSON", "request is not an object", "request has no prompt"]):
+            self.assertIn(error, request["error"])
+            self.assertNotIn("prompt", request)
+        self.assertEqual(requests[2]["id"], "x")
+        self.assertEqual(requests[3], {"id": "line-4", "line": 4, "prompt": "ok"})
+
+
+class UniqueNameTest(unittest.TestCase):
+    def test_names_that_collide_get_their_line_number(self):
+        used = set()
+        names = [_unique_name({"id": request_id, "line": line}, used)
+                 for line, request_id in enumerate(["a b", "a_b", "a b", "../x", ""], start=1)]
+        self.assertEqual(names, ["a_b", "a_b-2", "a_b-3", "x", "run"])
+
+
+class RecordingAgent:
+    def __init__(self):
+        self.roots = []
+
+    def invoke(self, state, config):
+        if state["user_prompt"] == "boom":
+            raise ValueError("failed")
+        self.roots.append((str(get_workspace().root), config["configurable"]["thread_id"]))
+
+
+class RunBatchTest(unittest.TestCase):
+    def test_every_request_runs_in_its_own_root(self):
+        agent = RecordingAgent()
+        requests = [{"id": "same", "line": 1, "prompt": "p"}, {"id": "same", "line": 2, "prompt": "p"},
+                    {"id": "bad", "line": 3, "error": "requests.jsonl:3: invalid JSON"},
+                    {"id": "fails", "line": 4, "prompt": "boom"}]
+        results = io.StringIO()
+        with tempfile.TemporaryDirectory() as tmp, redirect_stdout(io.StringIO()):
+            counts = run_batch(agent, iter(requests), results, tmp, workers=2,
+                               config={"configurable": {"thread_id": "batch"}})
+        self.assertEqual(counts, {"ok": 2, "error": 2})
+        roots = sorted(agent.roots)
+        self.assertEqual([pathlib.Path(root).name for root, _ in roots], ["same", "same-2"])
+        self.assertEqual([thread for _, thread in roots], ["batch/same", "batch/same-2"])
+        records = {r["line"]: r for r in map(json.loads, results.getvalue().splitlines())}
+        self.assertEqual(records[3]["error"], "requests.jsonl:3: invalid JSON")
+        self.assertEqual(records[4]["error"], "ValueError: failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""The run manifest: plans, finished steps and the append-only step log."""
+
+import pathlib
+import sys
+import tempfile
+import unittest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from agent.checkpoint import RunManifest  # noqa: E402
+
+
+class RunManifestTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = pathlib.Path(tmp.name) / "project"
+
+    def test_steps_survive_a_reload(self):
+        manifest = RunManifest.for_project(self.root)
+        manifest.record_plan("prompt", {"name": "p"})
+        manifest.mark_step_done("fp1", "a.js")
+        manifest.mark_step_done("fp2", "b.js")
+
+        reloaded = RunManifest.for_project(self.root)
+        self.assertTrue(reloaded.is_step_done("fp1") and reloaded.is_step_done("fp2"))
+        self.assertEqual(reloaded.reusable_plan("prompt"), {"name": "p"})
+
+    def test_steps_are_appended_without_rewriting_the_manifest(self):
+        manifest = RunManifest.for_project(self.root)
+        manifest.record_plan("prompt", {"name": "p"})
+        written = manifest.path.read_text(encoding="utf-8")
+        for idx in range(3):
+            manifest.mark_step_done(f"fp{idx}", f"{idx}.js")
+        self.assertEqual(manifest.path.read_text(encoding="utf-8"), written)
+        self.assertEqual(len(manifest.steps_path.read_text(encoding="utf-8").splitlines()), 3)
+
+    def test_prune_folds_the_log_into_the_manifest(self):
+        manifest = RunManifest.for_project(self.root)
+        manifest.mark_step_done("keep", "a.js")
+        manifest.mark_step_done("drop", "b.js")
+        manifest.prune_steps({"keep"})
+        self.assertFalse(manifest.steps_path.exists())
+
+        reloaded = RunManifest.for_project(self.root)
+        self.assertTrue(reloaded.is_step_done("keep"))
+        self.assertFalse(reloaded.is_step_done("drop"))
+
+    def test_torn_last_line_is_ignored(self):
+        manifest = RunManifest.for_project(self.root)
+        manifest.mark_step_done("fp1", "a.js")
+        with open(manifest.steps_path, "a", encoding="utf-8") as f:
+            f.write('{"fingerprint": "fp2", "file')
+        reloaded = RunManifest.for_project(self.root)
+        self.assertTrue(reloaded.is_step_done("fp1"))
+        self.assertFalse(reloaded.is_step_done("fp2"))
+
+    def test_manifest_without_a_path_stays_in_memory(self):
+        manifest = RunManifest.for_project(self.root, persist=False)
+        manifest.mark_step_done("fp1", "a.js")
+        manifest.save()
+        self.assertTrue(manifest.is_step_done("fp1"))
+        self.assertFalse(self.root.parent.joinpath("project.manifest.json").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""The pooled command runner behind the run_cmd tool."""
+
+import importlib
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("GROQ_API_KEY", "offline-test")
+
+from agent import toolsets  # noqa: E402
+from agent.commands import CommandPool, Limits  # noqa: E402
+from agent.tools import project_root, run_cmd, write_file  # noqa: E402
+
+
+def _gone(pid: int, wait: float = 2.0) -> bool:
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@unittest.skipUnless(os.name == "posix", "commands run through /bin/sh")
+class CommandPoolTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.pool = CommandPool(self.root, size=1, max_output=200, limits=Limits())
+        self.addCleanup(self.pool.close)
+
+    def test_exit_code_and_output(self):
+        result = self.pool.run("echo out; echo err >&2; exit 3")
+        self.assertEqual((result.returncode, result.stdout, result.stderr), (3, "out\n", "err\n"))
+        self.assertFalse(result.timed_out or result.truncated)
+
+    def test_runs_in_the_workspace_root(self):
+        self.assertEqual(os.path.realpath(self.pool.run("pwd").stdout.strip()), os.path.realpath(self.root))
+
+    def test_shell_state_does_not_leak_between_commands(self):
+        self.pool.run("cd /; X=1")
+        result = self.pool.run('echo "$X"; pwd')
+        self.assertEqual(result.stdout.splitlines()[0], "")
+        self.assertEqual(os.path.realpath(result.stdout.splitlines()[1]), os.path.realpath(self.root))
+
+    def test_timeout_returns_partial_output(self):
+        result = self.pool.run("echo started; sleep 30", timeout=0.5)
+        self.assertTrue(result.timed_out)
+        self.assertEqual(result.stdout, "started\n")
+        self.assertLess(result.seconds, 10)
+        # the worker survives the kill and runs the next command
+        self.assertEqual(self.pool.run("echo next").stdout, "next\n")
+
+    def test_long_output_is_capped_with_a_marker(self):
+        result = self.pool.run("i=0; while [ $i -lt 200 ]; do echo line$i; i=$((i+1)); done")
+        self.assertTrue(result.truncated)
+        self.assertRegex(result.stdout, r"\[\.\.\. \d+ bytes truncated \.\.\.\]")
+        self.assertTrue(result.stdout.startswith("line0\n"))
+        self.assertTrue(result.stdout.endswith("line199\n"))
+        self.assertLess(len(result.stdout), 300)
+
+    def test_background_children_are_killed(self):
+        pid = int(self.pool.run("sleep 30 >/dev/null 2>&1 & echo $!").stdout)
+        self.assertTrue(_gone(pid))
+
+    @unittest.skipUnless(shutil.which("setsid"), "needs setsid")
+    def test_children_in_a_new_session_are_killed(self):
+        pid = int(self.pool.run("setsid sleep 30 >/dev/null 2>&1 & echo $!").stdout)
+        self.assertTrue(_gone(pid))
+
+
+@unittest.skipUnless(os.name == "posix", "commands run through /bin/sh")
+class RunCmdToolTest(unittest.TestCase):
+    def test_sees_pending_writes(self):
+        with tempfile.TemporaryDirectory() as tmp, project_root(pathlib.Path(tmp) / "project") as workspace:
+            workspace.root.mkdir()
+            write_file.invoke({"path": "a.txt", "content": "hello"})
+            self.assertEqual(run_cmd.invoke({"cmd": "cat a.txt"}), (0, "hello", ""))
+
+    def test_timeout_exit_code(self):
+        with tempfile.TemporaryDirectory() as tmp, project_root(tmp):
+            code, stdout, stderr = run_cmd.invoke({"cmd": "echo partial; sleep 30", "timeout": 1})
+        self.assertEqual((code, stdout), (124, "partial\n"))
+        self.assertIn("timed out after 1s", stderr)
+
+    def test_refused_in_memory(self):
+        with tempfile.TemporaryDirectory() as tmp, project_root(tmp, in_memory=True):
+            code, _, stderr = run_cmd.invoke({"cmd": "echo hi"})
+        self.assertEqual(code, 1)
+        self.assertIn("in-memory", stderr)
+
+
+class ToolsetTest(unittest.TestCase):
+    def tearDown(self):
+        importlib.reload(toolsets)
+
+    def test_run_cmd_is_opt_in(self):
+        with mock.patch.dict(os.environ, {"CODER_RUN_COMMANDS": "0"}):
+            importlib.reload(toolsets)
+        self.assertNotIn("run_cmd", toolsets.TOOLSETS["new_file"])
+        with mock.patch.dict(os.environ, {"CODER_RUN_COMMANDS": "1"}):
+            importlib.reload(toolsets)
+        self.assertIn("run_cmd", toolsets.TOOLSETS["new_file"])
+        self.assertIn("run_cmd", toolsets.TOOLSETS["existing_file"])
+
+
+if __name__ == "__main__":
+    unittest.main()
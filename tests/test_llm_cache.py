@@ -0,0 +1,94 @@
+"""The on-disk LLM response cache and its replay-only mode."""
+
+import os
+import pathlib
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from langchain_core.load import dumps  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration  # noqa: E402
+
+from agent.llm_cache import CacheMissError, DiskLLMCache, cache_from_env, cache_key  # noqa: E402
+
+LLM = "model=test,tools=[]"
+
+
+def prompt(text: str, message_id: str = "a") -> str:
+    return dumps([HumanMessage(text, id=message_id)])
+
+
+def answer(text: str) -> list[ChatGeneration]:
+    return [ChatGeneration(message=AIMessage(text, id="run-1", response_metadata={"ms": 12}))]
+
+
+class DiskLLMCacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = pathlib.Path(tmp.name) / "cache.sqlite"
+
+    def open(self, **kwargs) -> DiskLLMCache:
+        cache = DiskLLMCache(self.path, **kwargs)
+        self.addCleanup(cache._conn.close)
+        return cache
+
+    def test_round_trip(self):
+        cache = self.open()
+        self.assertIsNone(cache.lookup(prompt("hi"), LLM))
+        cache.update(prompt("hi"), LLM, answer("hello"))
+        (generation,) = cache.lookup(prompt("hi"), LLM)
+        self.assertEqual(generation.message.content, "hello")
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (1, 1))
+
+    def test_key_ignores_volatile_message_fields(self):
+        self.assertEqual(cache_key(prompt("hi", "a"), LLM), cache_key(prompt("hi", "b"), LLM))
+        self.assertNotEqual(cache_key(prompt("hi"), LLM), cache_key(prompt("hi"), LLM + ",temperature=1"))
+        self.assertNotEqual(cache_key(prompt("hi"), LLM), cache_key(prompt("ho"), LLM))
+
+    def test_replay_serves_recorded_responses_and_raises_on_a_miss(self):
+        self.open().update(prompt("hi"), LLM, answer("hello"))
+        replay = self.open(replay_only=True)
+        self.assertEqual(replay.lookup(prompt("hi", "other-id"), LLM)[0].message.content, "hello")
+        with self.assertRaises(CacheMissError):
+            replay.lookup(prompt("never recorded"), LLM)
+
+    def test_replay_does_not_record(self):
+        replay = self.open(replay_only=True)
+        replay.update(prompt("hi"), LLM, answer("hello"))
+        self.assertEqual(replay.stats()["entries"], 0)
+
+    def test_least_recently_used_entries_are_evicted_beyond_the_size_cap(self):
+        cache = self.open(max_bytes=1)
+        cache.update(prompt("one"), LLM, answer("1"))
+        cache.update(prompt("two"), LLM, answer("2"))
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertGreaterEqual(cache.stats()["evictions"], 2)
+
+    def test_expired_entries_are_misses(self):
+        cache = self.open(max_age=-1)
+        cache.update(prompt("hi"), LLM, answer("hello"))
+        self.assertIsNone(cache.lookup(prompt("hi"), LLM))
+
+
+class CacheFromEnvTest(unittest.TestCase):
+    def test_modes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(pathlib.Path(tmp) / "cache.sqlite")
+            with mock.patch.dict(os.environ, {"LLM_CACHE": "off"}):
+                self.assertIsNone(cache_from_env())
+            with mock.patch.dict(os.environ, {"LLM_CACHE": "replay", "LLM_CACHE_PATH": path}):
+                cache = cache_from_env()
+                self.assertTrue(cache.replay_only)
+                cache._conn.close()
+            with mock.patch.dict(os.environ, {"LLM_CACHE": "sometimes"}), self.assertRaises(ValueError):
+                cache_from_env()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""Targeted edits: exact string replacement, line ranges and unified diffs."""
+
+import difflib
+import pathlib
+import sys
+import unittest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from agent.patching import PatchError, apply_unified_diff, replace_lines, replace_string  # noqa: E402
+
+
+def _diff(before: str, after: str, context: int) -> str:
+    return "".join(difflib.unified_diff(before.splitlines(True), after.splitlines(True), "a", "b", n=context))
+
+
+class ReplaceStringTest(unittest.TestCase):
+    def test_replaces_unique_match(self):
+        self.assertEqual(replace_string("a = 1\nb = 2\n", "b = 2", "b = 3"), ("a = 1\nb = 3\n", 1))
+
+    def test_missing_text_is_an_error(self):
+        with self.assertRaisesRegex(PatchError, "not found"):
+            replace_string("a = 1\n", "b = 2", "b = 3")
+
+    def test_ambiguous_match_names_the_lines(self):
+        with self.assertRaisesRegex(PatchError, r"matches 2 times \(lines 1, 3\)"):
+            replace_string("x\ny\nx\n", "x", "z")
+
+    def test_replace_all(self):
+        self.assertEqual(replace_string("x\ny\nx\n", "x", "z", replace_all=True), ("z\ny\nz\n", 2))
+
+    def test_empty_old_is_an_error(self):
+        with self.assertRaises(PatchError):
+            replace_string("x\n", "", "y")
+
+
+class ReplaceLinesTest(unittest.TestCase):
+    def test_replaces_range(self):
+        self.assertEqual(replace_lines("a\nb\nc\n", 2, 3, "X\nY\nZ"), "a\nX\nY\nZ\n")
+
+    def test_inserts_when_range_is_empty(self):
+        self.assertEqual(replace_lines("a\nb\n", 2, 1, "X"), "a\nX\nb\n")
+        self.assertEqual(replace_lines("a\nb\n", 3, 2, "X"), "a\nb\nX\n")
+
+    def test_deletes_with_empty_content(self):
+        self.assertEqual(replace_lines("a\nb\nc\n", 2, 2, ""), "a\nc\n")
+
+    def test_keeps_missing_trailing_newline(self):
+        self.assertEqual(replace_lines("a\nb", 2, 2, "c"), "a\nc")
+
+    def test_range_outside_the_file_is_an_error(self):
+        with self.assertRaises(PatchError):
+            replace_lines("a\n", 3, 3, "x")
+        with self.assertRaises(PatchError):
+            replace_lines("a\n", 1, 2, "x")
+
+
+class ApplyUnifiedDiffTest(unittest.TestCase):
+    def assertApplies(self, before: str, after: str, context: int):
+        self.assertEqual(apply_unified_diff(before, _diff(before, after, context))[0], after)
+
+    def test_insert_only(self):
+        for context in (0, 1, 3):
+            with self.subTest(context=context):
+                self.assertApplies("a\nb\nc\n", "a\nX\nb\nc\n", context)
+                self.assertApplies("a\nb\nc\n", "X\na\nb\nc\n", context)
+                self.assertApplies("a\nb\nc\n", "a\nb\nc\nX\n", context)
+
+    def test_delete_only(self):
+        for context in (0, 1, 3):
+            with self.subTest(context=context):
+                self.assertApplies("a\nb\nc\n", "a\nc\n", context)
+                self.assertApplies("a\nb\nc\n", "b\nc\n", context)
+
+    def test_zero_context_insert_goes_after_the_header_line(self):
+        patch = "@@ -1,0 +2 @@\n+X\n"
+        self.assertEqual(apply_unified_diff("a\nb\nc\n", patch), ("a\nX\nb\nc\n", 1))
+
+    def test_zero_context_insert_into_empty_file(self):
+        self.assertEqual(apply_unified_diff("", "@@ -0,0 +1,2 @@\n+a\n+b\n")[0], "a\nb\n")
+
+    def test_zero_context_hunks_track_offset_drift(self):
+        before = "".join(f"{i}\n" for i in range(20))
+        lines = before.splitlines()
+        lines[2:2] = ["X", "Y", "Z"]
+        del lines[10]
+        lines.insert(15, "W")
+        self.assertApplies(before, "".join(f"{line}\n" for line in lines), 0)
+
+    def test_repeated_lines_are_resolved_by_the_header(self):
+        before = "x\ny\nx\ny\nx\n"
+        self.assertApplies(before, "x\ny\nx\nQ\ny\nx\n", 0)
+
+    def test_wrong_line_numbers_are_only_a_hint(self):
+        patch = "@@ -40,3 +40,3 @@\n a\n-b\n+B\n c\n"
+        self.assertEqual(apply_unified_diff("a\nb\nc\n", patch)[0], "a\nB\nc\n")
+
+    def test_bare_header_needs_a_unique_match(self):
+        self.assertEqual(apply_unified_diff("a\nb\n", "@@\n-b\n+c\n")[0], "a\nc\n")
+        with self.assertRaisesRegex(PatchError, "matches 2 places"):
+            apply_unified_diff("b\nb\n", "@@\n-b\n+c\n")
+
+    def test_hunk_that_does_not_apply_changes_nothing(self):
+        with self.assertRaisesRegex(PatchError, "hunk 2 does not apply"):
+            apply_unified_diff("a\nb\n", "@@ -1 +1 @@\n-a\n+A\n@@ -2 +2 @@\n-q\n+Q\n")
+
+    def test_no_hunks_is_an_error(self):
+        with self.assertRaises(PatchError):
+            apply_unified_diff("a\n", "just text")
+
+
+if __name__ == "__main__":
+    unittest.main()
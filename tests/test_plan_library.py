@@ -0,0 +1,72 @@
+"""Retrieval of past plans by prompt similarity."""
+
+import os
+import pathlib
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from agent.plan_library import PlanLibrary, plan_library_from_env  # noqa: E402
+
+PROMPTS = {
+    "Create a to-do list app with HTML, CSS and JavaScript": "todo",
+    "Build a calculator web application in Python": "calculator",
+    "Make a simple blog website with posts and comments": "blog",
+}
+
+
+class PlanLibraryTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = pathlib.Path(tmp.name) / "plans.sqlite"
+        self.library = self.open()
+        for prompt, name in PROMPTS.items():
+            self.library.add(prompt, {"name": name}, {"implementation_steps": []})
+
+    def open(self, **kwargs) -> PlanLibrary:
+        library = PlanLibrary(self.path, **kwargs)
+        self.addCleanup(library._conn.close)
+        return library
+
+    def test_same_prompt_is_reused(self):
+        match = self.library.lookup("Build a calculator web application in Python")
+        self.assertTrue(match.reuse)
+        self.assertEqual(match.plan, {"name": "calculator"})
+        self.assertAlmostEqual(match.similarity, 1.0, places=6)
+
+    def test_similar_prompt_seeds_the_planner(self):
+        match = self.library.lookup("Create a todo list application using HTML and JS")
+        self.assertEqual(match.plan, {"name": "todo"})
+        self.assertFalse(match.reuse)
+        self.assertGreaterEqual(match.similarity, self.library.seed_threshold)
+
+    def test_unrelated_prompt_misses(self):
+        self.assertIsNone(self.library.lookup("Train a neural network on satellite imagery"))
+        self.assertEqual(self.library.stats()["misses"], 1)
+
+    def test_new_entries_are_searchable_and_replace_old_ones(self):
+        self.library.search("anything")  # builds the index
+        self.library.add("Build a calculator web application in Python", {"name": "v2"}, {"implementation_steps": []})
+        self.assertEqual(self.library.lookup("Build a calculator web application in Python").plan, {"name": "v2"})
+        self.assertEqual(self.library.stats()["entries"], 3)
+
+    def test_least_recently_used_entries_beyond_the_cap_are_dropped(self):
+        library = self.open(max_entries=2)
+        library.add("Write a chess engine in Rust", {"name": "chess"}, {"implementation_steps": []})
+        self.assertEqual(library.stats()["entries"], 2)
+        self.assertEqual(library.lookup("Write a chess engine in Rust").plan, {"name": "chess"})
+
+    def test_seed_mode_never_reuses(self):
+        with mock.patch.dict(os.environ, {"PLAN_LIBRARY": "seed", "PLAN_LIBRARY_PATH": str(self.path)}):
+            library = plan_library_from_env()
+        self.addCleanup(library._conn.close)
+        self.assertFalse(library.lookup("Build a calculator web application in Python").reuse)
+
+
+if __name__ == "__main__":
+    unittest.main()
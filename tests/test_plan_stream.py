@@ -0,0 +1,70 @@
+"""Pulling implementation steps out of a TaskPlan that is still being streamed."""
+
+import json
+import pathlib
+import sys
+import unittest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from langchain_core.messages import AIMessage, AIMessageChunk  # noqa: E402
+
+from agent.plan_stream import StepStreamParser, tool_call_args  # noqa: E402
+
+PLAN = {
+    "note": {"implementation_steps": [{"filepath": "decoy"}]},
+    "implementation_steps": [
+        {"filepath": "a.js", "task_description": "uses \"braces\" {like} [these] and \\\" escapes"},
+        {"filepath": "b.js", "task_description": "nested", "depends_on": ["a.js"]},
+        {"filepath": "c.css", "task_description": "styles"},
+    ],
+    "extra": [{"filepath": "not a step"}],
+}
+TEXT = json.dumps(PLAN)
+
+
+class StepStreamParserTest(unittest.TestCase):
+    def parse(self, pieces) -> list:
+        parser = StepStreamParser()
+        return [(step.filepath, len(parser.text)) for piece in pieces for step in parser.feed(piece)]
+
+    def test_whole_document(self):
+        self.assertEqual([path for path, _ in self.parse([TEXT])], ["a.js", "b.js", "c.css"])
+
+    def test_any_split_gives_the_same_steps(self):
+        expected = self.parse([TEXT])
+        for size in (1, 2, 7, 64):
+            with self.subTest(size=size):
+                steps = self.parse(TEXT[i:i + size] for i in range(0, len(TEXT), size))
+                self.assertEqual([path for path, _ in steps], [path for path, _ in expected])
+
+    def test_steps_arrive_with_their_closing_brace(self):
+        steps = self.parse(TEXT[i] for i in range(len(TEXT)))
+        for path, seen in steps:
+            self.assertEqual(TEXT[seen - 1], "}")
+            self.assertLess(seen, len(TEXT))
+
+    def test_fields_are_parsed(self):
+        parser = StepStreamParser()
+        steps = parser.feed(TEXT)
+        self.assertEqual(steps[0].task_description, PLAN["implementation_steps"][0]["task_description"])
+        self.assertEqual(steps[1].depends_on, ["a.js"])
+
+
+class ToolCallArgsTest(unittest.TestCase):
+    def test_streamed_chunks_of_the_first_tool_call(self):
+        chunks = [
+            AIMessageChunk(content="", tool_call_chunks=[{"name": "TaskPlan", "args": '{"implem', "id": "1", "index": 0}]),
+            AIMessageChunk(content="", tool_call_chunks=[{"name": None, "args": "x", "id": None, "index": 1}]),
+            AIMessageChunk(content="", tool_call_chunks=[{"name": None, "args": 'entation_steps": []}', "id": None, "index": 0}]),
+        ]
+        self.assertEqual("".join(tool_call_args(chunks)), '{"implementation_steps": []}')
+
+    def test_complete_message_from_a_model_without_streaming(self):
+        message = AIMessage(content="", tool_calls=[{"name": "TaskPlan", "args": {"implementation_steps": []}, "id": "1"}])
+        self.assertEqual(json.loads("".join(tool_call_args([message]))), {"implementation_steps": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+"""Configuration of the shared LLM rate limiter."""
+
+import os
+import pathlib
+import sys
+import unittest
+from unittest import mock
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from agent.rate_limit import get_rate_limiter  # noqa: E402
+
+
+class GetRateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        get_rate_limiter.cache_clear()
+        self.addCleanup(get_rate_limiter.cache_clear)
+
+    def test_disabled_by_default(self):
+        env = {k: v for k, v in os.environ.items() if k not in ("LLM_RPM", "LLM_TPM")}
+        with mock.patch.dict(os.environ, env, clear=True):
+            self.assertIsNone(get_rate_limiter())
+
+    def test_configured_from_the_environment(self):
+        with mock.patch.dict(os.environ, {"LLM_RPM": "30", "LLM_TPM": "6000"}):
+            limiter = get_rate_limiter()
+        self.assertEqual((limiter.requests_per_minute, limiter.tokens_per_minute), (30, 6000))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""A run interrupted mid-coder and resumed from its checkpoint finishes every step on disk.
+
+Runs offline against the scripted model of the benchmarks:
+    python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import unittest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "benchmarks")]
+os.environ.setdefault("GROQ_API_KEY", "offline-test")
+
+from agent.checkpoint import open_checkpointer, run_config  # noqa: E402
+from agent.graph import get_graph, run_summary, set_llm  # noqa: E402
+from agent.llm_cache import CacheMissError  # noqa: E402
+from agent.tools import project_root  # noqa: E402
+from fake_llm import ScriptedChatModel  # noqa: E402
+
+
+class InterruptedModel(ScriptedChatModel):
+    fail_at_call: int = -1
+    """Coder calls before the model starts failing; -1 never fails."""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        names = [t["function"]["name"] for t in kwargs.get("tools", [])]
+        if 0 <= self.fail_at_call <= self.stats()["calls"].get("coder", 0) and not {"Plan", "TaskPlan"} & set(names):
+            # re-raised by the coder instead of retried, so it ends the run like a crash would
+            raise CacheMissError("interrupted")
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+class ResumeTest(unittest.TestCase):
+    def tearDown(self):
+        set_llm(None)
+
+    def test_resumed_steps_land_on_disk(self):
+        n_steps = 10
+        # two calls per step, so the run stops inside step 5 after its first model call
+        model = InterruptedModel(n_steps=n_steps, fail_at_call=9)
+        set_llm(model)
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            agent = get_graph().compile(checkpointer=open_checkpointer(pathlib.Path(tmp) / "runs.sqlite"))
+            root = pathlib.Path(tmp) / "project"
+            with project_root(root):
+                with self.assertRaises(CacheMissError):
+                    agent.invoke({"user_prompt": "resume me"},
+                                 run_config("run", coder_concurrency=1, validate=False))
+                model.fail_at_call = -1
+                calls_before = model.stats()["calls"]["coder"]
+                result = agent.invoke(None, run_config("run", coder_concurrency=1, incremental=True, validate=False))
+
+            # every step not finished before the interruption calls the model again
+            self.assertEqual(model.stats()["calls"]["coder"] - calls_before, 2 * (n_steps - 4))
+            self.assertIn(f"Steps: {n_steps}/{n_steps} run, 0 failed", run_summary(result))
+            for step in range(n_steps):
+                path = root / model.file_path(step % model.n_files)
+                self.assertTrue(path.exists(), path)
+                if step >= model.n_files:  # later steps on a file edit it
+                    self.assertIn(f"export const part{step} = {step};", path.read_text(encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+"""Step dependency inference and dependency-ordered execution."""
+
+import pathlib
+import sys
+import threading
+import time
+import unittest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from agent.scheduler import (DependencyTracker, build_dependency_graph, critical_path_length,  # noqa: E402
+                             infer_references, normalize_path, run_dag, run_dag_stream)
+from agent.states import ImplementationTask  # noqa: E402
+
+
+def step(filepath: str, task: str = "", depends_on: tuple[str, ...] = ()) -> ImplementationTask:
+    return ImplementationTask(filepath=filepath, task_description=task, depends_on=list(depends_on))
+
+
+class InferReferencesTest(unittest.TestCase):
+    KNOWN = ["src/app.js", "src/utils.js", "styles/main.css", "index.html", "pkg/__init__.py", "pkg/core.py"]
+
+    def refs(self, filepath: str, task: str) -> set[str]:
+        return infer_references(step(filepath, task), self.KNOWN)
+
+    def test_relative_js_import(self):
+        self.assertEqual(self.refs("src/app.js", "import { add } from './utils';"), {"src/utils.js"})
+
+    def test_html_includes(self):
+        self.assertEqual(self.refs("index.html", '<link href="styles/main.css"><script src="src/app.js">'),
+                         {"styles/main.css", "src/app.js"})
+
+    def test_python_module_imports(self):
+        self.assertEqual(self.refs("main.py", "from pkg.core import run\nimport pkg"), {"pkg/core.py", "pkg/__init__.py"})
+
+    def test_mentioned_paths_and_unique_file_names(self):
+        self.assertEqual(self.refs("README.md", "Document frontend/src/app.js and utils.js."),
+                         {"src/app.js", "src/utils.js"})
+
+    def test_ambiguous_file_name_is_not_a_reference(self):
+        known = ["a/index.js", "b/index.js"]
+        self.assertEqual(infer_references(step("main.js", "wire up index.js"), known), set())
+
+    def test_normalize_path(self):
+        self.assertEqual(normalize_path("./src\\app.js"), "src/app.js")
+        self.assertEqual(normalize_path("/src/../lib/x.js"), "lib/x.js")
+
+
+class DependencyGraphTest(unittest.TestCase):
+    def test_steps_wait_for_the_latest_writer_of_what_they_use(self):
+        steps = [
+            step("src/utils.js", "helpers"),
+            step("src/app.js", "import { add } from './utils.js'"),
+            step("src/utils.js", "more helpers"),
+            step("index.html", '<script src="src/app.js">'),
+            step("README.md", "", depends_on=("src/utils.js",)),
+        ]
+        self.assertEqual(build_dependency_graph(steps), [set(), {0}, {0}, {1}, {2}])
+
+    def test_only_earlier_steps_count(self):
+        steps = [step("a.js", "import './b.js'"), step("b.js", "import './a.js'")]
+        self.assertEqual(build_dependency_graph(steps), [set(), {0}])
+
+    def test_tracker_matches_the_whole_graph_when_paths_are_known_upfront(self):
+        steps = [step(f"m{idx}.js", f"import './m{idx - 1}.js'") for idx in range(50)]
+        tracker = DependencyTracker(s.filepath for s in steps)
+        self.assertEqual([tracker.add(s) for s in steps], build_dependency_graph(steps))
+
+    def test_critical_path_length(self):
+        self.assertEqual(critical_path_length([set(), {0}, set(), {1, 2}]), 3)
+        self.assertEqual(critical_path_length([]), 0)
+
+
+class RunDagTest(unittest.TestCase):
+    DEPS = [set(), set(), {0}, {0, 1}, {2, 3}]
+
+    def record(self):
+        order, lock = [], threading.Lock()
+
+        def run_step(idx):
+            time.sleep(0.01 * (idx % 2))
+            with lock:
+                order.append(idx)
+            return idx * 10
+        return order, run_step
+
+    def assertRespectsDeps(self, order: list[int]):
+        for idx in order:
+            self.assertTrue(all(order.index(dep) < order.index(idx) for dep in self.DEPS[idx]), order)
+
+    def test_runs_every_step_after_its_dependencies(self):
+        order, run_step = self.record()
+        self.assertEqual(run_dag(self.DEPS, run_step, max_concurrency=3), {idx: idx * 10 for idx in range(5)})
+        self.assertRespectsDeps(order)
+
+    def test_skips_done_steps(self):
+        order, run_step = self.record()
+        self.assertEqual(set(run_dag(self.DEPS, run_step, done={0, 1})), {2, 3, 4})
+
+    def test_concurrency_is_bounded(self):
+        running, peak, lock = 0, 0, threading.Lock()
+
+        def run_step(idx):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+
+        run_dag([set()] * 8, run_step, max_concurrency=3)
+        self.assertEqual(peak, 3)
+
+    def test_unsatisfiable_dependencies(self):
+        with self.assertRaises(RuntimeError):
+            run_dag([{1}, {0}], lambda idx: None)
+
+    def test_stream_starts_steps_as_they_arrive(self):
+        started = threading.Event()
+
+        def deps():
+            yield set()
+            # the first step runs before the second has arrived
+            self.assertTrue(started.wait(2))
+            yield {0}
+
+        order = []
+        run_dag_stream(deps(), lambda idx: (order.append(idx), started.set()), max_concurrency=2)
+        self.assertEqual(order, [0, 1])
+
+    def test_stream_reraises_the_feed_error_after_started_steps(self):
+        finished = []
+
+        def deps():
+            yield set()
+            raise ValueError("plan ended early")
+
+        with self.assertRaisesRegex(ValueError, "plan ended early"):
+            run_dag_stream(deps(), lambda idx: (time.sleep(0.05), finished.append(idx)))
+        self.assertEqual(finished, [0])
+
+
+if __name__ == "__main__":
+    unittest.main()
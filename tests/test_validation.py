@@ -0,0 +1,113 @@
+"""Local checks of generated files."""
+
+import contextlib
+import io
+import pathlib
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from agent import validation  # noqa: E402
+from agent.validation import FileCheck, Validator  # noqa: E402
+
+
+def _with_node():
+    """Treats scripts as checkable even where node is not installed."""
+    return mock.patch.object(validation, "checker_for",
+                             lambda path: validation._CHECKER_FOR_SUFFIX.get(pathlib.PurePath(path).suffix))
+
+
+class CheckersTest(unittest.TestCase):
+    def check(self, checker: str, source: str):
+        return validation.check_batch([(checker, source)])[0]
+
+    def test_python(self):
+        self.assertIsNone(self.check("python", "def f():\n    return 1\n"))
+        self.assertRegex(self.check("python", "def f(:\n"), r"^line 1: SyntaxError")
+
+    def test_json(self):
+        self.assertIsNone(self.check("json", '{"a": [1, 2]}'))
+        self.assertRegex(self.check("json", '{\n"a": }'), r"^line 2: ")
+
+    def test_html(self):
+        self.assertIsNone(self.check("html", "<ul><li>a<li>b</ul><br><img src=x>"))
+        self.assertEqual(self.check("html", "<div>\n<span>\n</div>"),
+                         "line 2: <span> is not closed before </div> on line 3")
+        self.assertEqual(self.check("html", "</p>"), "line 1: </p> has no matching <p>")
+        self.assertEqual(self.check("html", "<main>"), "line 1: <main> is never closed")
+
+    def test_css(self):
+        self.assertIsNone(self.check("css", 'a { content: "}"; } /* { */ b { width: calc(1px + 2px); }'))
+        self.assertEqual(self.check("css", "a {\n"), "line 1: '{' is never closed")
+        self.assertEqual(self.check("css", "a { }\n}"), "line 2: unexpected '}'")
+        self.assertEqual(self.check("css", "/* open"), "line 1: unterminated comment")
+
+    @unittest.skipUnless(validation._node(), "needs node")
+    def test_javascript_scripts_and_modules(self):
+        errors = validation.check_batch([("javascript", "const a = 1;"), ("javascript", "export const a = 1;"),
+                                         ("javascript", "const = ;")])
+        self.assertEqual(errors[:2], [None, None])
+        self.assertRegex(errors[2], "SyntaxError")
+
+    def test_checker_for(self):
+        self.assertEqual(validation.checker_for("src/App.PY"), "python")
+        self.assertEqual(validation.checker_for("index.htm"), "html")
+        self.assertIsNone(validation.checker_for("README.md"))
+
+
+class PlaceholderTest(unittest.TestCase):
+    def test_placeholders_pass_their_own_check(self):
+        for path in ("a.py", "a.json", "a.html", "a.css", "a.js"):
+            with self.subTest(path=path):
+                source = validation.placeholder(path, "the */ --> login form\nwith two fields")
+                self.assertIsNone(self.check(path, source))
+
+    def check(self, path: str, source: str):
+        checker = validation._CHECKER_FOR_SUFFIX[pathlib.PurePath(path).suffix]
+        if checker == "javascript" and not validation._node():
+            return None
+        return validation.check_batch([(checker, source)])[0]
+
+    def test_comment_syntax(self):
+        self.assertEqual(validation.placeholder("a.py", "x"), "# TODO: Implement x\n")
+        self.assertEqual(validation.placeholder("a.css", "x */ y"), "/* TODO: Implement x  y */\n")
+        self.assertEqual(validation.placeholder("a.json", "x"), "{}\n")
+        self.assertEqual(validation.placeholder("a.ts", "x\ny"), "// TODO: Implement x\n// y\n")
+
+
+class ValidatorTest(unittest.TestCase):
+    def setUp(self):
+        self.validator = Validator(max_workers=1)
+        self.addCleanup(self.validator.close)
+
+    def _validate_without_node(self, error: Exception) -> list[FileCheck]:
+        files = {"app.js": "let x = ;\n", "data.json": "{", "ok.py": "x = 1\n"}
+        with _with_node(), \
+                mock.patch.object(validation, "_check_javascript", side_effect=error), \
+                contextlib.redirect_stdout(io.StringIO()):
+            return self.validator.validate(files)
+
+    def test_failing_node_leaves_scripts_unchecked(self):
+        for error in (RuntimeError("node exited with 1"), subprocess.TimeoutExpired("node", 30),
+                      FileNotFoundError("node")):
+            with self.subTest(error=type(error).__name__):
+                script, data, python = self._validate_without_node(error)
+                self.assertEqual(script, FileCheck("app.js", None, None))
+                self.assertEqual(data.checker, "json")
+                self.assertIsNotNone(data.error)
+                self.assertEqual(python, FileCheck("ok.py", "python", None))
+
+    def test_unchecked_scripts_are_not_cached(self):
+        self._validate_without_node(RuntimeError("node exited with 1"))
+        with _with_node(), \
+                mock.patch.object(validation, "_check_javascript", return_value=["line 1: SyntaxError"]):
+            (check,) = self.validator.validate({"app.js": "let x = ;\n"})
+        self.assertEqual(check, FileCheck("app.js", "javascript", "line 1: SyntaxError"))
+
+
+if __name__ == "__main__":
+    unittest.main()